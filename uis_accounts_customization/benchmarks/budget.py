@@ -0,0 +1,189 @@
+"""
+Timing of the UIS - Budget checks and remaining-budget lookups at growing ledger sizes.
+
+    bench --site <site> execute uis_accounts_customization.benchmarks.budget.run \
+        --kwargs "{'sizes': [100000, 1000000], 'iterations': 100}"
+
+or `bench --site <site> budget-benchmark --sizes 100000,1000000`.
+
+Key facts
+─────────
+•  Each case is timed once with cold budget caches, then *iterations* times warm
+•  Queries are counted on frappe.db.sql for every call
+•  The report (p50 / p95 / mean latency, queries per call) is written as JSON under
+   sites/<site>/uis_budget_benchmarks/, so releases can be compared on the same MariaDB
+"""
+
+import json
+import os
+import random
+import time
+from contextlib import contextmanager
+
+import frappe
+from frappe.utils import add_days, date_diff, getdate, now_datetime, nowdate
+
+from uis_accounts_customization.benchmarks.generator import ensure_gl_entries, get_gl_entry_count, setup
+from uis_accounts_customization.customization_script.budget import (
+    fetch_remaining_budget,
+    fetch_remaining_budget_for_item,
+    validate_expense_against_budget,
+    verify_validate_expense_against_budget,
+)
+from uis_accounts_customization.customization_script.budget_index import clear_budget_index
+from uis_accounts_customization.customization_script.monthly_distribution import clear_distribution_cache
+
+DEFAULT_SIZES = (100_000, 1_000_000)
+
+
+def run(sizes=DEFAULT_SIZES, iterations=100, output=None, seed=0):
+    sizes = sorted(int(size) for size in frappe.parse_json(sizes))
+    iterations = int(iterations)
+
+    context = setup()
+    rng = random.Random(seed)
+    results = []
+
+    for size in sizes:
+        started = time.perf_counter()
+        inserted = ensure_gl_entries(context, size, seed=seed)
+        load_seconds = time.perf_counter() - started
+        gl_entries = get_gl_entry_count(context)
+
+        for name, case in get_cases(context, rng):
+            result = measure(case, iterations)
+            result.update(case=name, size=size, gl_entries=gl_entries)
+            if inserted:
+                result["load_seconds"] = round(load_seconds, 3)
+            results.append(result)
+
+    report = {
+        "site": frappe.local.site,
+        "started": str(now_datetime()),
+        "versions": {app: frappe.get_attr(f"{app}.__version__") for app in ("frappe", "erpnext", "uis_accounts_customization")},
+        "iterations": iterations,
+        "results": results,
+    }
+
+    path = output or frappe.get_site_path("uis_budget_benchmarks", f"{now_datetime():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=1, default=str)
+
+    report["output"] = path
+    return report
+
+
+def get_cases(context, rng):
+    """(name, callable) per benchmarked entry point; every call picks a random budget key."""
+
+    def pick():
+        return frappe._dict(
+            company=context.company,
+            posting_date=add_days(context.year_start_date, rng.randint(0, get_elapsed_days(context))),
+            account=rng.choice(context.accounts),
+            branch=rng.choice(context.branches),
+            cost_center=rng.choice(context.cost_centers),
+            project=context.project,
+            department=context.department,
+        )
+
+    def validate():
+        args = pick()
+        validate_expense_against_budget(frappe._dict(args, doctype="Journal Entry"), 100)
+
+    def verify():
+        args = pick()
+        dimensions = {field: args[field] for field in ("branch", "cost_center", "project", "department")}
+        accounts = [
+            {"account": rng.choice(context.accounts), "debit_in_account_currency": 100, "debit": 100, **dimensions}
+            for _ in range(5)
+        ]
+        accounts.append({"account": context.credit_account, "credit_in_account_currency": 500, "credit": 500, **dimensions})
+        journal_entry = frappe.get_doc(
+            {"doctype": "Journal Entry", "company": context.company, "posting_date": args.posting_date, "accounts": accounts}
+        )
+        verify_validate_expense_against_budget(journal_entry, journal_entry.doctype)
+
+    def remaining():
+        args = pick()
+        fetch_remaining_budget(
+            frappe.as_json({"company": args.company, "posting_date": args.posting_date}),
+            args.account, args.branch, args.cost_center, args.project, args.department,
+        )
+
+    def remaining_for_item():
+        args = pick()
+        fetch_remaining_budget_for_item(
+            frappe.as_json({"company": args.company, "posting_date": args.posting_date}),
+            rng.choice(context.items), args.branch,
+        )
+
+    return (
+        ("validate_expense_against_budget", validate),
+        ("verify_validate_expense_against_budget", verify),
+        ("fetch_remaining_budget", remaining),
+        ("fetch_remaining_budget_for_item", remaining_for_item),
+    )
+
+
+def get_elapsed_days(context):
+    return max(date_diff(min(context.year_end_date, getdate(nowdate())), context.year_start_date), 0)
+
+
+def measure(case, iterations):
+    clear_budget_index()
+    clear_distribution_cache()
+    cold_seconds, cold_queries = timed_call(case)
+
+    latencies, queries = [], []
+    for _ in range(iterations):
+        seconds, count = timed_call(case)
+        latencies.append(seconds)
+        queries.append(count)
+
+    latencies.sort()
+    return {
+        "cold_ms": round(cold_seconds * 1000, 3),
+        "cold_queries": cold_queries,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0,
+        "queries_per_call": round(sum(queries) / len(queries), 2) if queries else 0,
+        "max_queries": max(queries, default=0),
+    }
+
+
+def timed_call(case):
+    with count_queries() as counter:
+        started = time.perf_counter()
+        case()
+        seconds = time.perf_counter() - started
+
+    frappe.clear_messages()
+    frappe.db.rollback()
+    return seconds, counter["count"]
+
+
+def percentile(sorted_values, percent):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+@contextmanager
+def count_queries():
+    """Count the statements sent through frappe.db.sql (frappe.qb and get_value go through it too)."""
+    counter = {"count": 0}
+    sql = frappe.db.sql
+
+    def counting_sql(*args, **kwargs):
+        counter["count"] += 1
+        return sql(*args, **kwargs)
+
+    frappe.db.sql = counting_sql
+    try:
+        yield counter
+    finally:
+        del frappe.db.sql
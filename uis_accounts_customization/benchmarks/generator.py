@@ -0,0 +1,292 @@
+"""
+Synthetic ledger for the UIS - Budget benchmarks.
+
+Builds a group company with one leaf company underneath it (Accounts, Cost Centers
+and Departments are created in the group and mirrored by company_tree_sync),
+branches, a seasonal Monthly Distribution, one submitted UIS - Budget per
+(branch, cost center) and then grows the GL Entry table to the requested size.
+
+Key facts
+─────────
+•  Everything is idempotent: running it again reuses the existing records
+•  GL Entries are bulk inserted (expense side only, voucher_no "UIS-BENCH-…"), not posted
+•  The consumption summaries are rebuilt after every growth step
+•  Budget amounts are large, so no benchmarked check is ever stopped
+"""
+
+import random
+
+import frappe
+from erpnext.accounts.utils import get_fiscal_year
+from frappe.utils import add_days, date_diff, getdate, now, nowdate
+
+from uis_accounts_customization.uis_accounts_customization.doctype.uis_asset_budget_consumption.uis_asset_budget_consumption import (
+    get_asset_consumption_name,
+)
+from uis_accounts_customization.uis_accounts_customization.doctype.uis_budget_consumption.uis_budget_consumption import (
+    build_budget_consumption,
+)
+
+GROUP_COMPANY = ("UIS Bench Group", "UBG")
+LEAF_COMPANY = ("UIS Bench Company", "UBC")
+PREFIX = "UIS Bench"
+VOUCHER_PREFIX = "UIS-BENCH-"
+MONTHLY_DISTRIBUTION = "UIS Bench Seasonal"
+SEASONAL_PERCENTAGES = (6, 6, 8, 8, 8, 9, 9, 9, 9, 9, 9, 10)
+BUDGET_AMOUNT = 10**12
+
+GL_FIELDS = (
+    "name", "creation", "modified", "owner", "modified_by", "docstatus",
+    "company", "fiscal_year", "posting_date", "account", "account_currency",
+    "debit", "credit", "debit_in_account_currency", "credit_in_account_currency",
+    "voucher_type", "voucher_no", "remarks", "is_cancelled",
+    "branch", "cost_center", "project", "department",
+)
+
+
+# ──────────────────────────────────────────────────────────
+# 1 ▸ Masters and budgets
+# ──────────────────────────────────────────────────────────
+def setup(branches=10, cost_centers=10, accounts=20, items=20):
+    """Create (or reuse) the benchmark masters and budgets; returns the context used by the runner."""
+    group, leaf = _make_companies()
+    fiscal_year, year_start, year_end = get_fiscal_year(nowdate(), company=leaf)
+    asset_category = _make_asset_category(leaf)
+
+    context = frappe._dict(
+        company=leaf,
+        fiscal_year=fiscal_year,
+        year_start_date=getdate(year_start),
+        year_end_date=getdate(year_end),
+        currency=frappe.get_cached_value("Company", leaf, "default_currency"),
+        branches=[_make_branch(f"{PREFIX} Branch {i:03d}", leaf) for i in range(branches)],
+        cost_centers=_make_mirrored("Cost Center", group, leaf, cost_centers),
+        accounts=_make_mirrored("Account", group, leaf, accounts),
+        department=_make_mirrored("Department", group, leaf, 1)[0],
+        project=_make_project(leaf),
+        items=[_make_item(f"{PREFIX} Asset {i:03d}", asset_category) for i in range(items)],
+        monthly_distribution=_make_monthly_distribution(),
+    )
+    context.credit_account = frappe.get_cached_value("Company", leaf, "default_cash_account") or frappe.db.get_value(
+        "Account", {"company": leaf, "account_type": "Cash", "is_group": 0}
+    )
+
+    for branch in context.branches:
+        for cost_center in context.cost_centers:
+            _make_budget(context, branch, cost_center)
+
+    frappe.db.commit()
+    return context
+
+
+def _make_companies():
+    country = frappe.db.get_default("country")
+    currency = frappe.db.get_default("currency")
+
+    names = []
+    for (company_name, abbr), parent in ((GROUP_COMPANY, None), (LEAF_COMPANY, GROUP_COMPANY[0])):
+        if not frappe.db.exists("Company", company_name):
+            frappe.get_doc(
+                {
+                    "doctype": "Company",
+                    "company_name": company_name,
+                    "abbr": abbr,
+                    "country": country,
+                    "default_currency": currency,
+                    "is_group": 0 if parent else 1,
+                    "parent_company": parent,
+                    "create_chart_of_accounts_based_on": "Existing Company" if parent else "Standard Template",
+                    "existing_company": parent,
+                }
+            ).insert()
+        names.append(company_name)
+
+    return names
+
+
+def _make_mirrored(doctype, group, leaf, count):
+    """Leaf records of *doctype*, created in the group company and mirrored to the leaf."""
+    group_abbr, leaf_abbr = (frappe.get_cached_value("Company", company, "abbr") for company in (group, leaf))
+    label = {"Cost Center": "CC", "Account": "Expense", "Department": "Department"}[doctype]
+
+    names = []
+    for i in range(count):
+        base = f"{PREFIX} {label} {i:03d}"
+        if not frappe.db.exists(doctype, f"{base} - {leaf_abbr}"):
+            frappe.get_doc(_get_mirrored_doc(doctype, base, group, group_abbr)).insert()
+        names.append(f"{base} - {leaf_abbr}")
+
+    return names
+
+
+def _get_mirrored_doc(doctype, base, company, abbr):
+    if doctype == "Cost Center":
+        return {
+            "doctype": doctype,
+            "cost_center_name": base,
+            "parent_cost_center": frappe.db.get_value("Cost Center", {"company": company, "is_group": 1}),
+            "company": company,
+        }
+    if doctype == "Account":
+        return {
+            "doctype": doctype,
+            "account_name": base,
+            "parent_account": f"Indirect Expenses - {abbr}",
+            "root_type": "Expense",
+            "report_type": "Profit and Loss",
+            "company": company,
+        }
+    return {"doctype": doctype, "department_name": base, "company": company}
+
+
+def _make_branch(name, company):
+    if not frappe.db.exists("Branch", name):
+        branch = frappe.get_doc({"doctype": "Branch", "branch": name})
+        if branch.meta.has_field("custom_company"):
+            branch.custom_company = company
+        branch.insert()
+    return name
+
+
+def _make_project(company):
+    name = frappe.db.get_value("Project", {"project_name": f"{PREFIX} Project", "company": company})
+    if not name:
+        name = frappe.get_doc({"doctype": "Project", "project_name": f"{PREFIX} Project", "company": company}).insert().name
+    return name
+
+
+def _make_asset_category(company):
+    name = f"{PREFIX} Asset Category"
+    if not frappe.db.exists("Asset Category", name):
+        frappe.get_doc(
+            {
+                "doctype": "Asset Category",
+                "asset_category_name": name,
+                "accounts": [
+                    {
+                        "company_name": company,
+                        "fixed_asset_account": _get_leaf_account(company, "Fixed Asset"),
+                        "accumulated_depreciation_account": _get_leaf_account(company, "Accumulated Depreciation"),
+                        "depreciation_expense_account": _get_leaf_account(company, "Depreciation"),
+                    }
+                ],
+            }
+        ).insert()
+    return name
+
+
+def _get_leaf_account(company, account_type):
+    return frappe.db.get_value("Account", {"company": company, "account_type": account_type, "is_group": 0})
+
+
+def _make_item(item_code, asset_category):
+    if not frappe.db.exists("Item", item_code):
+        frappe.get_doc(
+            {
+                "doctype": "Item",
+                "item_code": item_code,
+                "item_name": item_code,
+                "item_group": frappe.db.get_value("Item Group", {"is_group": 0}),
+                "stock_uom": "Nos",
+                "is_stock_item": 0,
+                "is_fixed_asset": 1,
+                "asset_category": asset_category,
+            }
+        ).insert()
+    return item_code
+
+
+def _make_monthly_distribution():
+    if not frappe.db.exists("Monthly Distribution", MONTHLY_DISTRIBUTION):
+        distribution = frappe.new_doc("Monthly Distribution")
+        distribution.distribution_id = MONTHLY_DISTRIBUTION
+        distribution.get_months()
+        for row, percentage in zip(distribution.percentages, SEASONAL_PERCENTAGES):
+            row.percentage_allocation = percentage
+        distribution.insert()
+    return MONTHLY_DISTRIBUTION
+
+
+def _make_budget(context, branch, cost_center):
+    filters = {"company": context.company, "fiscal_year": context.fiscal_year, "branch": branch, "cost_center": cost_center}
+    if frappe.db.exists("UIS - Budget", dict(filters, docstatus=1)):
+        return
+
+    frappe.get_doc(
+        {
+            "doctype": "UIS - Budget",
+            **filters,
+            "project": context.project,
+            "department": context.department,
+            "monthly_distribution": context.monthly_distribution,
+            "applicable_on_booking_actual_expenses": 1,
+            "action_if_annual_budget_exceeded": "Stop",
+            "action_if_accumulated_monthly_budget_exceeded": "Warn",
+            "accounts": [{"account": account, "budget_amount": BUDGET_AMOUNT} for account in context.accounts],
+            "fixed_assest": [{"item_code": item_code, "budget_amount": BUDGET_AMOUNT} for item_code in context.items],
+        }
+    ).submit()
+
+
+# ──────────────────────────────────────────────────────────
+# 2 ▸ Ledger
+# ──────────────────────────────────────────────────────────
+def get_gl_entry_count(context):
+    return frappe.db.count("GL Entry", {"company": context.company, "voucher_no": ["like", f"{VOUCHER_PREFIX}%"]})
+
+
+def ensure_gl_entries(context, size, chunk_size=20000, seed=0):
+    """Grow the benchmark ledger to *size* GL Entries; returns the number of rows inserted."""
+    existing = get_gl_entry_count(context)
+    missing = max(int(size) - existing, 0)
+    if not missing:
+        return 0
+
+    rng = random.Random(seed + existing)
+    days = max(date_diff(min(context.year_end_date, getdate(nowdate())), context.year_start_date), 0)
+    timestamp, user = now(), frappe.session.user
+
+    for start in range(existing, existing + missing, chunk_size):
+        rows = []
+        for number in range(start, min(start + chunk_size, existing + missing)):
+            amount = rng.randint(10, 1000)
+            rows.append(
+                (
+                    f"{VOUCHER_PREFIX}GLE-{number:010d}", timestamp, timestamp, user, user, 1,
+                    context.company, context.fiscal_year,
+                    add_days(context.year_start_date, rng.randint(0, days)),
+                    rng.choice(context.accounts), context.currency,
+                    amount, 0, amount, 0,
+                    "Journal Entry", f"{VOUCHER_PREFIX}{number // 2:010d}", "UIS budget benchmark", 0,
+                    rng.choice(context.branches), rng.choice(context.cost_centers),
+                    context.project, context.department,
+                )
+            )
+        frappe.db.bulk_insert("GL Entry", GL_FIELDS, rows)
+        frappe.db.commit()
+
+    build_budget_consumption(company=context.company, fiscal_year=context.fiscal_year)
+    _make_asset_consumption(context, rng)
+    frappe.db.commit()
+    return missing
+
+
+def _make_asset_consumption(context, rng):
+    """One summary bucket per (branch, item); stands in for submitted fixed asset Purchase Invoices."""
+    timestamp, user = now(), frappe.session.user
+    rows = []
+    for branch in context.branches:
+        for item_code in context.items:
+            key = (context.company, context.fiscal_year, branch, item_code)
+            rows.append((get_asset_consumption_name(key), timestamp, timestamp, user, user, 0, *key, rng.randint(1000, 100000)))
+
+    frappe.db.sql(
+        "DELETE FROM `tabUIS Asset Budget Consumption` WHERE company = %s AND fiscal_year = %s",
+        (context.company, context.fiscal_year),
+    )
+    frappe.db.bulk_insert(
+        "UIS Asset Budget Consumption",
+        ("name", "creation", "modified", "owner", "modified_by", "docstatus",
+         "company", "fiscal_year", "branch", "item_code", "amount"),
+        rows,
+    )
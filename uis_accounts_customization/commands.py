@@ -0,0 +1,49 @@
+import click
+import frappe
+from frappe.commands import get_site, pass_context
+
+
+@click.command("rebuild-budget-consumption")
+@click.option("--company", help="Only rebuild buckets of this company")
+@click.option("--fiscal-year", help="Only rebuild buckets of this fiscal year")
+@pass_context
+def rebuild_budget_consumption(context, company=None, fiscal_year=None):
+    "Repopulate UIS Budget Consumption and UIS Asset Budget Consumption from GL Entries / Purchase Invoices"
+    from uis_accounts_customization.uis_accounts_customization.doctype.uis_asset_budget_consumption.uis_asset_budget_consumption import (
+        build_asset_budget_consumption,
+    )
+    from uis_accounts_customization.uis_accounts_customization.doctype.uis_budget_consumption.uis_budget_consumption import (
+        build_budget_consumption,
+    )
+
+    site = get_site(context)
+    frappe.init(site=site)
+    frappe.connect()
+    try:
+        build_budget_consumption(company=company, fiscal_year=fiscal_year)
+        build_asset_budget_consumption(company=company, fiscal_year=fiscal_year)
+        frappe.db.commit()
+    finally:
+        frappe.destroy()
+
+
+@click.command("budget-benchmark")
+@click.option("--sizes", default="100000,1000000", help="Comma separated GL Entry counts to benchmark at")
+@click.option("--iterations", default=100, type=int, help="Warm calls per case and size")
+@click.option("--output", help="Path of the JSON report")
+@pass_context
+def budget_benchmark(context, sizes, iterations, output=None):
+    "Time the UIS - Budget checks on a generated ledger and write the results as JSON"
+    from uis_accounts_customization.benchmarks.budget import run
+
+    site = get_site(context)
+    frappe.init(site=site)
+    frappe.connect()
+    try:
+        report = run(sizes=[int(size) for size in sizes.split(",") if size.strip()], iterations=iterations, output=output)
+        click.echo(f"Budget benchmark written to {report['output']}")
+    finally:
+        frappe.destroy()
+
+
+commands = [rebuild_budget_consumption, budget_benchmark]
@@ -1,64 +1,57 @@
+// One request for the whole invoice, coalescing bursts of row / header changes
+const update_allocated_budget = frappe.utils.debounce((frm) => {
+    if (frm.doc.docstatus !== 0 || !(frm.doc.items || []).length) {
+        return
+    }
+    frm.call({
+        method:"uis_accounts_customization.customization_script.budget.fetch_remaining_budget_for_document",
+        args :{
+            doc:frm.doc,
+        },
+        callback:(response)=>{
+            const remaining_budget = response.message || {};
+            (frm.doc.items || []).forEach(item => {
+                if (item.name in remaining_budget && item.custom_allocated_budget !== remaining_budget[item.name]) {
+                    frappe.model.set_value(item.doctype, item.name, "custom_allocated_budget", remaining_budget[item.name])
+                }
+            });
+        }
+
+    })
+}, 500);
+
 frappe.ui.form.on("Purchase Invoice", {
     branch: function(frm) {
         frm.doc.items.forEach(item => {
             frappe.model.set_value(item.doctype, item.name, "branch", frm.doc.branch);
         });
-    }
+        update_allocated_budget(frm);
+    },
+
+    cost_center(frm){
+        update_allocated_budget(frm)
+    },
+
+    project(frm){
+        update_allocated_budget(frm)
+    },
+
+    department(frm){
+        update_allocated_budget(frm)
+    },
 })
 
 frappe.ui.form.on("Purchase Invoice Item", {
 
     expense_account(frm){
-        if(! frm.selected_doc.expense_account || ! frm.doc.branch){
-            frappe.model.set_value(frm.selected_doc.doctype, frm.selected_doc.name, "custom_allocated_budget", 0)
-            return
-        }
-        frm.call({
-            method:"uis_accounts_customization.customization_script.budget.fetch_remaining_budget",
-            args :{
-                doc:frm.doc,
-                expense_account : frm.selected_doc.expense_account, 
-                branch : frm.doc.branch, 
-                cost_center : frm.doc.cost_center, project : 
-                frm.doc.project, department : frm.doc.department,
-
-            },
-            callback:(response)=>{
-                if(response.message){
-                    frappe.model.set_value(frm.selected_doc.doctype, frm.selected_doc.name, "custom_allocated_budget", response.message.remaining_budget)
-                }
-            }
-
-        })
+        update_allocated_budget(frm)
     },
 
     item_code(frm){
-        
-        frm.trigger("expense_account", frm.selected_doc.doctype, frm.selected_doc.name)
-
-        if(! frm.doc.branch || ! frm.selected_doc.item_code){
-            frappe.model.set_value(frm.selected_doc.doctype, frm.selected_doc.name, "custom_allocated_budget", 0)
-            return
-        }
-        frm.call({
-            method:"uis_accounts_customization.customization_script.budget.fetch_remaining_budget_for_item",
-            args :{
-                doc:frm.doc, 
-                branch : frm.doc.branch, 
-                cost_center : frm.doc.cost_center, project : 
-                frm.doc.project, department : frm.doc.department,
-                item_code : frm.selected_doc.item_code 
-            },
-            callback:(response)=>{
-                if(response.message){
-                    frappe.model.set_value(frm.selected_doc.doctype, frm.selected_doc.name, "custom_allocated_budget", response.message.remaining_budget)
-                }
-            }
-
-        })
+        update_allocated_budget(frm)
     },
 
     branch(frm){
-        frm.trigger("expense_account", frm.selected_doc.doctype, frm.selected_doc.name)
+        update_allocated_budget(frm)
     }
-})
\ No newline at end of file
+})
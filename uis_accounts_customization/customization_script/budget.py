@@ -1,93 +1,445 @@
 import frappe
 
-from erpnext.accounts.utils import get_fiscal_year
 from erpnext.accounts.doctype.budget.budget import (
-    get_item_details, get_actions, get_accumulated_monthly_budget,
+    get_item_details, get_actions,
     get_requested_amount, get_ordered_amount, BudgetError, get_expense_breakup
 )
-from frappe.utils import flt, get_last_day, fmt_money
+from frappe.utils import flt, get_last_day, getdate, fmt_money
 from frappe import _
 
+from uis_accounts_customization.uis_accounts_customization.doctype.uis_budget_consumption.uis_budget_consumption import (
+    get_consumed_amount, get_consumption_rows, get_locked_consumption_rows, sum_consumption,
+)
+from uis_accounts_customization.uis_accounts_customization.doctype.uis_asset_budget_consumption.uis_asset_budget_consumption import (
+    get_asset_consumed_amounts,
+)
+from uis_accounts_customization.customization_script.budget_index import (
+    get_account_budget_lines, get_budget_allow_list, get_budget_lines, get_budgeted_companies,
+    get_item_budget_lines, has_budget,
+)
+from uis_accounts_customization.customization_script.fiscal_year import get_fiscal_year_dates, get_fiscal_year_name
+from uis_accounts_customization.customization_script.budget_reservation import (
+    get_locking_clause, is_budget_locked, lock_budget_lines,
+)
+from uis_accounts_customization.customization_script.monthly_distribution import get_accumulated_monthly_budget
+
+# Entries sharing all of these values are one budget check
+BUDGET_KEY_FIELDS = (
+    "doctype", "company", "fiscal_year", "posting_date", "account", "expense_account",
+    "item_code", "branch", "cost_center", "project", "department",
+)
+BUDGET_ACTIONS = ("Stop", "Warn")
+# Voucher types whose posted GL entries are kept for their on_submit budget check
+GL_CHECKED_VOUCHER_TYPES = ("Journal Entry", "Purchase Invoice")
+POSTED_GL_FIELDS = (
+    "company", "posting_date", "fiscal_year", "account", "debit", "credit",
+    "branch", "cost_center", "project", "department",
+)
+DIMENSION_FIELDS = ("branch", "cost_center", "project", "department")
+# Budget message breakups are worked out on demand, from these args kept for BREAKUP_TTL seconds
+BREAKUP_CACHE_KEY = "uis_budget_breakup"
+BREAKUP_TTL = 900
+BREAKUP_FIELDS = (
+    "doctype", "company", "fiscal_year", "posting_date", "account", "expense_account", "item_code",
+    "budget_against_field", "branch", "cost_center", "project", "department",
+    "actual_expense", "ordered_amount",
+)
+
 def verify_validate_expense_against_budget(doc, for_dt = None):
+    if not has_budget(doc.company):
+        return
+
+    entries = pop_posted_gl_entries(doc)
+    if entries is None:
+        # nothing captured, the posting was deferred (e.g. a repost): build the GL map again
+        entries = get_gl_budget_entries(doc, for_dt)
+    validate_expenses_against_budget(entries, doc)
+
+def capture_posted_gl_entry(gl_entry):
+    """
+    GL Entry on_submit: keep the entry for the budget check of its voucher, so the check reads
+    the GL map ERPNext just posted instead of building it again. Kept for the current request only.
+    """
+    if gl_entry.is_cancelled or gl_entry.voucher_type not in GL_CHECKED_VOUCHER_TYPES:
+        return
+    if not has_budget(gl_entry.company):
+        return
+
+    posted = getattr(frappe.local, "uis_posted_gl_entries", None)
+    if posted is None:
+        posted = frappe.local.uis_posted_gl_entries = {}
+
+    entry = frappe._dict({field: gl_entry.get(field) for field in POSTED_GL_FIELDS})
+    posted.setdefault((gl_entry.voucher_type, gl_entry.voucher_no), []).append(
+        (entry, flt(entry.debit) - flt(entry.credit))
+    )
+
+def pop_posted_gl_entries(doc):
+    """Entries captured while *doc* was posted; None when nothing was captured."""
+    posted = getattr(frappe.local, "uis_posted_gl_entries", None)
+    if not posted:
+        return None
+    return posted.pop((doc.doctype, doc.name), None)
+
+def get_gl_budget_entries(doc, for_dt=None):
     if for_dt is not None:
         gl_entries = doc.build_gl_map()
     else:
         gl_entries = doc.get_gl_entries()
-    for entry in gl_entries:
-        validate_expense_against_budget(entry, expense_amount=flt(entry.debit) - flt(entry.credit))
+    return [(entry, flt(entry.debit) - flt(entry.credit)) for entry in gl_entries]
+
+def get_order_budget_entries(doc):
+    """(args, 0) per item row of a Purchase Order / Material Request, checked on ordered / requested amounts."""
+    entries = []
+    for data in doc.get("items"):
+        args = data.as_dict()
+        args.update(
+            {
+                "doctype": doc.doctype,
+                "company": doc.company,
+                "posting_date": (
+                    doc.schedule_date
+                    if doc.doctype == "Material Request"
+                    else doc.transaction_date
+                ),
+            }
+        )
+        entries.append((args, 0))
+    return entries
+
+def get_draft_budget_entries(doc):
+    """
+    (args, 0) per account row of a Purchase Invoice / Journal Entry about to be submitted:
+    the accounts and dimensions its GL entries will carry, without building the GL map.
+    """
+    rows = [(row, row.get("expense_account") or row.get("account")) for row in doc.get("items") or doc.get("accounts") or []]
+    rows.extend((row, row.get("account_head")) for row in doc.get("taxes") or [])
+
+    entries = []
+    for row, account in rows:
+        if not account:
+            continue
+        args = frappe._dict(company=doc.company, posting_date=doc.posting_date, account=account)
+        for field in DIMENSION_FIELDS:
+            args[field] = row.get(field) or doc.get(field)
+        entries.append((args, 0))
+    return entries
+
+def reserve_budget(doc, method=None):
+    """
+    before_submit: lock the UIS - Budget lines the document can consume until its transaction ends,
+    so parallel submissions against the same line are checked one after the other.
+    """
+    if not has_budget(doc.company):
+        return
+
+    if doc.doctype in ("Purchase Order", "Material Request"):
+        entries = get_order_budget_entries(doc)
+    else:
+        entries = get_draft_budget_entries(doc)
+
+    account_lines, item_lines = set(), set()
+    for args, _amount in group_entries_by_budget_key(entries).values():
+        lines = get_budget_lines(
+            args.company, args.fiscal_year, args.account, args.branch,
+            args.cost_center, args.project, args.department,
+        )
+        if lines and args.item_code and args.expense_account:
+            # requested / ordered amounts are read across branches, so hold every line of the account
+            lines = get_account_budget_lines(args.company, args.fiscal_year, args.account)
+        # a Warn never blocks the submission, only Stop lines need to be held
+        account_lines.update(line.budget_line for line in lines if "Stop" in get_actions(args, line))
+
+    if doc.doctype == "Purchase Invoice":
+        fiscal_year = get_fiscal_year_name(doc.posting_date, doc.company)
+        for item_code in {row.item_code for row in doc.items if row.is_fixed_asset and row.item_code}:
+            item_lines.update(
+                line.budget_line for line in get_item_budget_lines(doc.company, fiscal_year, item_code, doc.branch)
+            )
+
+    lock_budget_lines(account_lines, item_lines)
 
 def validate_expense_against_budget(args, expense_amount=0):
-    args = frappe._dict(args)
-    if not frappe.get_all("UIS - Budget", limit=1):
+    validate_expenses_against_budget([(args, expense_amount)])
+
+def validate_expenses_against_budget(entries, doc=None, actions=None):
+    """
+    Validate (args, expense_amount) pairs against UIS - Budget.
+
+    Entries are grouped per budget key (amounts added up) and the budget lines,
+    actual and ordered amounts of all groups are loaded up front with
+    grouped queries, so the cost follows the number of distinct keys, not rows.
+
+    Only budget actions in *actions* are evaluated. When Warn checks are deferred in
+    UIS Budget Settings, submitting *doc* evaluates Stop only and queues the Warn checks.
+    """
+    if not get_budgeted_companies():
         return
 
-    if args.get("company") and not args.get('fiscal_year'):
-        args.fiscal_year = get_fiscal_year(args.get("posting_date"), company=args.get("company"))[0]
-    
-    frappe.flags.exception_approver_role = frappe.get_cached_value(
-        "Company", args.get("company"), "exception_budget_approver_role"
-    )
+    if actions is None:
+        actions = ("Stop",) if doc is not None and is_warn_deferred() else BUDGET_ACTIONS
 
-    if not frappe.get_cached_value("UIS - Budget", {"fiscal_year": args.fiscal_year, "company": args.company}):
+    groups = group_entries_by_budget_key(entries)
+    if not groups:
         return
 
+    batch = prefetch_budget_data(groups, actions)
+    if doc is not None and "Warn" in batch.skipped_actions:
+        enqueue_deferred_warnings(doc)
+
+    for key, (args, expense_amount) in groups.items():
+        budget_records = batch.budget_records.get(key)
+        if not budget_records:
+            continue
+
+        frappe.flags.exception_approver_role = frappe.get_cached_value(
+            "Company", args.get("company"), "exception_budget_approver_role"
+        )
+        validate_budget_records(args, budget_records, expense_amount, batch, actions)
+
+def group_entries_by_budget_key(entries):
+    groups, fiscal_years = {}, {}
+
+    for entry, expense_amount in entries:
+        args = get_budget_args(entry, fiscal_years)
+        if not args:
+            continue
+
+        key = tuple(args.get(field) for field in BUDGET_KEY_FIELDS)
+        if key in groups:
+            groups[key][1] += flt(expense_amount)
+        else:
+            groups[key] = [args, flt(expense_amount)]
+
+    return groups
+
+def get_budget_args(entry, fiscal_years, item_details=None):
+    """
+    Budget check args of one entry, with fiscal year and account filled in; None when no
+    budget can apply. *fiscal_years* caches fiscal years per (posting date, company), and
+    *item_details* (from `get_batch_item_details`) the item defaults per (item_code, company).
+    """
+    args = frappe._dict(entry)
+    if not has_budget(args.get("company")):
+        return None
+
+    if args.get("company") and not args.get("fiscal_year"):
+        fiscal_year_key = (args.get("posting_date"), args.get("company"))
+        if fiscal_year_key not in fiscal_years:
+            fiscal_years[fiscal_year_key] = get_fiscal_year_name(args.get("posting_date"), args.get("company"))
+        args.fiscal_year = fiscal_years[fiscal_year_key]
+
+    if not has_budget(args.company, args.fiscal_year):
+        return None
+
     if not args.account:
         args.account = args.get("expense_account")
-    
+
     if not (args.get("account") and args.get("cost_center")) and args.item_code:
-        args.cost_center, args.account = get_item_details(args)
+        details = (item_details or {}).get((args.item_code, args.company))
+        args.cost_center, args.account = details or get_item_details(args)
 
-    if not args.account:
-        return
+    return args if args.account else None
 
-    filters = {
-        "cost_center": "b.cost_center",
-        "project": "b.project",
-        "department": "b.department"
+def get_batch_item_details(entries):
+    """
+    {(item_code, company): (cost center, expense account)} for the entries missing either, as
+    `get_item_details` gives them (item, then item group, then company defaults), with one
+    Item Default query for all of them.
+    """
+    wanted = {
+        (entry.item_code, entry.company): entry.get("item_group")
+        for entry in entries
+        if entry.item_code and entry.company and not (entry.get("account") and entry.get("cost_center"))
     }
+    if not wanted:
+        return {}
+
+    defaults = {}
+    for row in frappe.get_all(
+        "Item Default",
+        filters={
+            "parent": ("in", {item_code for item_code, _company in wanted} | {group for group in wanted.values() if group}),
+            "company": ("in", {company for _item_code, company in wanted}),
+        },
+        fields=["parent", "company", "buying_cost_center", "expense_account"],
+    ):
+        defaults.setdefault((row.parent, row.company), (row.buying_cost_center, row.expense_account))
+
+    details = {}
+    for (item_code, company), item_group in wanted.items():
+        cost_center, expense_account = defaults.get((item_code, company)) or (None, None)
+        fallbacks = [
+            defaults.get((item_group, company)) if item_group else None,
+            frappe.get_cached_value("Company", company, ["cost_center", "default_expense_account"]),
+        ]
+        for fallback in fallbacks:
+            if cost_center and expense_account:
+                break
+            if fallback:
+                cost_center, expense_account = cost_center or fallback[0], expense_account or fallback[1]
+        details[(item_code, company)] = (cost_center, expense_account)
+
+    return details
+
+def prefetch_budget_data(groups, actions=BUDGET_ACTIONS):
+    """
+    Load budget lines and the amounts compared against them for every group in one go.
+    Lines without any of *actions* are left out; the actions left out are kept in `skipped_actions`.
+    """
+    batch = frappe._dict(
+        budget_records={}, consumption={}, ordered_amounts={}, skipped_actions=set(), memo={}
+    )
 
-    query_params = [args.get("fiscal_year"), args.get("account"), args.get("branch")]
-
-    # Only append dynamic filters if you will use them
-    dynamic_conditions = []
-    for field, column in filters.items():
-        if args.get(field):
-            dynamic_conditions.append(f"{column} = '{args.get(field).strip()}'")  # Note: hardcoding into query if needed
-
-    query = f"""
-        SELECT
-            b.name as budget_name,
-            b.branch as budget_against,
-            ba.budget_amount,
-            b.monthly_distribution,
-            COALESCE(b.applicable_on_material_request, 0) AS for_material_request,
-            COALESCE(b.applicable_on_purchase_order, 0) AS for_purchase_order,
-            COALESCE(b.applicable_on_booking_actual_expenses, 0) AS for_actual_expenses,
-            b.action_if_annual_budget_exceeded,
-            b.action_if_accumulated_monthly_budget_exceeded,
-            b.action_if_annual_budget_exceeded_on_mr,
-            b.action_if_accumulated_monthly_budget_exceeded_on_mr,
-            b.action_if_annual_budget_exceeded_on_po,
-            b.action_if_accumulated_monthly_budget_exceeded_on_po
-        FROM `tabUIS - Budget` b
-        INNER JOIN `tabBudget Account` ba ON b.name = ba.parent
-        WHERE
-            b.fiscal_year = %s
-            AND ba.account = %s
-            AND b.branch = %s
-            AND b.docstatus = 1
+    for key, (args, _amount) in groups.items():
+        records = []
+        for record in get_budget_lines(
+            args.company, args.fiscal_year, args.account, args.branch,
+            args.cost_center, args.project, args.department,
+        ):
+            record_actions = set(get_actions(args, record)).intersection(BUDGET_ACTIONS)
+            batch.skipped_actions.update(record_actions.difference(actions))
+            if record_actions.intersection(actions):
+                records.append(record)
+
+        if records:
+            batch.budget_records[key] = records
+
+    checked_args = [groups[key][0] for key in batch.budget_records]
+    if not checked_args:
+        return batch
+
+    if is_budget_locked():
+        batch.consumption = get_locked_consumption_rows(
+            [
+                get_budget_scope(frappe._dict(groups[key][0], budget_scope=record))
+                for key, records in batch.budget_records.items()
+                for record in records
+            ]
+        )
+    else:
+        batch.consumption = get_consumption_rows(
+            {args.fiscal_year for args in checked_args}, {args.account for args in checked_args}
+        )
+    batch.ordered_amounts = get_ordered_amounts(
+        [args for args in checked_args if args.item_code and args.expense_account]
+    )
+
+    return batch
+
+def get_ordered_amounts(item_args):
+    """
+    Pending Purchase Order amounts per (fiscal year, item, expense account, branch),
+    matching ERPNext's get_ordered_amount for rows carrying an item.
+    Requested (Material Request) amounts only show in the expense breakup and are read there.
+    """
+    ordered_amounts = {}
+    locking_clause = get_locking_clause()
+    args_by_fiscal_year = {}
+    for args in item_args:
+        args_by_fiscal_year.setdefault(args.fiscal_year, []).append(args)
+
+    for fiscal_year, fiscal_year_args in args_by_fiscal_year.items():
+        dates = get_fiscal_year_dates(fiscal_year)
+        filters = {
+            "item_codes": tuple({args.item_code for args in fiscal_year_args}),
+            "expense_accounts": tuple({args.expense_account for args in fiscal_year_args}),
+            "start_date": dates.year_start_date,
+            "end_date": dates.year_end_date,
+        }
+
+        for row in frappe.db.sql(
+            f"""
+            SELECT child.item_code, child.expense_account, child.branch,
+                SUM(child.amount - child.billed_amt) AS amount
+            FROM `tabPurchase Order Item` child, `tabPurchase Order` parent
+            WHERE parent.name = child.parent
+                AND child.item_code IN %(item_codes)s
+                AND child.expense_account IN %(expense_accounts)s
+                AND parent.docstatus = 1
+                AND child.amount > child.billed_amt
+                AND parent.status != 'Closed'
+                AND parent.transaction_date BETWEEN %(start_date)s AND %(end_date)s
+            GROUP BY child.item_code, child.expense_account, child.branch
+            {locking_clause}
+            """,
+            filters,
+            as_dict=True,
+        ):
+            ordered_amounts[(fiscal_year, row.item_code, row.expense_account, row.branch)] = flt(row.amount)
+
+    return ordered_amounts
+
+def get_batch_amounts(batch, args):
+    """
+    (actual, ordered) amounts of *args*, worked out once per budget key within one check,
+    so the monthly and annual comparisons (and repeated keys) share them.
     """
+    scope = get_budget_scope(args)
+    key = (
+        tuple(scope.get(field) for field in ("company", "fiscal_year", "account") + DIMENSION_FIELDS),
+        scope.cost_centers, args.get(args.budget_against_field), args.item_code, args.expense_account,
+        args.get("month_end_date"),
+    )
+    if key not in batch.memo:
+        batch.memo[key] = (
+            sum_consumption(batch.consumption, scope, scope.cost_centers),
+            get_batch_commitment(batch.ordered_amounts, args),
+        )
+    return batch.memo[key]
 
-    # Optional: add dynamic conditions inline
-    if dynamic_conditions:
-        query += f"And ({' And '.join(dynamic_conditions)})"
+def get_budget_scope(args):
+    """
+    Consumption filters of the budget line being checked: the line's own dimensions, so wildcard
+    lines add up every value and a group cost center its whole subtree.
+    """
+    line = args.get("budget_scope")
+    if not line:
+        return frappe._dict(args, cost_centers=None)
+
+    cost_centers = line.get("cost_centers")
+    return frappe._dict(
+        company=args.company,
+        fiscal_year=args.fiscal_year,
+        account=args.account,
+        month_end_date=args.get("month_end_date"),
+        branch=line.budget_against,
+        cost_center=None if cost_centers is not None else line.cost_center,
+        project=line.project,
+        department=line.department,
+        cost_centers=cost_centers,
+    )
 
-    budget_records = frappe.db.sql(query, tuple(query_params), as_dict=True)  # nosec
+def get_batch_commitment(amounts, args):
+    """Pick the prefetched ordered amount of *args* (all branches when it has none)."""
+    if not (args.item_code and args.expense_account):
+        return 0.0
 
-    if budget_records:
-        validate_budget_records(args, budget_records, expense_amount)
+    return sum(
+        amount
+        for (fiscal_year, item_code, expense_account, branch), amount in amounts.items()
+        if (fiscal_year, item_code, expense_account) == (args.fiscal_year, args.item_code, args.expense_account)
+        and (not args.get(args.budget_against_field) or branch == args.get(args.budget_against_field))
+    )
 
-def validate_budget_records(args, budget_records, expense_amount):
+def validate_budget_records(args, budget_records, expense_amount, batch=None, actions=BUDGET_ACTIONS):
+    for budget, budget_amount, action_for, action in get_budget_checks(args, budget_records, actions):
+        compare_expense_with_budget(
+            args,
+            budget_amount,
+            action_for,
+            action,
+            budget.budget_against,
+            expense_amount,
+            batch,
+        )
+
+def get_budget_checks(args, budget_records, actions=BUDGET_ACTIONS):
+    """
+    Yield (budget line, budget amount, action for, action) per monthly / annual check of *args*,
+    with *args* set up for that check. The month end date set for a monthly check stays set
+    for the annual check after it, so both the real check and the simulation read the same actuals.
+    """
     for budget in budget_records:
         if flt(budget.budget_amount):
             yearly_action, monthly_action = get_actions(args, budget)
@@ -96,36 +448,26 @@ def validate_budget_records(args, budget_records, expense_amount):
             args["for_actual_expenses"] = budget.for_actual_expenses
             args['budget_against_field'] = "branch"
             args['budget_name'] =  budget.budget_name
-            
-            if monthly_action in ["Stop", "Warn"]:
+            args['budget_scope'] = budget
+
+            if monthly_action in actions:
                 budget_amount = get_accumulated_monthly_budget(
                     budget.monthly_distribution, args.posting_date, args.fiscal_year, budget.budget_amount
                 )
 
                 args["month_end_date"] = get_last_day(args.posting_date)
 
-                compare_expense_with_budget(
-                    args,
-                    budget_amount,
-                    _("Accumulated Monthly"),
-                    monthly_action,
-                    budget.budget_against,
-                    expense_amount,
-                )
+                yield budget, budget_amount, _("Accumulated Monthly"), monthly_action
 
-            if yearly_action in ("Stop", "Warn"):
-                compare_expense_with_budget(
-                    args,
-                    flt(budget.budget_amount),
-                    _("Annual"),
-                    yearly_action,
-                    budget.budget_against,
-                    expense_amount,
-                )
+            if yearly_action in actions:
+                yield budget, flt(budget.budget_amount), _("Annual"), yearly_action
 
-def compare_expense_with_budget(args, budget_amount, action_for, action, budget_against, amount=0):
-    args.actual_expense = get_actual_expense(args)
-    args.requested_amount, args.ordered_amount = get_requested_amount(args), get_ordered_amount(args)
+def compare_expense_with_budget(args, budget_amount, action_for, action, budget_against, amount=0, batch=None):
+    if batch:
+        args.actual_expense, args.ordered_amount = get_batch_amounts(batch, args)
+    else:
+        args.actual_expense = get_actual_expense(args)
+        args.ordered_amount = get_ordered_amount(args) if args.item_code and args.expense_account else 0.0
     
     total_expense = args.actual_expense + args.ordered_amount
     
@@ -144,9 +486,6 @@ def compare_expense_with_budget(args, budget_amount, action_for, action, budget_
             frappe.bold(fmt_money(diff, currency=currency)),
         )
         
-        msg += get_expense_breakup(args, currency, budget_against)
-        msg += "</ul>"
-        
         if frappe.flags.exception_approver_role and frappe.flags.exception_approver_role in frappe.get_roles(
             frappe.session.user
         ):
@@ -154,82 +493,118 @@ def compare_expense_with_budget(args, budget_amount, action_for, action, budget_
 
         if action == "Stop":
             if not is_user_allowed_for_transaction(args.budget_name):
-                frappe.throw(msg, BudgetError, title=_("Budget Exceeded"))
+                frappe.throw(msg + get_expense_breakup_link(args, currency, budget_against), BudgetError, title=_("Budget Exceeded"))
+        elif frappe.flags.uis_budget_warnings is not None:
+            # collected warnings are kept in a Comment, which outlives a breakup link
+            frappe.flags.uis_budget_warnings.append(msg + get_expense_breakup_html(args, currency, budget_against))
         else:
-            frappe.msgprint(msg, indicator="orange", title=_("Budget Exceeded"))
+            frappe.msgprint(msg + get_expense_breakup_link(args, currency, budget_against), indicator="orange", title=_("Budget Exceeded"))
 
-def get_actual_expense(args):
-    budget_against_field = args.get("budget_against_field")
-    condition1 = " and gle.posting_date <= %(month_end_date)s" if args.get("month_end_date") else ""
-    
-    conditions = []
-    filters = {"cost_center": "gle.cost_center", "project": "gle.project", "department": "gle.department", "branch": "gle.branch"}
-    for field, column in filters.items():
-        if args.get(field):
-            conditions.append(f"{column} = %({field})s")
-    
-    condition2 = " AND " + " AND ".join(conditions) if conditions else ""
-    
-    amount = flt(
-        frappe.db.sql(
-            f"""
-            select sum(gle.debit) - sum(gle.credit)
-            from `tabGL Entry` gle
-            where
-                is_cancelled = 0
-                and gle.account=%(account)s
-                {condition1}
-                and gle.fiscal_year=%(fiscal_year)s
-                and gle.company=%(company)s
-                and gle.docstatus=1
-                {condition2}
-            """,
-            args,
-        )[0][0] or 0
+def get_expense_breakup_link(args, currency, budget_against):
+    """
+    Link to the expense breakup of a budget message. The breakup itself (requested amounts and
+    report links) is only worked out when the link is opened; what it needs is cached until then,
+    so the link is only for messages shown right away.
+    """
+    token = frappe.generate_hash(length=16)
+    frappe.cache().set_value(
+        f"{BREAKUP_CACHE_KEY}::{token}",
+        {
+            "user": frappe.session.user,
+            "currency": currency,
+            "budget_against": budget_against,
+            "args": {field: args.get(field) for field in BREAKUP_FIELDS},
+        },
+        expires_in_sec=BREAKUP_TTL,
     )
-    return amount
+    return '<br><a class="uis-budget-breakup" data-token="{0}">{1}</a>'.format(token, _("View Expense Breakup"))
+
+@frappe.whitelist()
+def get_budget_expense_breakup(token):
+    """HTML expense breakup behind a budget message link, computed on first open and cached with it."""
+    key = f"{BREAKUP_CACHE_KEY}::{token}"
+    context = frappe.cache().get_value(key)
+    if not context or context["user"] != frappe.session.user:
+        frappe.throw(_("This budget message has expired. Check the budget again to see its breakup."))
+
+    if context.get("html") is None:
+        context["html"] = get_expense_breakup_html(context["args"], context["currency"], context["budget_against"])
+        frappe.cache().set_value(key, context, expires_in_sec=BREAKUP_TTL)
+
+    return context["html"]
+
+def get_expense_breakup_html(args, currency, budget_against):
+    args = frappe._dict({field: args.get(field) for field in BREAKUP_FIELDS})
+    args.requested_amount = get_requested_amount(args) if args.item_code and args.expense_account else 0.0
+    return get_expense_breakup(args, currency, budget_against) + "</ul>"
+
+def is_warn_deferred():
+    return bool(frappe.db.get_single_value("UIS Budget Settings", "defer_warn_budget_checks", cache=True))
+
+def enqueue_deferred_warnings(doc):
+    # one job per document, however many times it is checked before commit
+    frappe.enqueue(
+        "uis_accounts_customization.customization_script.budget.evaluate_deferred_warnings",
+        queue="short",
+        job_id=f"uis_budget_warnings::{doc.doctype}::{doc.name}",
+        deduplicate=True,
+        enqueue_after_commit=True,
+        voucher_type=doc.doctype,
+        voucher_no=doc.name,
+    )
+
+def evaluate_deferred_warnings(voucher_type, voucher_no):
+    """Background job: evaluate the Warn budgets of a submitted document, comment and notify when exceeded."""
+    doc = frappe.get_doc(voucher_type, voucher_no)
+    if doc.docstatus != 1:
+        return
+
+    if voucher_type in ("Purchase Order", "Material Request"):
+        entries = get_order_budget_entries(doc)
+    else:
+        entries = [
+            (entry, flt(entry.debit) - flt(entry.credit))
+            for entry in frappe.get_all(
+                "GL Entry",
+                filters={"voucher_type": voucher_type, "voucher_no": voucher_no, "is_cancelled": 0},
+                fields=["*"],
+            )
+        ]
+
+    frappe.flags.uis_budget_warnings = []
+    try:
+        validate_expenses_against_budget(entries, actions=("Warn",))
+        warnings = frappe.flags.uis_budget_warnings
+    finally:
+        frappe.flags.uis_budget_warnings = None
+
+    if not warnings:
+        return
+
+    message = "<br>".join(warnings)
+    doc.add_comment("Comment", text=f"<b>{_('Budget Exceeded')}</b><br>{message}")
+    frappe.publish_realtime(
+        "msgprint",
+        {"message": message, "title": _("Budget Exceeded"), "indicator": "orange"},
+        user=doc.modified_by,
+        doctype=voucher_type,
+        docname=voucher_no,
+    )
+
+def get_actual_expense(args):
+    return get_consumed_amount(args)
 
 def get_remaining_budget(doc, expense_account, branch=None, cost_center=None, project=None, department=None):
     doc = frappe.parse_json(doc)
-    fiscal_year = get_fiscal_year(doc.get("posting_date"), company=doc.get("company"))[0]
+    fiscal_year = get_fiscal_year_name(doc.get("posting_date"), doc.get("company"))
     company = doc.get("company")
     
     if not fiscal_year or not company:
         return {"error": _("Fiscal Year or Company not set in defaults")}
 
-    filters = {"fiscal_year": fiscal_year, "company": company, "account": expense_account}
-    conditions = ""
-
-    if branch:
-        conditions += " AND b.branch = %(branch)s"
-        filters["branch"] = branch
-    if cost_center:
-        conditions += " AND b.cost_center = %(cost_center)s"
-        filters["cost_center"] = cost_center
-    if project:
-        conditions += " AND b.project = %(project)s"
-        filters["project"] = project
-    if department:
-        conditions += " AND b.department = %(department)s"
-        filters["department"] = department
-
-    budget_data = frappe.db.sql(
-        f"""
-        SELECT SUM(ba.budget_amount) AS total_budget,
-        (SUM(ba.budget_amount) - COALESCE(SUM(gle.debit - gle.credit), 0)) AS remaining_budget
-        FROM `tabUIS - Budget` b
-        INNER JOIN `tabBudget Account` ba ON b.name = ba.parent
-        LEFT JOIN `tabGL Entry` gle ON gle.account = ba.account
-        WHERE b.fiscal_year = %(fiscal_year)s AND ba.account = %(account)s
-        AND b.company = %(company)s {conditions}
-        AND gle.is_cancelled = 0
-        AND b.docstatus = 1
-        """,
-        filters,
-        as_dict=True,
-    )
-
-    return budget_data[0] if budget_data else {"total_budget": 0, "remaining_budget": 0}
+    return get_remaining_budgets(
+        company, fiscal_year, [expense_account], branch, cost_center, project, department
+    )[expense_account]
 
 
 
@@ -246,76 +621,242 @@ def fetch_remaining_budget_for_item(doc, item_code, branch=None, cost_center=Non
     if not is_fixed_asset:
         return
     
-    fiscal_year = get_fiscal_year(doc.get("posting_date"), company=doc.get("company"))[0]
+    fiscal_year = get_fiscal_year_name(doc.get("posting_date"), doc.get("company"))
     company = doc.get("company")
 
     if not fiscal_year or not company:
         return {"error": _("Fiscal Year or Company not set in defaults")}
 
-    filters = {"fiscal_year": fiscal_year, "company": company, "item_code": item_code}
-    conditions = " AND bi.item_code = %(item_code)s"
-
-    if branch:
-        conditions += " AND b.branch = %(branch)s"
-        filters["branch"] = branch
-    # if cost_center:
-    #     conditions += " AND b.cost_center = %(cost_center)s"
-    #     filters["cost_center"] = cost_center
-    # if project:
-    #     conditions += " AND b.project = %(project)s"
-    #     filters["project"] = project
-    # if department:
-    #     conditions += " AND b.department = %(department)s"
-    #     filters["department"] = department
-
-    # Fetch allocated budget for the item
-    budget_data = frappe.db.sql(
-        f"""
-        SELECT bi.budget_amount AS total_budget,
-            b.action_if_annual_budget_exceeded,
-            b.name
-        FROM `tabUIS - Budget` b
-        INNER JOIN `tabBudget Item` bi ON b.name = bi.parent
-        WHERE b.fiscal_year = %(fiscal_year)s AND b.company = %(company)s
-        and b.docstatus = 1
-        {conditions}
-        """,
-        filters,
-        as_dict=True,
+    return get_remaining_item_budgets(company, fiscal_year, [item_code], branch)[item_code]
+
+
+@frappe.whitelist()
+def fetch_remaining_budget_for_document(doc):
+    """
+    Remaining budget of every item row of a draft Purchase Invoice, keyed by row name.
+
+    Fixed asset rows get their item budget, other rows the budget of their expense account
+    against the invoice dimensions, like fetch_remaining_budget_for_item / fetch_remaining_budget
+    do per row, but with one grouped query per kind of budget.
+    """
+    doc = frappe._dict(frappe.parse_json(doc))
+    rows = [frappe._dict(row) for row in doc.get("items") or []]
+    remaining = {row.name: 0 for row in rows}
+
+    if not (rows and doc.company and doc.branch):
+        return remaining
+
+    fiscal_year = get_fiscal_year_name(doc.posting_date, doc.company)
+    if not has_budget(doc.company, fiscal_year):
+        return remaining
+
+    item_codes = list({row.item_code for row in rows if row.item_code})
+    fixed_assets = set(
+        frappe.get_all("Item", filters={"name": ["in", item_codes], "is_fixed_asset": 1}, pluck="name")
+    ) if item_codes else set()
+
+    account_budgets = get_remaining_budgets(
+        doc.company,
+        fiscal_year,
+        {row.expense_account for row in rows if row.expense_account and row.item_code not in fixed_assets},
+        branch=doc.branch,
+        cost_center=doc.cost_center,
+        project=doc.project,
+        department=doc.department,
     )
+    item_budgets = get_remaining_item_budgets(doc.company, fiscal_year, fixed_assets, doc.branch)
 
-    if budget_data:
-        total_budget = budget_data[0]["total_budget"] 
-    else:
-        return {"total_budget": 0, "remaining_budget": 0}
+    for row in rows:
+        if row.item_code in fixed_assets:
+            remaining[row.name] = item_budgets.get(row.item_code, {}).get("remaining_budget", 0)
+        elif row.expense_account:
+            remaining[row.name] = account_budgets.get(row.expense_account, {}).get("remaining_budget", 0)
+
+    return remaining
+
+@frappe.whitelist()
+def simulate_budget(transactions, company=None, doctype="Purchase Order"):
+    """
+    What-if check of proposed transactions against UIS - Budget; nothing is written.
+
+    *transactions* is a list of {account, item_code, branch, cost_center, project, department,
+    posting_date, amount}, company defaulting to *company*. They are checked together, in order:
+    each one sees the amounts of the earlier ones that would go through, on every budget line
+    they share. Budget lines and amounts are loaded once, with grouped queries, for all of them.
 
-    # Fetch total booked expenses from Purchase Invoice, Purchase Order, and Material Requests
-    total_expense = frappe.db.sql(
+    Returns one {status, headroom, budget_name, budget_line, action_for} per transaction.
+    Status is Pass, Warn or Stop; headroom is what the tightest matching budget has left before it.
+    """
+    frappe.has_permission("UIS - Budget", "read", throw=True)
+    transactions = [frappe._dict(transaction) for transaction in frappe.parse_json(transactions) or []]
+
+    entries = []
+    for transaction in transactions:
+        entry = frappe._dict(transaction, doctype=doctype)
+        entry.company = entry.company or company
+        entry.posting_date = entry.posting_date or entry.get("date")
+        if entry.item_code and entry.account and not entry.expense_account:
+            # a planned order row: its requested and ordered amounts count as well
+            entry.expense_account = entry.account
+        entries.append(entry)
+
+    groups, keys, fiscal_years = {}, [], {}
+    item_details = get_batch_item_details(entries)
+    for entry in entries:
+        args = get_budget_args(entry, fiscal_years, item_details) if entry.company and entry.posting_date else None
+        key = tuple(args.get(field) for field in BUDGET_KEY_FIELDS) if args else None
+        if key and key not in groups:
+            groups[key] = [args, 0]
+        keys.append(key)
+
+    batch = prefetch_budget_data(groups) if groups else frappe._dict(budget_records={})
+    roles = set(frappe.get_roles())
+    pending = {}
+
+    results = []
+    for transaction, key in zip(transactions, keys):
+        result = frappe._dict(status="Pass", headroom=None, budget_name=None, budget_line=None, action_for=None)
+        results.append(result)
+
+        budget_records = batch.budget_records.get(key) if key else None
+        if not budget_records:
+            continue
+
+        args, amount = groups[key][0], flt(transaction.amount)
+        checks = get_simulated_checks(args, budget_records, batch, pending)
+        if not checks:
+            continue
+
+        exception_role = frappe.get_cached_value("Company", args.company, "exception_budget_approver_role")
+        for headroom, action, action_for, budget in checks:
+            if amount > headroom and action == "Stop" and (
+                exception_role in roles or is_user_allowed_for_transaction(budget.budget_name)
+            ):
+                action = "Warn"
+            if amount > headroom and result.status != "Stop":
+                result.status = action
+            if result.headroom is None or headroom < result.headroom:
+                result.update(
+                    headroom=headroom, budget_name=budget.budget_name,
+                    budget_line=budget.budget_line, action_for=action_for,
+                )
+
+        if result.status != "Stop":
+            month_end_date = get_last_day(args.posting_date)
+            for budget in budget_records:
+                line_pending = pending.setdefault(budget.budget_line, {})
+                line_pending[month_end_date] = line_pending.get(month_end_date, 0.0) + amount
+
+    return results
+
+def get_simulated_checks(args, budget_records, batch, pending):
+    """(headroom, action, action for, budget line) per monthly / annual check of *args*, net of *pending* amounts."""
+    checks = []
+    # a fresh check, as validate_expenses_against_budget starts from args without one
+    args.pop("month_end_date", None)
+
+    for budget, budget_amount, action_for, action in get_budget_checks(args, budget_records):
+        actual, ordered = get_batch_amounts(batch, args)
+        line_pending = pending.get(budget.budget_line, {})
+        if args.get("month_end_date"):
+            month_end_date = getdate(args.month_end_date)
+            earlier = sum(amount for date, amount in line_pending.items() if date <= month_end_date)
+        else:
+            earlier = sum(line_pending.values())
+        checks.append((budget_amount - actual - ordered - earlier, action, action_for, budget))
+
+    return checks
+
+def get_remaining_budgets(company, fiscal_year, accounts, branch=None, cost_center=None, project=None, department=None):
+    """
+    {account: {total_budget, remaining_budget}} for many accounts in one query.
+
+    Consumption is aggregated once per account in a subquery and joined to the summed
+    budget lines, so neither side multiplies the other. Dimensions are filtered only when given,
+    on the budget and on the consumption alike.
+    """
+    accounts = [account for account in set(accounts or []) if account]
+    if not accounts:
+        return {}
+
+    filters = {"company": company, "fiscal_year": fiscal_year, "accounts": tuple(accounts)}
+    budget_conditions = consumption_conditions = ""
+
+    for field, value in (("branch", branch), ("cost_center", cost_center), ("project", project), ("department", department)):
+        if value:
+            budget_conditions += f" AND b.{field} = %({field})s"
+            consumption_conditions += f" AND {field} = %({field})s"
+            filters[field] = value
+
+    rows = frappe.db.sql(
         f"""
-        SELECT COALESCE(SUM(pi.amount), 0) as total_expense
-        FROM `tabPurchase Invoice Item` pi
-        INNER JOIN `tabPurchase Invoice` pi_doc ON pi.parent = pi_doc.name
-        WHERE pi.item_code = %(item_code)s AND pi_doc.company = %(company)s AND pi_doc.docstatus = 1
+        SELECT ba.account, SUM(ba.budget_amount) AS total_budget, COALESCE(c.consumed, 0) AS consumed
+        FROM `tabUIS - Budget` b
+        INNER JOIN `tabBudget Account` ba ON b.name = ba.parent
+        LEFT JOIN (
+            SELECT account, SUM(amount) AS consumed
+            FROM `tabUIS Budget Consumption`
+            WHERE company = %(company)s AND fiscal_year = %(fiscal_year)s
+            AND account IN %(accounts)s {consumption_conditions}
+            GROUP BY account
+        ) c ON c.account = ba.account
+        WHERE b.company = %(company)s AND b.fiscal_year = %(fiscal_year)s
+        AND ba.account IN %(accounts)s {budget_conditions}
+        AND b.docstatus = 1
+        GROUP BY ba.account, c.consumed
         """,
         filters,
         as_dict=True,
     )
 
-    total_expense = total_expense[0]["total_expense"] if total_expense else 0
-    remaining_budget = total_budget - total_expense
-
-    return {
-            "total_budget": total_budget, 
-            "remaining_budget": remaining_budget, 
-            'action_if_annual_budget_exceeded' : budget_data[0].get('action_if_annual_budget_exceeded'),
-            "budget_name" : budget_data[0].get("name")
+    budgets = {account: {"total_budget": 0, "remaining_budget": 0} for account in accounts}
+    for row in rows:
+        total_budget = flt(row.total_budget)
+        budgets[row.account] = {"total_budget": total_budget, "remaining_budget": total_budget - flt(row.consumed)}
+
+    return budgets
+
+def get_remaining_item_budgets(company, fiscal_year, item_codes, branch=None):
+    """{item_code: {total_budget, remaining_budget, ...}} for fixed asset items, consumed amounts read from UIS Asset Budget Consumption."""
+    if not item_codes:
+        return {}
+
+    total_expenses = get_asset_consumed_amounts(company, fiscal_year, item_codes, branch)
+
+    budgets = {}
+    for item_code in item_codes:
+        lines = get_item_budget_lines(company, fiscal_year, item_code, branch)
+        if not lines:
+            budgets[item_code] = {"total_budget": 0, "remaining_budget": 0}
+            continue
+
+        total_budget = lines[0].budget_amount
+        budgets[item_code] = {
+            "total_budget": total_budget,
+            "remaining_budget": total_budget - flt(total_expenses.get(item_code)),
+            "action_if_annual_budget_exceeded": lines[0].action_if_annual_budget_exceeded,
+            "budget_name": lines[0].budget_name,
         }
 
+    return budgets
 
 
 def validate_budget_for_fixed_asset(doc, item_code, branch):
-    response = fetch_remaining_budget_for_item(doc, item_code, branch)
-#     # Validate budget on PI submission
+    check_fixed_asset_budget(item_code, fetch_remaining_budget_for_item(doc, item_code, branch))
+
+def validate_budget_for_fixed_assets(doc):
+    """Check every fixed asset item of a submitted Purchase Invoice against its item budget."""
+    # one check per item, however many rows it has
+    item_codes = list(dict.fromkeys(row.item_code for row in doc.items if row.is_fixed_asset and row.item_code))
+    if not (item_codes and has_budget(doc.company)):
+        return
+
+    fiscal_year = get_fiscal_year_name(doc.posting_date, doc.company)
+    budgets = get_remaining_item_budgets(doc.company, fiscal_year, item_codes, doc.branch)
+    for item_code in item_codes:
+        check_fixed_asset_budget(item_code, budgets[item_code])
+
+def check_fixed_asset_budget(item_code, response):
     if response.get('remaining_budget') < 0 and response.get('action_if_annual_budget_exceeded'):
         msg = _(f"Budget exceeded for Item {item_code}. By Amount: {abs(response.get('remaining_budget'))}.")
         if response.get('action_if_annual_budget_exceeded') == "Stop":
@@ -325,12 +866,7 @@ def validate_budget_for_fixed_asset(doc, item_code, branch):
             frappe.msgprint(msg, indicator="orange", title=_("Budget Warning"))
 
 def is_user_allowed_for_transaction(budget_name):
-    allowed_user_table = frappe.db.get_values("Allowed User", {'parent':budget_name}, ["from_doctype", "dynamic_link_iotq"], as_dict = True)
-    for allowed_user_row in allowed_user_table:
-        if "User" == allowed_user_row.get('from_doctype') and frappe.session.user == allowed_user_row.get('dynamic_link_iotq'):
-            return True
-        elif "Role" == 'from_doctype':
-            curr_user_roles_list = frappe.get_all("Has Role", {'parent' :frappe.session.user }, pluck = "role")
-            if allowed_user_row.get('dynamic_link_iotq') in curr_user_roles_list:
-                return True
-    return False
+    users, roles = get_budget_allow_list(budget_name)
+    if frappe.session.user in users:
+        return True
+    return bool(roles) and not roles.isdisjoint(frappe.get_roles())
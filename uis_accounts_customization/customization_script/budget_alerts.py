@@ -0,0 +1,299 @@
+"""
+Hourly scan of UIS - Budget lines against their consumption.
+
+Only budget keys touched since the last run are looked at: GL Entries created
+after the watermark kept in UIS Budget Settings, plus budgets modified since.
+Consumption is read once per (company, fiscal year) as one grouped query on
+UIS Budget Consumption and matched to the lines in memory.
+
+Key facts
+─────────
+•  Lines are compared with their annual amount; thresholds come from UIS Budget Settings (80, 90, 100 by default)
+•  Each (line, threshold) alerts once, logged in UIS Budget Alert; falling back below a threshold re-arms it
+•  One Notification Log batch per budget, for the budget owner and the users of the notify role
+•  An empty watermark scans every submitted budget
+•  Each run looks WATERMARK_LAG seconds behind the watermark, so GL Entries committed after a
+   later-created one was scanned are still seen; rescanned lines cannot alert twice
+"""
+
+import hashlib
+
+import frappe
+from frappe import _
+from frappe.desk.doctype.notification_log.notification_log import enqueue_create_notification
+from frappe.utils import add_to_date, cint, flt, fmt_money, now
+
+from uis_accounts_customization.customization_script.budget_index import (
+    get_budget_index,
+    get_budget_lines,
+    get_budgeted_companies,
+)
+from uis_accounts_customization.uis_accounts_customization.doctype.uis_budget_consumption.uis_budget_consumption import (
+    DIMENSION_FIELDS,
+)
+
+SETTINGS = "UIS Budget Settings"
+DEFAULT_THRESHOLDS = (80, 90, 100)
+# longest a GL Entry is expected to stay uncommitted after its creation timestamp
+WATERMARK_LAG = 600
+
+
+# ──────────────────────────────────────────────────────────
+# 1 ▸ Scheduler entry point
+# ──────────────────────────────────────────────────────────
+def scan_budget_thresholds():
+    settings = frappe.get_cached_doc(SETTINGS)
+    if not settings.enable_threshold_alerts or not get_budgeted_companies():
+        return
+
+    watermark = settings.last_scanned_gl_creation
+    new_watermark = frappe.db.sql("SELECT MAX(creation) FROM `tabGL Entry`")[0][0]
+
+    lines_by_year = get_touched_lines(watermark, new_watermark)
+    thresholds = get_thresholds(settings)
+
+    alerts = []
+    for (company, fiscal_year), lines in lines_by_year.items():
+        alerts.extend(check_lines(company, fiscal_year, lines, thresholds))
+
+    if alerts:
+        send_alerts(alerts, settings.alert_role)
+
+    if new_watermark:
+        frappe.db.set_single_value(SETTINGS, "last_scanned_gl_creation", new_watermark)
+
+
+def get_thresholds(settings):
+    thresholds = sorted({cint(value) for value in (settings.alert_thresholds or "").split(",") if cint(value) > 0})
+    return thresholds or list(DEFAULT_THRESHOLDS)
+
+
+# ──────────────────────────────────────────────────────────
+# 2 ▸ Touched budget lines
+# ──────────────────────────────────────────────────────────
+def get_touched_lines(watermark, new_watermark):
+    """{(company, fiscal_year): {budget_line: line}} of lines whose consumption or budget may have changed."""
+    budgeted = get_budgeted_companies()
+    lines_by_year = {}
+
+    def add(company, fiscal_year, lines):
+        if lines:
+            year_lines = lines_by_year.setdefault((company, fiscal_year), {})
+            year_lines.update((line.budget_line, line) for line in lines)
+
+    if not watermark:
+        for company, fiscal_years in budgeted.items():
+            for fiscal_year in fiscal_years:
+                index = get_budget_index(company, fiscal_year)
+                add(company, fiscal_year, [line for lines in index.accounts.values() for line in lines])
+                add(company, fiscal_year, [line for lines in index.fuzzy.values() for line in lines])
+        return lines_by_year
+
+    # entries created before the watermark may have been committed after the last run
+    since = add_to_date(watermark, seconds=-WATERMARK_LAG)
+
+    if new_watermark:
+        for key in frappe.db.sql(
+            """
+            SELECT DISTINCT company, fiscal_year, account, branch, cost_center, project, department
+            FROM `tabGL Entry`
+            WHERE creation > %(since)s AND creation <= %(new_watermark)s
+            """,
+            {"since": since, "new_watermark": new_watermark},
+            as_dict=True,
+        ):
+            if key.fiscal_year in budgeted.get(key.company, ()):
+                add(
+                    key.company,
+                    key.fiscal_year,
+                    get_budget_lines(
+                        key.company, key.fiscal_year, key.account, key.branch,
+                        key.cost_center, key.project, key.department,
+                    ),
+                )
+
+    # a new or amended budget may already be past a threshold
+    for budget in frappe.get_all(
+        "UIS - Budget",
+        filters={"docstatus": 1, "modified": [">", since]},
+        fields=["name", "company", "fiscal_year"],
+    ):
+        index = get_budget_index(budget.company, budget.fiscal_year)
+        add(
+            budget.company,
+            budget.fiscal_year,
+            [
+                line
+                for lines in list(index.accounts.values()) + list(index.fuzzy.values())
+                for line in lines
+                if line.budget_name == budget.name
+            ],
+        )
+
+    return lines_by_year
+
+
+# ──────────────────────────────────────────────────────────
+# 3 ▸ Compare
+# ──────────────────────────────────────────────────────────
+def check_lines(company, fiscal_year, lines, thresholds):
+    """New alerts for *lines*; also re-arms thresholds the lines have fallen below."""
+    consumption = get_grouped_consumption(company, fiscal_year, {line.account for line in lines.values()})
+
+    alerted = {}
+    for row in frappe.get_all(
+        "UIS Budget Alert",
+        filters={"budget_line": ["in", list(lines)]},
+        fields=["name", "budget_line", "threshold"],
+    ):
+        alerted.setdefault(row.budget_line, {})[row.threshold] = row.name
+
+    alerts, rearmed = [], []
+    for line in lines.values():
+        budget_amount = flt(line.budget_amount)
+        if budget_amount <= 0:
+            continue
+
+        consumed = get_line_consumption(consumption.get(line.account, {}), line)
+        percentage = consumed / budget_amount * 100
+        line_alerts = alerted.get(line.budget_line, {})
+
+        rearmed.extend(name for threshold, name in line_alerts.items() if percentage < threshold)
+        crossed = [threshold for threshold in thresholds if percentage >= threshold and threshold not in line_alerts]
+        if crossed:
+            alerts.append(
+                frappe._dict(
+                    line=line, company=company, fiscal_year=fiscal_year, thresholds=crossed,
+                    consumed=consumed, budget_amount=budget_amount, percentage=percentage,
+                )
+            )
+
+    if rearmed:
+        frappe.db.delete("UIS Budget Alert", {"name": ["in", rearmed]})
+
+    return alerts
+
+
+def get_grouped_consumption(company, fiscal_year, accounts):
+    """{account: {(branch, cost_center, project, department): amount}} for the whole fiscal year."""
+    if not accounts:
+        return {}
+
+    consumption = {}
+    for row in frappe.db.sql(
+        """
+        SELECT account, branch, cost_center, project, department, SUM(amount) AS amount
+        FROM `tabUIS Budget Consumption`
+        WHERE company = %(company)s AND fiscal_year = %(fiscal_year)s AND account IN %(accounts)s
+        GROUP BY account, branch, cost_center, project, department
+        """,
+        {"company": company, "fiscal_year": fiscal_year, "accounts": tuple(accounts)},
+        as_dict=True,
+    ):
+        consumption.setdefault(row.account, {})[tuple(row[field] for field in DIMENSION_FIELDS)] = flt(row.amount)
+
+    return consumption
+
+
+def get_line_consumption(account_consumption, line):
+    """Consumption in the line's scope: its own dimensions, any value where blank, a group cost center's subtree."""
+    cost_centers = line.get("cost_centers")
+    if cost_centers is None and line.budget_against and line.cost_center and line.project and line.department:
+        return account_consumption.get((line.budget_against, line.cost_center, line.project, line.department), 0.0)
+
+    def in_scope(branch, cost_center, project, department):
+        if cost_centers is not None:
+            if cost_center not in cost_centers:
+                return False
+        elif line.cost_center and line.cost_center != cost_center:
+            return False
+        return all(
+            not expected or expected == value
+            for expected, value in ((line.budget_against, branch), (line.project, project), (line.department, department))
+        )
+
+    return sum(amount for dimensions, amount in account_consumption.items() if in_scope(*dimensions))
+
+
+# ──────────────────────────────────────────────────────────
+# 4 ▸ Notify
+# ──────────────────────────────────────────────────────────
+def send_alerts(alerts, role=None):
+    log_alerts(alerts)
+
+    role_users = set(
+        frappe.db.sql_list(
+            """
+            SELECT DISTINCT u.name
+            FROM `tabUser` u
+            INNER JOIN `tabHas Role` r ON r.parent = u.name AND r.parenttype = 'User'
+            WHERE r.role = %s AND u.enabled = 1
+            """,
+            role or "Accounts Manager",
+        )
+    )
+
+    by_budget = {}
+    for alert in alerts:
+        by_budget.setdefault(alert.line.budget_name, []).append(alert)
+
+    owners = dict(frappe.get_all("UIS - Budget", filters={"name": ["in", list(by_budget)]}, fields=["name", "owner"], as_list=True))
+    for budget_name, budget_alerts in by_budget.items():
+        users = role_users | ({owners[budget_name]} if owners.get(budget_name) else set())
+        if not users:
+            continue
+
+        top = max(threshold for alert in budget_alerts for threshold in alert.thresholds)
+        enqueue_create_notification(
+            list(users),
+            {
+                "type": "Alert",
+                "document_type": "UIS - Budget",
+                "document_name": budget_name,
+                "subject": _("Budget {0}: {1} line(s) crossed {2}%").format(
+                    frappe.bold(budget_name), len(budget_alerts), top
+                ),
+                "email_content": get_alert_content(budget_alerts),
+            },
+        )
+
+
+def get_alert_content(alerts):
+    currency = frappe.get_cached_value("Company", alerts[0].company, "default_currency")
+    rows = "".join(
+        "<li>{0}: {1} of {2} ({3}%)</li>".format(
+            frappe.bold(alert.line.account or alert.line.item_code),
+            fmt_money(alert.consumed, currency=currency),
+            fmt_money(alert.budget_amount, currency=currency),
+            round(alert.percentage, 1),
+        )
+        for alert in alerts
+    )
+    return f"<ul>{rows}</ul>"
+
+
+def log_alerts(alerts):
+    timestamp, user = now(), frappe.session.user
+    rows = [
+        (
+            get_alert_name(alert.line.budget_line, threshold), timestamp, timestamp, user, user, 0,
+            alert.line.budget_name, alert.line.budget_line, alert.company, alert.fiscal_year, alert.line.account,
+            threshold, alert.percentage, alert.consumed, alert.budget_amount,
+        )
+        for alert in alerts
+        for threshold in alert.thresholds
+    ]
+    frappe.db.bulk_insert(
+        "UIS Budget Alert",
+        (
+            "name", "creation", "modified", "owner", "modified_by", "docstatus",
+            "budget", "budget_line", "company", "fiscal_year", "account",
+            "threshold", "percentage", "consumed_amount", "budget_amount",
+        ),
+        rows,
+        ignore_duplicates=True,
+    )
+
+
+def get_alert_name(budget_line, threshold):
+    return hashlib.sha1(f"{budget_line}::{threshold}".encode()).hexdigest()
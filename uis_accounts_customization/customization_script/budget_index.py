@@ -0,0 +1,265 @@
+"""
+Site-wide index of submitted UIS - Budget lines.
+
+One entry per (company, fiscal year) is kept in Redis and memoized in the
+worker process; a version token stored next to it tells the process memo when
+another worker has invalidated the index. The token is read from Redis once
+per request (or job) and kept in frappe.local after that.
+
+Key facts
+─────────
+•  Account lines are looked up by (account, branch, cost center, project, department)
+•  Blank dimensions on the lookup side match any budget value (same as the old SQL)
+•  Lines with a blank dimension ("any") or a group cost center are kept apart per account
+   and matched in memory; a group cost center covers its lft/rgt subtree
+•  Fixed asset lines are looked up by (item_code, branch)
+•  Companies without budgets are answered from a cached set, without any query
+•  Allowed User grants of every submitted budget are kept as (users, roles) sets
+"""
+
+import frappe
+
+INDEX_CACHE_KEY = "uis_budget_index"
+VERSION_CACHE_KEY = "uis_budget_index_version"
+BUDGETED_COMPANIES_KEY = "__budgeted_companies__"
+ALLOWED_USERS_KEY = "__allowed_users__"
+
+BUDGET_DIMENSIONS = ("cost_center", "project", "department")
+
+_process_cache = {}
+
+
+# ──────────────────────────────────────────────────────────
+# 1 ▸ Lookups
+# ──────────────────────────────────────────────────────────
+def get_budgeted_companies():
+    """{company: {fiscal_year, …}} for every submitted UIS - Budget."""
+    return _get_cached(BUDGETED_COMPANIES_KEY, _build_budgeted_companies)
+
+
+def has_budget(company, fiscal_year=None):
+    fiscal_years = get_budgeted_companies().get(company)
+    if not fiscal_years:
+        return False
+    return fiscal_year is None or fiscal_year in fiscal_years
+
+
+def get_budget_index(company, fiscal_year):
+    if not has_budget(company, fiscal_year):
+        return frappe._dict(accounts={}, exact={}, fuzzy={}, items={})
+
+    return _get_cached(f"{company}::{fiscal_year}", lambda: _build_budget_index(company, fiscal_year))
+
+
+def get_budget_lines(company, fiscal_year, account, branch, cost_center=None, project=None, department=None):
+    """Budget Account lines applicable to a GL row / item row."""
+    index = get_budget_index(company, fiscal_year)
+    dimensions = tuple((value or "").strip() for value in (cost_center, project, department))
+
+    if all(dimensions):
+        lines = index.exact.get((account, branch) + dimensions, [])
+    else:
+        lines = [
+            line
+            for line in index.accounts.get((account, branch), [])
+            if all(line.get(field) == value for field, value in zip(BUDGET_DIMENSIONS, dimensions) if value)
+        ]
+
+    fuzzy = [line for line in index.fuzzy.get(account, []) if line_matches(line, branch, *dimensions)]
+    return lines + fuzzy if fuzzy else lines
+
+
+def line_matches(line, branch, cost_center=None, project=None, department=None):
+    """Whether a wildcard / cost center subtree line applies to the given dimensions."""
+    if line.budget_against and line.budget_against != branch:
+        return False
+
+    if cost_center and line.cost_center:
+        if line.cost_centers is not None:
+            if cost_center not in line.cost_centers:
+                return False
+        elif line.cost_center != cost_center:
+            return False
+
+    return all(
+        not value or not line.get(field) or line.get(field) == value
+        for field, value in (("project", project), ("department", department))
+    )
+
+
+def get_account_budget_lines(company, fiscal_year, account):
+    """Every Budget Account line of *account*, whatever its branch and dimensions."""
+    index = get_budget_index(company, fiscal_year)
+    return [
+        line
+        for (line_account, _branch), lines in index.accounts.items()
+        if line_account == account
+        for line in lines
+    ] + index.fuzzy.get(account, [])
+
+
+def get_item_budget_lines(company, fiscal_year, item_code, branch=None):
+    """Budget Item (fixed asset) lines of *item_code*; every branch when *branch* is not given."""
+    index = get_budget_index(company, fiscal_year)
+    if branch:
+        return index.items.get((item_code, branch), [])
+
+    return [line for (code, _branch), lines in index.items.items() if code == item_code for line in lines]
+
+
+def get_budget_allow_list(budget_name):
+    """(users, roles) allowed to go past a Stop of *budget_name*."""
+    return _get_cached(ALLOWED_USERS_KEY, _build_allow_lists).get(budget_name) or (frozenset(), frozenset())
+
+
+def get_index_version():
+    """Token that changes whenever the index is invalidated (budget or cost center changes)."""
+    return _get_version()
+
+
+# ──────────────────────────────────────────────────────────
+# 2 ▸ Invalidation (UIS - Budget events)
+# ──────────────────────────────────────────────────────────
+def clear_budget_index(doc=None, method=None, *args, **kwargs):
+    _clear_budget_index()
+    # another worker may rebuild from pre-commit data meanwhile, clear again once committed
+    frappe.db.after_commit.add(_clear_budget_index)
+
+
+def _clear_budget_index():
+    version = frappe.generate_hash(length=10)
+    frappe.cache().delete_value(INDEX_CACHE_KEY)
+    frappe.cache().set_value(VERSION_CACHE_KEY, version)
+    frappe.local.uis_budget_index_version = version
+    _process_cache.clear()
+
+
+# ──────────────────────────────────────────────────────────
+# 3 ▸ Helpers
+# ──────────────────────────────────────────────────────────
+def _get_version():
+    # frappe.local starts empty for every request and job
+    version = getattr(frappe.local, "uis_budget_index_version", None)
+    if version:
+        return version
+
+    version = frappe.cache().get_value(VERSION_CACHE_KEY)
+    if not version:
+        version = frappe.generate_hash(length=10)
+        frappe.cache().set_value(VERSION_CACHE_KEY, version)
+
+    frappe.local.uis_budget_index_version = version
+    return version
+
+
+def _get_cached(key, generator):
+    version = _get_version()
+    process_key = (frappe.local.site, key)
+
+    cached = _process_cache.get(process_key)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    value = frappe.cache().hget(INDEX_CACHE_KEY, key, generator=generator)
+    _process_cache[process_key] = (version, value)
+    return value
+
+
+def _build_budgeted_companies():
+    budgeted = {}
+    for row in frappe.get_all(
+        "UIS - Budget", filters={"docstatus": 1}, fields=["company", "fiscal_year"], distinct=True
+    ):
+        budgeted.setdefault(row.company, set()).add(row.fiscal_year)
+    return budgeted
+
+
+def _build_allow_lists():
+    allow_lists = {}
+    for row in frappe.db.sql(
+        """
+        SELECT au.parent, au.from_doctype, au.dynamic_link_iotq
+        FROM `tabAllowed User` au
+        INNER JOIN `tabUIS - Budget` b ON b.name = au.parent
+        WHERE au.parenttype = 'UIS - Budget' AND b.docstatus = 1 AND au.dynamic_link_iotq IS NOT NULL
+        """,
+        as_dict=True,
+    ):
+        users, roles = allow_lists.setdefault(row.parent, (set(), set()))
+        if row.from_doctype == "User":
+            users.add(row.dynamic_link_iotq)
+        elif row.from_doctype == "Role":
+            roles.add(row.dynamic_link_iotq)
+    return allow_lists
+
+
+def _get_cost_center_subtrees(company):
+    """{group cost center: frozenset of itself and every cost center below it}"""
+    cost_centers = frappe.get_all(
+        "Cost Center", filters={"company": company}, fields=["name", "lft", "rgt", "is_group"]
+    )
+    return {
+        group.name: frozenset(cc.name for cc in cost_centers if cc.lft >= group.lft and cc.rgt <= group.rgt)
+        for group in cost_centers
+        if group.is_group
+    }
+
+
+def _build_budget_index(company, fiscal_year):
+    index = frappe._dict(accounts={}, exact={}, fuzzy={}, items={})
+    budget_fields = """
+        b.name as budget_name,
+        b.branch as budget_against,
+        b.fiscal_year,
+        b.cost_center,
+        b.project,
+        b.department,
+        b.monthly_distribution,
+        COALESCE(b.applicable_on_material_request, 0) AS for_material_request,
+        COALESCE(b.applicable_on_purchase_order, 0) AS for_purchase_order,
+        COALESCE(b.applicable_on_booking_actual_expenses, 0) AS for_actual_expenses,
+        b.action_if_annual_budget_exceeded,
+        b.action_if_accumulated_monthly_budget_exceeded,
+        b.action_if_annual_budget_exceeded_on_mr,
+        b.action_if_accumulated_monthly_budget_exceeded_on_mr,
+        b.action_if_annual_budget_exceeded_on_po,
+        b.action_if_accumulated_monthly_budget_exceeded_on_po
+    """
+    filters = {"company": company, "fiscal_year": fiscal_year}
+    subtrees = _get_cost_center_subtrees(company)
+
+    for line in frappe.db.sql(
+        f"""
+        SELECT {budget_fields}, ba.name as budget_line, ba.account, ba.budget_amount
+        FROM `tabUIS - Budget` b
+        INNER JOIN `tabBudget Account` ba ON b.name = ba.parent
+        WHERE b.company = %(company)s AND b.fiscal_year = %(fiscal_year)s AND b.docstatus = 1
+        ORDER BY b.name, ba.idx
+        """,
+        filters,
+        as_dict=True,
+    ):
+        dimensions = tuple(line.get(field) or "" for field in BUDGET_DIMENSIONS)
+        line.cost_centers = subtrees.get(line.cost_center)
+
+        if line.cost_centers is not None or not (line.budget_against and all(dimensions)):
+            index.fuzzy.setdefault(line.account, []).append(line)
+            continue
+
+        index.accounts.setdefault((line.account, line.budget_against), []).append(line)
+        index.exact.setdefault((line.account, line.budget_against) + dimensions, []).append(line)
+
+    for line in frappe.db.sql(
+        f"""
+        SELECT {budget_fields}, bi.name as budget_line, bi.item_code, bi.budget_amount
+        FROM `tabUIS - Budget` b
+        INNER JOIN `tabBudget Item` bi ON b.name = bi.parent
+        WHERE b.company = %(company)s AND b.fiscal_year = %(fiscal_year)s AND b.docstatus = 1
+        ORDER BY b.name, bi.idx
+        """,
+        filters,
+        as_dict=True,
+    ):
+        index.items.setdefault((line.item_code, line.budget_against), []).append(line)
+
+    return index
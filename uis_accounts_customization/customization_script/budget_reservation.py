@@ -0,0 +1,48 @@
+"""
+Row locks that make the UIS - Budget check and the consumption it guards atomic.
+
+A document locks the Budget Account / Budget Item rows it can consume in
+before_submit, before it writes any GL Entry or consumption bucket, and keeps
+the locks until its transaction ends. A parallel submission against the same
+lines waits there; submissions against other lines are not blocked.
+
+Key facts
+─────────
+•  Lines are locked in name order (Budget Account, then Budget Item), so two documents never deadlock on them
+•  Once locked, amounts are read with LOCK IN SHARE MODE; a plain read would see the
+   transaction's snapshot, taken before the other submission committed
+•  Locking reads only cover the exact budget keys of the document
+•  The locked state is cleared when the transaction commits or rolls back, so later
+   transactions of the same request or job read without locks again
+"""
+
+import frappe
+
+
+def lock_budget_lines(account_lines=(), item_lines=()):
+    """SELECT … FOR UPDATE the given Budget Account / Budget Item rows (names)."""
+    for doctype, names in (("Budget Account", account_lines), ("Budget Item", item_lines)):
+        if names:
+            frappe.db.sql(
+                f"SELECT name FROM `tab{doctype}` WHERE name IN %(names)s ORDER BY name FOR UPDATE",
+                {"names": tuple(sorted(names))},
+            )
+
+    if (account_lines or item_lines) and not frappe.flags.uis_budget_locked:
+        frappe.flags.uis_budget_locked = True
+        frappe.db.after_commit.add(release_budget_lock)
+        frappe.db.after_rollback.add(release_budget_lock)
+
+
+def release_budget_lock():
+    # the row locks end with the transaction
+    frappe.flags.uis_budget_locked = False
+
+
+def is_budget_locked():
+    return bool(frappe.flags.uis_budget_locked)
+
+
+def get_locking_clause():
+    """Suffix for budget reads: the latest committed rows while this transaction holds budget lines."""
+    return " LOCK IN SHARE MODE" if is_budget_locked() else ""
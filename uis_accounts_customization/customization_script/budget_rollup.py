@@ -0,0 +1,157 @@
+"""
+Budget versus actual rolled up the Cost Center tree of a company.
+
+Every node carries its own amounts (budget lines set on that cost center, GL
+consumption booked on it) and the totals of its subtree. Totals are added up
+in one pass over the cost centers in lft order: a node is closed when the
+next one starts outside its lft/rgt range, and its totals go to its parent.
+
+Key facts
+─────────
+•  Only accounts with a UIS - Budget line in the company / fiscal year count as actual
+•  Budget lines without a cost center cannot be placed in the tree; they are returned as `unallocated_budget`
+•  One rollup per (company, fiscal year) is cached in Redis for ROLLUP_TTL seconds, and
+   dropped at once when budgets or cost centers change (budget index version)
+"""
+
+import frappe
+from frappe import _
+from frappe.utils import cint, flt
+
+from uis_accounts_customization.customization_script.budget_index import get_index_version, has_budget
+
+ROLLUP_CACHE_KEY = "uis_budget_rollup"
+# consumption moves with every posting, so a rollup is only kept for a short while
+ROLLUP_TTL = 300
+
+
+# ──────────────────────────────────────────────────────────
+# 1 ▸ API
+# ──────────────────────────────────────────────────────────
+@frappe.whitelist()
+def get_budget_rollup(company, fiscal_year, cost_center=None, refresh=False):
+    """
+    Rolled up {name, parent, is_group, budget, actual, remaining, own_budget, own_actual} per cost center,
+    in tree order; only the subtree of *cost_center* when given.
+    """
+    frappe.has_permission("UIS - Budget", "read", throw=True)
+    rollup = get_cached_rollup(company, fiscal_year, refresh=cint(refresh))
+
+    nodes = rollup.nodes
+    if cost_center:
+        top = next((node for node in nodes if node.name == cost_center), None)
+        if not top:
+            frappe.throw(_("Cost Center {0} does not belong to {1}").format(cost_center, company))
+        nodes = [node for node in nodes if node.lft >= top.lft and node.rgt <= top.rgt]
+
+    return {"nodes": nodes, "unallocated_budget": rollup.unallocated_budget}
+
+
+@frappe.whitelist()
+def get_budget_rollup_children(company, fiscal_year, parent=None, is_root=False):
+    """Tree view loader: direct children of *parent* (the top cost centers for the root) with their rollups."""
+    frappe.has_permission("UIS - Budget", "read", throw=True)
+    rollup = get_cached_rollup(company, fiscal_year)
+
+    if cint(is_root) or not parent or parent == company:
+        parent = ""
+
+    return [
+        {
+            "value": node.name,
+            "title": node.name,
+            "expandable": node.is_group,
+            "budget": node.budget,
+            "actual": node.actual,
+            "remaining": node.remaining,
+        }
+        for node in rollup.nodes
+        if (node.parent or "") == parent
+    ]
+
+
+def get_cached_rollup(company, fiscal_year, refresh=False):
+    key = f"{ROLLUP_CACHE_KEY}::{get_index_version()}::{company}::{fiscal_year}"
+    rollup = None if refresh else frappe.cache().get_value(key)
+    if rollup is None:
+        rollup = build_budget_rollup(company, fiscal_year)
+        frappe.cache().set_value(key, rollup, expires_in_sec=ROLLUP_TTL)
+    return rollup
+
+
+# ──────────────────────────────────────────────────────────
+# 2 ▸ Rollup
+# ──────────────────────────────────────────────────────────
+def build_budget_rollup(company, fiscal_year):
+    rollup = frappe._dict(nodes=[], unallocated_budget=0.0)
+    nodes = frappe.get_all(
+        "Cost Center",
+        filters={"company": company},
+        fields=["name", "parent_cost_center as parent", "is_group", "lft", "rgt"],
+        order_by="lft",
+    )
+    if not nodes:
+        return rollup
+
+    own_budget, accounts = {}, set()
+    if has_budget(company, fiscal_year):
+        for row in frappe.db.sql(
+            """
+            SELECT b.cost_center, ba.account, SUM(ba.budget_amount) AS amount
+            FROM `tabUIS - Budget` b
+            INNER JOIN `tabBudget Account` ba ON b.name = ba.parent
+            WHERE b.company = %(company)s AND b.fiscal_year = %(fiscal_year)s AND b.docstatus = 1
+            GROUP BY b.cost_center, ba.account
+            """,
+            {"company": company, "fiscal_year": fiscal_year},
+            as_dict=True,
+        ):
+            accounts.add(row.account)
+            if row.cost_center:
+                own_budget[row.cost_center] = own_budget.get(row.cost_center, 0.0) + flt(row.amount)
+            else:
+                rollup.unallocated_budget += flt(row.amount)
+
+    own_actual = {}
+    if accounts:
+        own_actual = dict(
+            frappe.db.sql(
+                """
+                SELECT cost_center, SUM(amount)
+                FROM `tabUIS Budget Consumption`
+                WHERE company = %(company)s AND fiscal_year = %(fiscal_year)s AND account IN %(accounts)s
+                GROUP BY cost_center
+                """,
+                {"company": company, "fiscal_year": fiscal_year, "accounts": tuple(accounts)},
+            )
+        )
+
+    for node in nodes:
+        node.own_budget = node.budget = own_budget.get(node.name, 0.0)
+        node.own_actual = node.actual = flt(own_actual.get(node.name))
+
+    accumulate_nested_set(nodes)
+    for node in nodes:
+        node.remaining = node.budget - node.actual
+
+    rollup.nodes = nodes
+    return rollup
+
+
+def accumulate_nested_set(nodes):
+    """Add budget / actual of every node to its ancestors; *nodes* must be in lft order."""
+    open_nodes = []
+
+    def close():
+        node = open_nodes.pop()
+        if open_nodes:
+            open_nodes[-1].budget += node.budget
+            open_nodes[-1].actual += node.actual
+
+    for node in nodes:
+        while open_nodes and node.lft > open_nodes[-1].rgt:
+            close()
+        open_nodes.append(node)
+
+    while open_nodes:
+        close()
@@ -0,0 +1,92 @@
+"""
+Company membership of accounting dimension records (Branch, Cost Center, Department, Project).
+
+The validate hook checks that every dimension value of a document belongs to
+the document's company. The names of each (dimension doctype, company) are
+kept as a set in Redis and memoized in the worker process, so a check is a
+set lookup. A version token per doctype tells the process memo when another
+worker has invalidated that doctype; tokens are read from Redis once per
+request (or job) and kept in frappe.local.
+
+Key facts
+─────────
+•  Saving, renaming or deleting a record of a dimension doctype drops that doctype's sets only
+•  Sets are built lazily, one query per (doctype, company) on first use
+"""
+
+import frappe
+
+MEMBERS_CACHE_KEY = "uis_dimension_members"
+VERSION_CACHE_KEY = "uis_dimension_members_version"
+DIMENSION_DOCTYPES = ("Branch", "Cost Center", "Department", "Project")
+
+_process_cache = {}
+
+
+# ──────────────────────────────────────────────────────────
+# 1 ▸ Lookups
+# ──────────────────────────────────────────────────────────
+def is_dimension_member(doctype, company, name):
+    return name in get_dimension_members(doctype, company)
+
+
+def get_dimension_members(doctype, company):
+    """frozenset of the *doctype* records of *company*."""
+    version = _get_version(doctype)
+    process_key = (frappe.local.site, doctype, company)
+
+    cached = _process_cache.get(process_key)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    members = frappe.cache().hget(
+        f"{MEMBERS_CACHE_KEY}::{doctype}",
+        company or "",
+        generator=lambda: frozenset(frappe.get_all(doctype, {"company": company}, pluck="name")),
+    )
+    _process_cache[process_key] = (version, members)
+    return members
+
+
+# ──────────────────────────────────────────────────────────
+# 2 ▸ Invalidation (dimension doctype events)
+# ──────────────────────────────────────────────────────────
+def clear_dimension_index(doc=None, method=None, *args, **kwargs):
+    doctype = doc.doctype
+    _clear_dimension_index(doctype)
+    # another worker may rebuild from pre-commit data meanwhile, clear again once committed
+    frappe.db.after_commit.add(lambda: _clear_dimension_index(doctype))
+
+
+def _clear_dimension_index(doctype):
+    version = frappe.generate_hash(length=10)
+    frappe.cache().delete_value(f"{MEMBERS_CACHE_KEY}::{doctype}")
+    frappe.cache().hset(VERSION_CACHE_KEY, doctype, version)
+    _get_local_versions()[doctype] = version
+    for key in [key for key in _process_cache if key[1] == doctype]:
+        _process_cache.pop(key, None)
+
+
+# ──────────────────────────────────────────────────────────
+# 3 ▸ Helpers
+# ──────────────────────────────────────────────────────────
+def _get_version(doctype):
+    versions = _get_local_versions()
+    if versions.get(doctype):
+        return versions[doctype]
+
+    version = frappe.cache().hget(VERSION_CACHE_KEY, doctype)
+    if not version:
+        version = frappe.generate_hash(length=10)
+        frappe.cache().hset(VERSION_CACHE_KEY, doctype, version)
+
+    versions[doctype] = version
+    return version
+
+
+def _get_local_versions():
+    # frappe.local starts empty for every request and job
+    versions = getattr(frappe.local, "uis_dimension_versions", None)
+    if versions is None:
+        versions = frappe.local.uis_dimension_versions = {}
+    return versions
@@ -0,0 +1,124 @@
+"""
+Compiled accounting dimension plan of a parent doctype, followed by the validate hook.
+
+Reading it off the meta once per doctype replaces the as_dict() calls and
+meta.fields scans done per document and per row. Plans are memoized in the
+worker process; a version token in Redis, renewed on any meta change, tells
+the memo when to recompile. The token is read once per request (or job) and
+kept in frappe.local.
+
+Key facts
+─────────
+•  `checks` are the dimension Link fields of the doctype itself, `tables` its table fields with
+   the child doctype's dimension fields (`fields`, for propagation) and Link checks (`checks`)
+•  A check is (fieldname, label, link doctype, mandatory); the special cases (project optional on
+   Sales Order, no branch / department on Asset Movement) are resolved when compiling
+•  DocType, Custom Field and Property Setter changes, and bench clear-cache, invalidate every plan
+"""
+
+import frappe
+
+DIMENSIONS = {"branch", "cost_center", "department", "project"}
+VERSION_CACHE_KEY = "uis_dimension_plan_version"
+
+_process_cache = {}
+
+
+# ──────────────────────────────────────────────────────────
+# 1 ▸ Lookups
+# ──────────────────────────────────────────────────────────
+def get_dimension_plan(doctype):
+    version = _get_version()
+    process_key = (frappe.local.site, doctype)
+
+    cached = _process_cache.get(process_key)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    plan = _compile_plan(doctype)
+    _process_cache[process_key] = (version, plan)
+    return plan
+
+
+def get_dimension_checks(doctype, parent_doctype=None):
+    """Dimension checks of *doctype*, as a row of *parent_doctype* when given."""
+    if not parent_doctype:
+        return get_dimension_plan(doctype).checks
+
+    for table in get_dimension_plan(parent_doctype).tables:
+        if table.doctype == doctype:
+            return table.checks
+    return _compile_checks(doctype, parent_doctype)
+
+
+# ──────────────────────────────────────────────────────────
+# 2 ▸ Invalidation (meta changes)
+# ──────────────────────────────────────────────────────────
+def clear_dimension_plans(doc=None, method=None, *args, **kwargs):
+    _clear_dimension_plans()
+    # also a clear_cache hook, which may run without a transaction
+    if frappe.db:
+        frappe.db.after_commit.add(_clear_dimension_plans)
+
+
+def _clear_dimension_plans():
+    version = frappe.generate_hash(length=10)
+    frappe.cache().set_value(VERSION_CACHE_KEY, version)
+    frappe.local.uis_dimension_plan_version = version
+    _process_cache.clear()
+
+
+# ──────────────────────────────────────────────────────────
+# 3 ▸ Helpers
+# ──────────────────────────────────────────────────────────
+def _get_version():
+    # frappe.local starts empty for every request and job
+    version = getattr(frappe.local, "uis_dimension_plan_version", None)
+    if version:
+        return version
+
+    version = frappe.cache().get_value(VERSION_CACHE_KEY)
+    if not version:
+        version = frappe.generate_hash(length=10)
+        frappe.cache().set_value(VERSION_CACHE_KEY, version)
+
+    frappe.local.uis_dimension_plan_version = version
+    return version
+
+
+def _compile_plan(doctype):
+    meta = frappe.get_meta(doctype)
+    tables = []
+    for df in meta.get_table_fields():
+        child_meta = frappe.get_meta(df.options)
+        tables.append(
+            frappe._dict(
+                fieldname=df.fieldname,
+                doctype=df.options,
+                fields=[fieldname for fieldname in sorted(DIMENSIONS) if child_meta.has_field(fieldname)],
+                checks=_compile_checks(df.options, doctype),
+            )
+        )
+
+    return frappe._dict(checks=_compile_checks(doctype), tables=tables)
+
+
+def _compile_checks(doctype, parent_doctype=None):
+    checks = []
+    for df in frappe.get_meta(doctype).fields:
+        fieldname = df.fieldname
+        if df.fieldtype != "Link" or fieldname not in DIMENSIONS:
+            continue
+
+        # Asset Movement carries no branch / department of its own
+        if (
+            doctype in ("Asset Movement", "Asset Movement Item") or parent_doctype == "Asset Movement"
+        ) and fieldname in ("branch", "department"):
+            continue
+
+        # project is optional on Sales Orders
+        mandatory = not (
+            (doctype == "Sales Order" or parent_doctype == "Sales Order") and fieldname == "project"
+        )
+        checks.append((fieldname, frappe.bold(df.label), df.options, mandatory))
+    return checks
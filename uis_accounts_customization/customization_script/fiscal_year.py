@@ -0,0 +1,145 @@
+"""
+Fiscal year lookups by (date, company) without a query per call.
+
+Every enabled Fiscal Year is loaded once, with its Fiscal Year Company links,
+into date-sorted interval lists per company; a lookup is a bisect on the start
+dates. The lists are kept in Redis and memoized in the worker process; a
+version token tells the process memo when another worker has invalidated them.
+The token is read from Redis once per request (or job) and kept in frappe.local.
+
+Key facts
+─────────
+•  A fiscal year without companies applies to every company (same as ERPNext)
+•  Overlapping years resolve like ERPNext: the one starting last wins
+•  Any Fiscal Year save, rename or delete invalidates the lists
+"""
+
+from bisect import bisect_right
+
+import frappe
+from erpnext.accounts.utils import FiscalYearError
+from frappe import _
+from frappe.utils import formatdate, getdate
+
+CACHE_KEY = "uis_fiscal_year_intervals"
+VERSION_CACHE_KEY = "uis_fiscal_year_intervals_version"
+# interval lists of the fiscal years without companies, and of every fiscal year (no company given)
+ALL_COMPANIES = "__all__"
+ANY_COMPANY = "__any__"
+
+_process_cache = {}
+
+
+# ──────────────────────────────────────────────────────────
+# 1 ▸ Lookups
+# ──────────────────────────────────────────────────────────
+def get_fiscal_year_name(date, company=None, raise_exception=True):
+    """Name of the fiscal year of *date* for *company*; throws FiscalYearError (or returns None) when there is none."""
+    fiscal_year = get_fiscal_year_details(date, company, raise_exception)
+    return fiscal_year[0] if fiscal_year else None
+
+
+def get_fiscal_year_details(date, company=None, raise_exception=True):
+    """(name, year_start_date, year_end_date) of the fiscal year of *date*, like erpnext.accounts.utils.get_fiscal_year."""
+    date = getdate(date)
+    intervals = get_intervals()
+    starts, years = intervals.get(company or ANY_COMPANY) or intervals[ALL_COMPANIES]
+
+    # walk back from the last year starting on or before the date
+    for position in range(bisect_right(starts, date) - 1, -1, -1):
+        if years[position][2] >= date:
+            return years[position]
+
+    if raise_exception:
+        error_msg = _("{0} {1} is not in any active Fiscal Year").format(_("Date"), formatdate(date))
+        if company:
+            error_msg = _("{0} for {1}").format(error_msg, frappe.bold(company))
+        frappe.throw(error_msg, FiscalYearError)
+    return None
+
+
+def get_fiscal_year_dates(fiscal_year):
+    """frappe._dict(year_start_date, year_end_date) of a fiscal year name, None when unknown."""
+    dates = get_intervals()["__dates__"].get(fiscal_year)
+    return frappe._dict(year_start_date=dates[0], year_end_date=dates[1]) if dates else None
+
+
+def get_intervals():
+    version = _get_version()
+    cached = _process_cache.get(frappe.local.site)
+    if cached and cached[0] == version:
+        return cached[1]
+
+    intervals = frappe.cache().get_value(CACHE_KEY, generator=_build_intervals)
+    _process_cache[frappe.local.site] = (version, intervals)
+    return intervals
+
+
+# ──────────────────────────────────────────────────────────
+# 2 ▸ Invalidation (Fiscal Year events)
+# ──────────────────────────────────────────────────────────
+def clear_fiscal_year_cache(doc=None, method=None, *args, **kwargs):
+    _clear_fiscal_year_cache()
+    # another worker may rebuild from pre-commit data meanwhile, clear again once committed
+    frappe.db.after_commit.add(_clear_fiscal_year_cache)
+
+
+def _clear_fiscal_year_cache():
+    version = frappe.generate_hash(length=10)
+    frappe.cache().delete_value(CACHE_KEY)
+    frappe.cache().set_value(VERSION_CACHE_KEY, version)
+    frappe.local.uis_fiscal_year_version = version
+    _process_cache.pop(frappe.local.site, None)
+
+
+# ──────────────────────────────────────────────────────────
+# 3 ▸ Helpers
+# ──────────────────────────────────────────────────────────
+def _get_version():
+    # frappe.local starts empty for every request and job
+    version = getattr(frappe.local, "uis_fiscal_year_version", None)
+    if version:
+        return version
+
+    version = frappe.cache().get_value(VERSION_CACHE_KEY)
+    if not version:
+        version = frappe.generate_hash(length=10)
+        frappe.cache().set_value(VERSION_CACHE_KEY, version)
+
+    frappe.local.uis_fiscal_year_version = version
+    return version
+
+
+def _build_intervals():
+    """
+    {company: (start dates, [(name, start, end)])} of the enabled years sorted by start,
+    plus "__dates__": {name: (start, end)} of every year.
+    """
+    years = frappe.get_all(
+        "Fiscal Year",
+        fields=["name", "year_start_date", "year_end_date", "disabled"],
+        order_by="year_start_date",
+    )
+    companies = {}
+    for link in frappe.get_all("Fiscal Year Company", filters={"parenttype": "Fiscal Year"}, fields=["parent", "company"]):
+        companies.setdefault(link.parent, set()).add(link.company)
+
+    years_by_company = {ALL_COMPANIES: [], ANY_COMPANY: []}
+    for year in years:
+        if year.disabled:
+            continue
+        interval = (year.name, getdate(year.year_start_date), getdate(year.year_end_date))
+        years_by_company[ANY_COMPANY].append(interval)
+        for company in companies.get(year.name) or (ALL_COMPANIES,):
+            years_by_company.setdefault(company, []).append(interval)
+
+    intervals = {}
+    for company, company_years in years_by_company.items():
+        if company not in (ALL_COMPANIES, ANY_COMPANY):
+            company_years = sorted(company_years + years_by_company[ALL_COMPANIES], key=lambda year: year[1])
+        intervals[company] = ([year[1] for year in company_years], company_years)
+
+    intervals["__dates__"] = {
+        year.name: (getdate(year.year_start_date), getdate(year.year_end_date)) for year in years
+    }
+    return intervals
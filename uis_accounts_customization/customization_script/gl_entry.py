@@ -0,0 +1,18 @@
+import frappe
+
+from uis_accounts_customization.customization_script.budget import capture_posted_gl_entry
+from uis_accounts_customization.uis_accounts_customization.doctype.uis_budget_consumption.uis_budget_consumption import (
+    is_reposting,
+    mark_for_rebuild,
+    update_consumption,
+)
+
+
+def on_submit(doc, method):
+    # Cancelling a voucher submits reversal entries with swapped debit / credit,
+    # so adding them nets the original entries out; GL Entries are never cancelled themselves.
+    update_consumption([doc])
+    if is_reposting(doc):
+        # the entries this one replaces were deleted without leaving the buckets
+        mark_for_rebuild(doc)
+    capture_posted_gl_entry(doc)
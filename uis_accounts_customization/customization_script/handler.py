@@ -1,6 +1,13 @@
 import frappe
 from frappe.utils import cint
 
+from uis_accounts_customization.customization_script.dimension_index import get_dimension_members
+from uis_accounts_customization.customization_script.dimension_plan import (
+    DIMENSIONS,
+    get_dimension_checks,
+    get_dimension_plan,
+)
+
 # ------------------------------------------------------------------------- #
 # ❶  Main validate hook
 # ------------------------------------------------------------------------- #
@@ -8,6 +15,7 @@ def validate(doc, method):
     """
     • Propagate accounting-dimension values from parent → child rows
     • Enforce mandatory accounting-dimension presence & company correctness
+    Both follow the compiled dimension plan of the doctype (see dimension_plan).
     """
 
     # Skip meta / system doctypes or docs without a company
@@ -25,22 +33,24 @@ def validate(doc, method):
     ):
         return
 
+    plan = get_dimension_plan(doc.doctype)
+
     # 1️⃣  Auto-fill children that are missing dimensions
-    propagate_dimensions_from_parent(doc)
+    propagate_dimensions_from_parent(doc, plan)
 
     # 2️⃣  Mandatory / validity checks
-    meta_cache = {}  # <doctype> → [valid record names]
-    error = get_meta_info(doc, meta_cache)
+    meta_cache = {}  # (<doctype>, <company>) → set of valid record names
+    error = check_dimensions(doc, plan.checks, meta_cache)
 
-    for table_field in (
-        f for f, v in doc.as_dict().items() if isinstance(v, list)
-    ):
-        for row in doc.get(table_field):
-            error += get_meta_info(
+    for table in plan.tables:
+        if not table.checks:
+            continue
+        for row in doc.get(table.fieldname) or []:
+            error += check_dimensions(
                 row,
+                table.checks,
                 meta_cache,
                 is_child=True,
-                parent_doctype=doc.doctype,
                 parent_company=doc.company
             )
 
@@ -50,9 +60,7 @@ def validate(doc, method):
 # ------------------------------------------------------------------------- #
 # ❷  Utility: propagate dimensions
 # ------------------------------------------------------------------------- #
-DIMENSIONS = {"branch", "cost_center", "department", "project"}
-
-def propagate_dimensions_from_parent(doc):
+def propagate_dimensions_from_parent(doc, plan=None):
     """
     Copy each dimension from parent → child row **once**
     (only when child field is blank / falsy).
@@ -62,12 +70,13 @@ def propagate_dimensions_from_parent(doc):
     if not parent_dims:
         return  # Nothing to copy
 
-    for table_field in (
-        f for f, v in doc.as_dict().items() if isinstance(v, list)
-    ):
-        for row in doc.get(table_field):
-            for fld, val in parent_dims.items():
-                if fld in row.as_dict() and not row.get(fld):
+    for table in (plan or get_dimension_plan(doc.doctype)).tables:
+        fields = [(fld, parent_dims[fld]) for fld in table.fields if fld in parent_dims]
+        if not fields:
+            continue
+        for row in doc.get(table.fieldname) or []:
+            for fld, val in fields:
+                if not row.get(fld):
                     row.set(fld, val)
 
 # ------------------------------------------------------------------------- #
@@ -82,55 +91,39 @@ def get_meta_info(
 ) -> str:
     """
     Return HTML string listing any problems for *record*.
-    Uses meta_cache to avoid repetitive DB hits.
+    Uses meta_cache to avoid repetitive cache hits; the sets come from dimension_index.
     """
-
-    meta = frappe.get_meta(record.doctype)
+    return check_dimensions(
+        record,
+        get_dimension_checks(record.doctype, parent_doctype),
+        meta_cache,
+        is_child=is_child,
+        parent_company=parent_company,
+    )
+
+def check_dimensions(record, checks, meta_cache, is_child=False, parent_company=None):
+    """Problems of *record* against its compiled dimension *checks*."""
     problems = []
+    prefix = f"{record.doctype} : Row {getattr(record, 'idx', '?')}, " if is_child else ""
 
-    for df in meta.fields:
-        fieldname = df.fieldname
-
-        if df.fieldtype != "Link" or fieldname not in DIMENSIONS:
-            continue
-
-        label = frappe.bold(df.label)
-
-        # ❗ Special cases
-        skip_mandatory_check = (
-            (record.doctype == "Sales Order" or parent_doctype == "Sales Order")
-            and fieldname == "project"
-        )
-
-         # ❗ Special case: Skip all validation for Branch and Department on Asset Movement
-        if (
-            record.doctype in ("Asset Movement", "Asset Movement Item")
-            or parent_doctype == "Asset Movement"
-        ) and fieldname in ("branch", "department"):
-            continue
-
-
+    for fieldname, label, doctype, mandatory in checks:
+        value = record.get(fieldname)
 
         # -- 1. Missing value -------------------------------------------------
-        if not record.get(fieldname) and not skip_mandatory_check:
-            prefix = f"{record.doctype} : Row {getattr(record, 'idx', '?')}, " if is_child else ""
-            problems.append(f"{prefix}{label} is a mandatory field<br>")
+        if not value:
+            if mandatory:
+                problems.append(f"{prefix}{label} is a mandatory field<br>")
             continue
 
         # -- 2. Ensure linked value belongs to same company -------------------
-        if record.get(fieldname):
-            doctype = df.options
-            company = getattr(record, "company", parent_company)
-
-            if doctype not in meta_cache:
-                meta_cache[doctype] = frappe.get_all(
-                    doctype, {"company": company}, pluck="name"
-                )
-
-            if record.get(fieldname) not in meta_cache[doctype]:
-                prefix = f"{record.doctype} : Row {getattr(record, 'idx', '?')}, " if is_child else ""
-                problems.append(
-                    f"{prefix}Incorrect value in {label} field<br>"
-                )
+        company = getattr(record, "company", parent_company)
+
+        if (doctype, company) not in meta_cache:
+            meta_cache[(doctype, company)] = get_dimension_members(doctype, company)
+
+        if value not in meta_cache[(doctype, company)]:
+            problems.append(
+                f"{prefix}Incorrect value in {label} field<br>"
+            )
 
     return "".join(problems)
@@ -0,0 +1,94 @@
+"""
+Compiled Monthly Distribution percentages shared by the budget checks and the reports.
+
+Each distribution is turned once into 12 running totals aligned to the fiscal
+year start month (slot 0 = first month of the fiscal year), so the share of any
+run of months is a subtraction. Vectors are cached in Redis and dropped when a
+Monthly Distribution is saved or deleted.
+"""
+
+import frappe
+from frappe.utils import flt, getdate
+
+CACHE_KEY = "uis_monthly_distribution"
+
+MONTHS = (
+    "January", "February", "March", "April", "May", "June",
+    "July", "August", "September", "October", "November", "December",
+)
+
+
+def get_cumulative_distribution(monthly_distribution, fiscal_year_start):
+    """Running percentage totals per fiscal month; an even 100/12 split without a distribution."""
+    start_month = getdate(fiscal_year_start).month
+    return frappe.cache().hget(
+        CACHE_KEY,
+        f"{monthly_distribution or ''}::{start_month}",
+        generator=lambda: _build_cumulative_distribution(monthly_distribution, start_month),
+    )
+
+
+def get_fiscal_month_index(date, fiscal_year_start):
+    date, fiscal_year_start = getdate(date), getdate(fiscal_year_start)
+    return (date.year - fiscal_year_start.year) * 12 + date.month - fiscal_year_start.month
+
+
+def get_period_percentage(monthly_distribution, fiscal_year_start, from_date, to_date):
+    """Share of the year allocated to the months of *from_date* through *to_date* (both included)."""
+    cumulative = get_cumulative_distribution(monthly_distribution, fiscal_year_start)
+    start = max(get_fiscal_month_index(from_date, fiscal_year_start), 0)
+    end = min(get_fiscal_month_index(to_date, fiscal_year_start), 11)
+
+    if end < start:
+        return 0.0
+
+    return cumulative[end] - (cumulative[start - 1] if start else 0.0)
+
+
+def get_accumulated_percentage(monthly_distribution, fiscal_year_start, posting_date):
+    """Share of the year up to *posting_date*, stepping whole months from the fiscal year start like ERPNext."""
+    posting_date, fiscal_year_start = getdate(posting_date), getdate(fiscal_year_start)
+    index = get_fiscal_month_index(posting_date, fiscal_year_start)
+    if posting_date.day < fiscal_year_start.day:
+        index -= 1
+
+    if index < 0:
+        return 0.0
+
+    return get_cumulative_distribution(monthly_distribution, fiscal_year_start)[min(index, 11)]
+
+
+def get_accumulated_monthly_budget(monthly_distribution, posting_date, fiscal_year, annual_budget):
+    """Drop-in for ERPNext's helper, reading the budget's own distribution."""
+    fiscal_year_start = frappe.get_cached_value("Fiscal Year", fiscal_year, "year_start_date")
+    return flt(annual_budget) * get_accumulated_percentage(monthly_distribution, fiscal_year_start, posting_date) / 100
+
+
+def clear_distribution_cache(doc=None, method=None):
+    _clear_distribution_cache()
+    # another worker may rebuild from pre-commit data meanwhile, clear again once committed
+    frappe.db.after_commit.add(_clear_distribution_cache)
+
+
+def _clear_distribution_cache():
+    frappe.cache().delete_value(CACHE_KEY)
+
+
+def _build_cumulative_distribution(monthly_distribution, start_month):
+    percentages = {}
+    if monthly_distribution:
+        for row in frappe.get_all(
+            "Monthly Distribution Percentage",
+            filters={"parent": monthly_distribution},
+            fields=["month", "percentage_allocation"],
+        ):
+            percentages[row.month] = flt(row.percentage_allocation)
+
+    cumulative, total = [], 0.0
+    for slot in range(12):
+        month = MONTHS[(start_month - 1 + slot) % 12]
+        # like ERPNext, a named distribution allocates 0% to the months it has no row for
+        total += percentages.get(month, 0.0) if monthly_distribution else 100.0 / 12
+        cumulative.append(total)
+
+    return cumulative
@@ -1,9 +1,12 @@
 import frappe
-from uis_accounts_customization.customization_script.budget import verify_validate_expense_against_budget, validate_budget_for_fixed_asset
+from uis_accounts_customization.customization_script.budget import verify_validate_expense_against_budget, validate_budget_for_fixed_assets
+from uis_accounts_customization.uis_accounts_customization.doctype.uis_asset_budget_consumption.uis_asset_budget_consumption import update_asset_consumption
 
 def on_submit(doc, method):
-    for item in doc.items:
-        is_fixed_asset = frappe.db.get_value("Item", item.item_code, "is_fixed_asset")
-        if is_fixed_asset:
-            validate_budget_for_fixed_asset(doc, item.item_code, doc.branch)
+    # book the invoice first so the check sees it, as the old Purchase Invoice query did
+    update_asset_consumption(doc)
+    validate_budget_for_fixed_assets(doc)
     verify_validate_expense_against_budget(doc)
+
+def on_cancel(doc, method):
+    update_asset_consumption(doc, sign=-1)
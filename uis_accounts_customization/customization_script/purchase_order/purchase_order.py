@@ -1,20 +1,6 @@
 import frappe
-from uis_accounts_customization.customization_script.budget import verify_validate_expense_against_budget, validate_budget_for_fixed_asset,  validate_expense_against_budget
+from uis_accounts_customization.customization_script.budget import validate_expenses_against_budget, get_order_budget_entries
 
 @frappe.whitelist()
 def validate_budget(doc = "", method = ""):
-    for data in doc.get("items"):
-        args = data.as_dict()
-        args.update(
-            {
-                "doctype": doc.doctype,
-                "company": doc.company,
-                "posting_date": (
-                    doc.schedule_date
-                    if doc.doctype == "Material Request"
-                    else doc.transaction_date
-                ),
-            }
-        )
-        validate_expense_against_budget(args)
-
+    validate_expenses_against_budget(get_order_budget_entries(doc), doc)
@@ -167,14 +167,30 @@ override_doctype_class = {
 
 doc_events = {
 	"Purchase Invoice": {
+		"before_submit": "uis_accounts_customization.customization_script.budget.reserve_budget",
 		"on_submit": "uis_accounts_customization.customization_script.purchase_invoice.on_submit",
+		"on_cancel": "uis_accounts_customization.customization_script.purchase_invoice.on_cancel",
         
 	},
 	"Journal Entry": {
+		"before_submit": "uis_accounts_customization.customization_script.budget.reserve_budget",
 		"on_submit": "uis_accounts_customization.customization_script.journal_entry.on_submit",
         
 	},
+    "GL Entry": {
+        "on_submit": "uis_accounts_customization.customization_script.gl_entry.on_submit",
+    },
+    "Monthly Distribution": {
+        "on_update": "uis_accounts_customization.customization_script.monthly_distribution.clear_distribution_cache",
+        "on_trash": "uis_accounts_customization.customization_script.monthly_distribution.clear_distribution_cache",
+    },
+    "Fiscal Year": {
+        "on_update": "uis_accounts_customization.customization_script.fiscal_year.clear_fiscal_year_cache",
+        "after_rename": "uis_accounts_customization.customization_script.fiscal_year.clear_fiscal_year_cache",
+        "on_trash": "uis_accounts_customization.customization_script.fiscal_year.clear_fiscal_year_cache",
+    },
     "Purchase Order" : {
+        "before_submit":"uis_accounts_customization.customization_script.budget.reserve_budget",
         "on_submit":"uis_accounts_customization.customization_script.purchase_order.purchase_order.validate_budget",
 
     },
@@ -210,26 +226,38 @@ for dt in ["Account", "Cost Center", "Department"]:
         "on_trash":      "uis_accounts_customization.customization_script.company_tree_sync.cascade_delete",
     }
 
+# the budget index keeps cost center subtrees for group cost center budgets
+for event in ("on_update", "after_rename", "on_trash"):
+    doc_events["Cost Center"][event] = [
+        doc_events["Cost Center"][event],
+        "uis_accounts_customization.customization_script.budget_index.clear_budget_index",
+    ]
+
+# the validate hook checks dimension values against cached per-company sets
+for dt in ("Branch", "Cost Center", "Department", "Project"):
+    events = doc_events.setdefault(dt, {})
+    for event in ("on_update", "after_rename", "on_trash"):
+        handlers = events.get(event) or []
+        events[event] = (handlers if isinstance(handlers, list) else [handlers]) + [
+            "uis_accounts_customization.customization_script.dimension_index.clear_dimension_index",
+        ]
+
+# the validate hook follows dimension plans compiled from the meta
+for dt in ("DocType", "Custom Field", "Property Setter"):
+    events = doc_events.setdefault(dt, {})
+    for event in ("on_update", "after_rename", "on_trash"):
+        events[event] = "uis_accounts_customization.customization_script.dimension_plan.clear_dimension_plans"
+
+clear_cache = "uis_accounts_customization.customization_script.dimension_plan.clear_dimension_plans"
+
 # Scheduled Tasks
 # ---------------
 
-# scheduler_events = {
-# 	"all": [
-# 		"uis_accounts_customization.tasks.all"
-# 	],
-# 	"daily": [
-# 		"uis_accounts_customization.tasks.daily"
-# 	],
-# 	"hourly": [
-# 		"uis_accounts_customization.tasks.hourly"
-# 	],
-# 	"weekly": [
-# 		"uis_accounts_customization.tasks.weekly"
-# 	],
-# 	"monthly": [
-# 		"uis_accounts_customization.tasks.monthly"
-# 	],
-# }
+scheduler_events = {
+	"hourly_long": [
+		"uis_accounts_customization.customization_script.budget_alerts.scan_budget_thresholds"
+	],
+}
 
 # Testing
 # -------
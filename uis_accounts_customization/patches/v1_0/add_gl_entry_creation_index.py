@@ -0,0 +1,6 @@
+import frappe
+
+
+def execute():
+    # the budget threshold scan reads GL Entries created after its watermark
+    frappe.db.add_index("GL Entry", ["creation"], "creation_index")
@@ -0,0 +1,7 @@
+from uis_accounts_customization.uis_accounts_customization.doctype.uis_asset_budget_consumption.uis_asset_budget_consumption import (
+    build_asset_budget_consumption,
+)
+
+
+def execute():
+    build_asset_budget_consumption()
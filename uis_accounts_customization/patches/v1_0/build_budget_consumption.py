@@ -0,0 +1,7 @@
+from uis_accounts_customization.uis_accounts_customization.doctype.uis_budget_consumption.uis_budget_consumption import (
+    build_budget_consumption,
+)
+
+
+def execute():
+    build_budget_consumption()
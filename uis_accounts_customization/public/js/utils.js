@@ -8,4 +8,25 @@ $.extend(uis_accounts_customization.utils, {
             }
         })
     }
-})
\ No newline at end of file
+})
+
+// budget exceeded messages carry a link; the breakup is fetched only when it is opened
+$(document).on("click", "a.uis-budget-breakup", function (e) {
+    e.preventDefault();
+    const $link = $(this);
+    if ($link.data("loading")) return;
+
+    $link.data("loading", true);
+    frappe.call({
+        method: "uis_accounts_customization.customization_script.budget.get_budget_expense_breakup",
+        args: { token: $link.attr("data-token") },
+        callback(r) {
+            if (r.message) {
+                $link.replaceWith(r.message);
+            }
+        },
+        always() {
+            $link.data("loading", false);
+        },
+    });
+});
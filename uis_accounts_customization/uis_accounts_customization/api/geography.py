@@ -0,0 +1,242 @@
+"""
+Bulk loader for State and City.
+
+Rows come from an uploaded dataset File (CSV or JSON) or from the
+countriesnow.space API. Either way they go
+through the same chunked load; remote rows are loaded as they arrive.
+
+Key facts
+─────────
+•  A row is {country, state, city}; a row without a city only adds its state
+•  Per chunk, rows already in the database are dropped with one IN query per doctype, the rest go in with one bulk INSERT
+•  Each chunk is committed together with a checkpoint (rows done) kept per dataset, so a rerun resumes after the last committed chunk
+•  City is named by city_name: a city already present, under any state, is skipped
+•  Rows whose country does not exist, or whose state could not be added, are skipped
+•  Remote requests run on a thread pool through geography_fetcher, rate limited and retried with
+   backoff (site config: uis_geography_fetch_workers / _rate_limit / _retries); responses are
+   cached in Redis, so a rerun after an interruption only fetches what is missing
+•  Worker threads only do HTTP; cache, logging and inserts stay in the job's thread
+"""
+
+import csv
+import hashlib
+import io
+import json
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from itertools import islice
+
+import frappe
+import requests
+from frappe import _
+from frappe.utils import cint, flt, now
+
+from uis_accounts_customization.uis_accounts_customization.api.geography_fetcher import GeographyFetcher
+
+CHUNK_SIZE = 1000
+CHECKPOINT_KEY = "uis_geography_checkpoint"
+
+REMOTE_COUNTRIES = ("Saudi Arabia", "Egypt", "India")
+REMOTE_CACHE_KEY = "uis_geography_response"
+REMOTE_CACHE_TTL = 7 * 24 * 3600
+
+
+# ──────────────────────────────────────────────────────────
+# 1 ▸ Entry points
+# ──────────────────────────────────────────────────────────
+@frappe.whitelist()
+def load_geography(file_url=None, source="file", countries=None):
+    """Queue a load from an uploaded File (*file_url*) or from the remote API (source="remote")."""
+    frappe.only_for("System Manager")
+    if source != "remote" and not file_url:
+        frappe.throw(_("Upload a State / City dataset (CSV or JSON) to load from"))
+
+    frappe.enqueue(
+        "uis_accounts_customization.uis_accounts_customization.api.geography.run_geography_load",
+        queue="long",
+        timeout=4000000,
+        job_id="uis_geography_load",
+        deduplicate=True,
+        file_url=file_url,
+        source=source,
+        countries=countries,
+    )
+
+
+def run_geography_load(file_url=None, source="file", countries=None):
+    if source == "remote":
+        rows = fetch_remote_rows(frappe.parse_json(countries) if countries else REMOTE_COUNTRIES)
+    else:
+        rows = parse_dataset(*read_dataset(file_url))
+
+    return load_rows(rows)
+
+
+# ──────────────────────────────────────────────────────────
+# 2 ▸ Sources
+# ──────────────────────────────────────────────────────────
+def read_dataset(file_url):
+    """(file name, content) of an uploaded File."""
+    if not file_url:
+        frappe.throw(_("Upload a State / City dataset (CSV or JSON) to load from"))
+
+    file_doc = frappe.get_doc("File", {"file_url": file_url})
+    return file_doc.file_name, file_doc.get_content()
+
+
+def parse_dataset(file_name, content):
+    """Rows of a CSV (country, state, city columns) or JSON (list of such objects) dataset."""
+    if isinstance(content, bytes):
+        content = content.decode("utf-8-sig")
+
+    if file_name.lower().endswith(".json"):
+        records = json.loads(content)
+    else:
+        records = csv.DictReader(io.StringIO(content))
+
+    rows = []
+    for record in records:
+        record = {(key or "").strip().lower(): (value or "").strip() for key, value in record.items()}
+        if record.get("country") and record.get("state"):
+            rows.append(frappe._dict(country=record["country"], state=record["state"], city=record.get("city") or None))
+    return rows
+
+
+def fetch_remote_rows(countries, fetcher=None, use_cache=True):
+    """
+    Rows from the countriesnow.space API, yielded as responses arrive: the states of every
+    country are fetched in parallel, then the cities of each state as soon as its country is in.
+    A request that still fails after its retries is logged and its country / state left out.
+    """
+    fetcher = fetcher or GeographyFetcher(
+        workers=cint(frappe.conf.get("uis_geography_fetch_workers")) or 8,
+        rate_limit=flt(frappe.conf.get("uis_geography_fetch_rate_limit")) or 10,
+        retries=cint(frappe.conf.get("uis_geography_fetch_retries", 3)),
+    )
+
+    with ThreadPoolExecutor(max_workers=fetcher.workers) as executor:
+        pending = {}
+
+        def submit(url, payload, country, state=None):
+            cache_key = get_response_cache_key(url, payload) if use_cache else None
+            cached = frappe.cache().get_value(cache_key) if cache_key else None
+            if cached is not None:
+                future = Future()
+                future.set_result(cached)
+            else:
+                future = executor.submit(fetcher.post, url, payload)
+            pending[future] = (country, state, payload, cache_key if cached is None else None)
+
+        for country in countries:
+            submit(fetcher.states_url, {"country": country}, country)
+
+        while pending:
+            for future in as_completed(list(pending)):
+                country, state, payload, cache_key = pending.pop(future)
+                try:
+                    data = future.result()
+                except (requests.RequestException, ValueError):
+                    frappe.log_error(f"Geography fetch failed: {payload}", frappe.get_traceback())
+                    continue
+
+                if cache_key and data is not None:
+                    frappe.cache().set_value(cache_key, data, expires_in_sec=REMOTE_CACHE_TTL)
+
+                if state is not None:
+                    for city in data or []:
+                        yield frappe._dict(country=country, state=state, city=city)
+                    continue
+
+                for state_row in (data or {}).get("states") or []:
+                    yield frappe._dict(country=country, state=state_row["name"], city=None)
+                    submit(fetcher.cities_url, {"country": country, "state": state_row["name"]}, country, state_row["name"])
+
+
+def get_response_cache_key(url, payload):
+    digest = hashlib.sha1(json.dumps([url, payload], sort_keys=True).encode()).hexdigest()
+    return f"{REMOTE_CACHE_KEY}::{digest}"
+
+
+# ──────────────────────────────────────────────────────────
+# 3 ▸ Load
+# ──────────────────────────────────────────────────────────
+def load_rows(rows):
+    """
+    Insert the missing States and Cities of *rows* chunk by chunk. A list resumes after its
+    last committed chunk; any other iterable (remote rows) is loaded as it is produced.
+    """
+    checkpoint_key = f"{CHECKPOINT_KEY}::{get_dataset_key(rows)}" if isinstance(rows, list) else None
+    done = cint(frappe.db.get_global(checkpoint_key)) if checkpoint_key else 0
+    remaining = iter(rows[done:] if checkpoint_key else rows)
+
+    inserted = frappe._dict(states=0, cities=0)
+    while chunk := list(islice(remaining, CHUNK_SIZE)):
+        states, inserted_states = insert_states(chunk)
+        inserted.states += inserted_states
+        inserted.cities += insert_cities(chunk, states)
+
+        done += len(chunk)
+        if checkpoint_key:
+            frappe.db.set_global(checkpoint_key, done)
+        frappe.db.commit()
+
+    if checkpoint_key:
+        frappe.defaults.clear_default(key=checkpoint_key, parent="__global")
+        frappe.db.commit()
+    return inserted
+
+
+def get_dataset_key(rows):
+    content = json.dumps([(row.country, row.state, row.city) for row in rows])
+    return hashlib.sha1(content.encode()).hexdigest()
+
+
+def insert_states(chunk):
+    """Add the missing states of *chunk*; returns (states present now, number inserted)."""
+    countries = {}
+    for row in chunk:
+        countries.setdefault(row.state, row.country)
+
+    existing = get_existing_names("State", countries)
+    known_countries = get_existing_names("Country", set(countries.values()))
+    missing = [
+        (state, country)
+        for state, country in countries.items()
+        if state not in existing and country in known_countries
+    ]
+
+    bulk_insert("State", ("state_province", "country"), missing)
+    return existing | {state for state, _country in missing}, len(missing)
+
+
+def insert_cities(chunk, states):
+    """Add the missing cities of *chunk* whose state is in *states*; returns the number inserted."""
+    cities = {}
+    for row in chunk:
+        if row.city and row.state in states:
+            cities.setdefault(row.city, row.state)
+
+    existing = get_existing_names("City", cities)
+    missing = [(city, state) for city, state in cities.items() if city not in existing]
+
+    bulk_insert("City", ("city_name", "state_province"), missing)
+    return len(missing)
+
+
+def get_existing_names(doctype, names):
+    if not names:
+        return set()
+    return set(frappe.db.sql_list(f"SELECT name FROM `tab{doctype}` WHERE name IN %(names)s", {"names": tuple(names)}))
+
+
+def bulk_insert(doctype, fields, values):
+    """Insert rows named by their first field (State and City are named by field)."""
+    if not values:
+        return
+
+    timestamp, user = now(), frappe.session.user
+    frappe.db.bulk_insert(
+        doctype,
+        ("name", "creation", "modified", "owner", "modified_by", "docstatus") + fields,
+        [(value[0], timestamp, timestamp, user, user, 0) + tuple(value) for value in values],
+        ignore_duplicates=True,
+    )
@@ -0,0 +1,80 @@
+"""
+HTTP client of the countriesnow.space geography API.
+
+Kept free of frappe so it can be exercised against a local stand-in server;
+geography.fetch_remote_rows wires it to site config, cache and logging.
+
+Key facts
+─────────
+•  One pooled session is shared by all worker threads
+•  Requests are spaced 1 / rate_limit seconds apart across threads
+•  Connection errors, timeouts and RETRY_STATUSES are retried with exponential backoff;
+   the last attempt raises
+"""
+
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+REMOTE_STATES_URL = "https://countriesnow.space/api/v0.1/countries/states"
+REMOTE_CITIES_URL = "https://countriesnow.space/api/v0.1/countries/state/cities"
+REMOTE_TIMEOUT = 30
+# responses worth another attempt
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class GeographyFetcher:
+    """
+    POSTs to the geography API from many threads over one pooled session, at most
+    *rate_limit* requests per second, retrying connection errors and RETRY_STATUSES
+    with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        states_url=REMOTE_STATES_URL,
+        cities_url=REMOTE_CITIES_URL,
+        workers=8,
+        rate_limit=10,
+        retries=3,
+        backoff=0.5,
+        timeout=REMOTE_TIMEOUT,
+    ):
+        self.states_url, self.cities_url = states_url, cities_url
+        self.workers, self.retries, self.backoff, self.timeout = workers, retries, backoff, timeout
+        self.interval = 1 / rate_limit if rate_limit else 0
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def post(self, url, payload):
+        """The `data` of the JSON response."""
+        for attempt in range(self.retries + 1):
+            self.wait_for_slot()
+            try:
+                response = self.session.post(url, json=payload, timeout=self.timeout)
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    response.raise_for_status()
+                    return response.json().get("data")
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+
+            time.sleep(self.backoff * 2**attempt)
+
+    def wait_for_slot(self):
+        """Space requests *interval* seconds apart across all threads."""
+        with self._lock:
+            current = time.monotonic()
+            slot = max(current, self._next_slot)
+            self._next_slot = slot + self.interval
+
+        if slot > current:
+            time.sleep(slot - current)
@@ -0,0 +1,130 @@
+# Copyright (c) 2026, Mohamed Elyamany and Contributors
+# See license.txt
+
+import json
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from uis_accounts_customization.uis_accounts_customization.api.geography_fetcher import GeographyFetcher
+
+
+class StandInServer(ThreadingHTTPServer):
+	"""Local stand-in for the geography API: echoes the payload back as `data`."""
+
+	daemon_threads = True
+
+	def __init__(self, delay=0.0):
+		super().__init__(("127.0.0.1", 0), StandInHandler)
+		self.delay = delay
+		# path -> statuses answered before a 200
+		self.failures = {}
+		self.hits = {}
+		self.arrivals = []
+		self.in_flight = self.max_in_flight = 0
+		self.lock = threading.Lock()
+
+	def url(self, path):
+		return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+	def do_POST(self):
+		server = self.server
+		payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+
+		with server.lock:
+			server.arrivals.append(time.monotonic())
+			server.hits[self.path] = server.hits.get(self.path, 0) + 1
+			failures = server.failures.get(self.path) or []
+			status = failures.pop(0) if failures else 200
+			server.in_flight += 1
+			server.max_in_flight = max(server.max_in_flight, server.in_flight)
+
+		time.sleep(server.delay)
+		with server.lock:
+			server.in_flight -= 1
+
+		body = json.dumps({"data": payload}).encode()
+		self.send_response(status)
+		self.send_header("Content-Type", "application/json")
+		self.send_header("Content-Length", str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, *args):
+		pass
+
+
+class TestGeographyFetcher(unittest.TestCase):
+	def start_server(self, delay=0.0):
+		server = StandInServer(delay)
+		threading.Thread(target=server.serve_forever, daemon=True).start()
+		self.addCleanup(server.server_close)
+		self.addCleanup(server.shutdown)
+		return server
+
+	def post_all(self, fetcher, url, count):
+		with ThreadPoolExecutor(max_workers=fetcher.workers) as executor:
+			return list(executor.map(lambda index: fetcher.post(url, {"index": index}), range(count)))
+
+	def test_requests_run_concurrently(self):
+		server = self.start_server(delay=0.2)
+		fetcher = GeographyFetcher(workers=4, rate_limit=0, retries=0)
+
+		started = time.monotonic()
+		data = self.post_all(fetcher, server.url("/states"), 8)
+		elapsed = time.monotonic() - started
+
+		self.assertEqual(data, [{"index": index} for index in range(8)])
+		self.assertGreater(server.max_in_flight, 1)
+		self.assertLessEqual(server.max_in_flight, 4)
+		# serially this would take 8 * 0.2s
+		self.assertLess(elapsed, 1.2)
+
+	def test_throttled_and_failing_responses_are_retried_with_backoff(self):
+		server = self.start_server()
+		server.failures["/states"] = [429, 503]
+		fetcher = GeographyFetcher(workers=1, rate_limit=0, retries=3, backoff=0.1)
+
+		started = time.monotonic()
+		data = fetcher.post(server.url("/states"), {"country": "Egypt"})
+		elapsed = time.monotonic() - started
+
+		self.assertEqual(data, {"country": "Egypt"})
+		self.assertEqual(server.hits["/states"], 3)
+		# slept 0.1s, then 0.2s
+		self.assertGreaterEqual(elapsed, 0.3)
+
+	def test_last_failure_is_raised(self):
+		server = self.start_server()
+		server.failures["/states"] = [500, 502, 504]
+		fetcher = GeographyFetcher(workers=1, rate_limit=0, retries=2, backoff=0.01)
+
+		with self.assertRaises(requests.HTTPError):
+			fetcher.post(server.url("/states"), {"country": "Egypt"})
+		self.assertEqual(server.hits["/states"], 3)
+
+	def test_client_errors_are_not_retried(self):
+		server = self.start_server()
+		server.failures["/states"] = [404]
+		fetcher = GeographyFetcher(workers=1, rate_limit=0, retries=3, backoff=0.01)
+
+		with self.assertRaises(requests.HTTPError):
+			fetcher.post(server.url("/states"), {"country": "Egypt"})
+		self.assertEqual(server.hits["/states"], 1)
+
+	def test_requests_are_rate_limited_across_threads(self):
+		server = self.start_server()
+		fetcher = GeographyFetcher(workers=4, rate_limit=20, retries=0)
+
+		self.post_all(fetcher, server.url("/cities"), 10)
+
+		arrivals = sorted(server.arrivals)
+		self.assertEqual(len(arrivals), 10)
+		# 10 requests at 20 per second span at least 9 intervals of 0.05s
+		self.assertGreaterEqual(arrivals[-1] - arrivals[0], 9 * 0.05 * 0.9)
@@ -1,6 +1,12 @@
 import frappe
-from frappe.utils import getdate
-import requests
+from frappe.utils import flt, getdate
+
+from uis_accounts_customization.customization_script.fiscal_year import get_fiscal_year_name
+from uis_accounts_customization.uis_accounts_customization.api.geography import load_geography
+from uis_accounts_customization.uis_accounts_customization.doctype.uis_asset_budget_consumption.uis_asset_budget_consumption import (
+    get_asset_consumed_amounts,
+    get_asset_consumed_amounts_by_branch,
+)
 
 @frappe.whitelist()
 def get_allocated_amount(doc = None, selected_doc=None):
@@ -16,6 +22,76 @@ def get_allocated_amount(doc = None, selected_doc=None):
     
     return get_allocated_amount_for_gl(doc, selected_doc)
 
+@frappe.whitelist()
+def get_allocated_amounts(doc=None, rows=None):
+    """
+    {row name: {allocated, used, remaining}} for the item rows of *doc* (or the given *rows*),
+    as get_allocated_amount works out per row, in one round trip: the fiscal year is resolved once,
+    the Budget Items of every row are read in one query and used amounts in one grouped query.
+    Fixed asset rows use Allocate Budget for Asset less what was invoiced, other rows their Budget.
+    """
+    doc = frappe._dict(frappe.parse_json(doc)) if type(doc) == str else doc
+    rows = frappe.parse_json(rows) if type(rows) == str else rows
+    rows = [frappe._dict(row) for row in (rows if rows is not None else doc.get("items") or []) if row.get("item_code")]
+    if not rows:
+        return {}
+
+    for row in rows:
+        row.branch = row.get("branch") or doc.get("branch")
+        if not row.branch:
+            frappe.throw("Branch cannot be empty")
+
+    amounts = {row.name: {"allocated": 0, "used": 0, "remaining": 0} for row in rows}
+    fiscal_year = get_fiscal_year(doc)
+    if not fiscal_year:
+        return amounts
+
+    item_codes = {row.item_code for row in rows}
+    branches = {row.branch for row in rows}
+    fixed_assets = set(frappe.get_all("Item", filters={"name": ["in", list(item_codes)], "is_fixed_asset": 1}, pluck="name"))
+
+    asset_budgets = get_budget_item_amounts("Allocate Budget for Asset", doc.company, fiscal_year, branches, fixed_assets)
+    gl_budgets = get_budget_item_amounts("Budget", doc.company, fiscal_year, branches, item_codes - fixed_assets)
+    used_amounts = get_used_budgets(doc, [row for row in rows if row.item_code in fixed_assets])
+
+    for row in rows:
+        key = (row.branch, row.item_code)
+        allocated = (asset_budgets if row.item_code in fixed_assets else gl_budgets).get(key, 0)
+        used = used_amounts.get(row.name, 0)
+        amounts[row.name] = {"allocated": allocated, "used": used, "remaining": allocated - used}
+
+    return amounts
+
+def get_budget_item_amounts(budget_doctype, company, fiscal_year, branches, item_codes):
+    """{(branch, item_code): budget amount} from the latest submitted *budget_doctype* of each branch."""
+    if not (branches and item_codes):
+        return {}
+
+    budgets = {}
+    for name, branch in frappe.get_all(
+        budget_doctype,
+        filters={"company": company, "fiscal_year": fiscal_year, "branch": ["in", list(branches)], "docstatus": 1},
+        fields=["name", "branch"],
+        order_by="modified desc",
+        as_list=True,
+    ):
+        budgets.setdefault(branch, name)
+
+    if not budgets:
+        return {}
+
+    branch_of_budget = {name: branch for branch, name in budgets.items()}
+    amounts = {}
+    for parent, item_code, budget_amount in frappe.get_all(
+        "Budget Item",
+        filters={"parent": ["in", list(branch_of_budget)], "parenttype": budget_doctype, "item_code": ["in", list(item_codes)]},
+        fields=["parent", "item_code", "budget_amount"],
+        order_by="idx",
+        as_list=True,
+    ):
+        amounts.setdefault((branch_of_budget[parent], item_code), flt(budget_amount))
+    return amounts
+
 
 def get_allocated_amount_for_asset(doc, selected_doc):
 
@@ -34,59 +110,46 @@ def get_allocated_amount_for_asset(doc, selected_doc):
 
 @frappe.whitelist()
 def get_fiscal_year(doc):
-    fiscal_years = frappe.get_all(
-        "Fiscal Year",
-        filters={"year_start_date": ["<=", doc.posting_date], "year_end_date": [">=", doc.posting_date]},
-        pluck="name"
-    )
-
-    return next(
-        (fy for fy in fiscal_years if frappe.db.exists("Fiscal Year Company", {"parent": fy, "company": doc.company})),
-        None
-    )
+    doc = frappe._dict(frappe.parse_json(doc)) if type(doc) == str else doc
+    if not doc.posting_date:
+        return None
+    return get_fiscal_year_name(doc.posting_date, doc.company, raise_exception=False)
 
 def get_allocated_budget(doc, selected_doc, branch):
     fiscal_year = get_fiscal_year(doc)
     if not fiscal_year:
         return 0
-    
-    budget_name = frappe.get_value(
-        "Allocate Budget for Asset",
-        {"fiscal_year": fiscal_year, "branch": branch, "company": doc.company, "docstatus": 1},
-        "name"
-    )
-    
-    if not budget_name:
-        return 0
 
-    allocated_budget = frappe.get_value(
-        "Budget Item",
-        {"parent": budget_name, "item_code": selected_doc.item_code},
-        "budget_amount"
-    )
-
-    return allocated_budget or 0
+    return get_budget_item_amounts(
+        "Allocate Budget for Asset", doc.company, fiscal_year, [branch], [selected_doc.item_code]
+    ).get((branch, selected_doc.item_code), 0)
 
 def get_used_budget(doc, selected_doc, branch):
+    """Submitted Purchase Invoice amount of the item in the branch and fiscal year."""
     fiscal_year = get_fiscal_year(doc)
     if not fiscal_year:
         return 0
-    filters = {
-                "item_code" : selected_doc.item_code, 
-                "docstatus" : 1,
-                "branch" : selected_doc.branch
-            }
-    pi_item = frappe.db.get_values("Purchase Invoice Item", filters , ["parent", "amount"], as_dict = True)
-    used_amount = 0
-    for item in pi_item:
-        pi_parent_obj = frappe.get_value("Purchase Invoice", item.parent, ["posting_date", "company", "branch"], as_dict=True)
-
-        if doc.company != pi_parent_obj.company and branch != pi_parent_obj.branch:
-            continue
-        item_parent_fy_year = get_fiscal_year(frappe._dict({"posting_date" : pi_parent_obj.get('posting_date'), "company":pi_parent_obj.company}))
-        if fiscal_year == item_parent_fy_year:
-            used_amount +=item.amount
-    return used_amount
+
+    return get_asset_consumed_amounts(doc.company, fiscal_year, [selected_doc.item_code], branch).get(
+        selected_doc.item_code, 0
+    )
+
+def get_used_budgets(doc, rows):
+    """
+    {row name: used budget} for many item rows of *doc*, as get_used_budget gives per row,
+    with one grouped query. Rows without a branch are counted against the document branch.
+    """
+    fiscal_year = get_fiscal_year(doc) if rows else None
+    if not fiscal_year:
+        return {row.name: 0 for row in rows}
+
+    used = get_asset_consumed_amounts_by_branch(
+        doc.company,
+        fiscal_year,
+        {row.item_code for row in rows},
+        {row.get("branch") or doc.get("branch") for row in rows},
+    )
+    return {row.name: used.get((row.get("branch") or doc.get("branch"), row.item_code), 0) for row in rows}
 
 def get_item_type(item_code):
     item_type = frappe.db.get_value("Item", item_code, "is_fixed_asset")
@@ -104,102 +167,12 @@ def get_allocated_amount_for_gl(doc, selected_doc):
     fiscal_year = get_fiscal_year(doc)
     if not fiscal_year:
         return 0
-    
-    budget_name = frappe.get_value(
-        "Budget",
-        {"fiscal_year": fiscal_year, "branch": branch, "company": doc.company, "docstatus": 1},
-        "name"
-    )
-    
-    if not budget_name:
-        return 0
 
-    allocated_budget = frappe.get_value(
-        "Budget Item",
-        {"parent": budget_name, "item_code": selected_doc.item_code},
-        "budget_amount"
+    return get_budget_item_amounts("Budget", doc.company, fiscal_year, [branch], [selected_doc.item_code]).get(
+        (branch, selected_doc.item_code), 0
     )
 
-    return allocated_budget or 0
-
 @frappe.whitelist()
-def create_state_city():
-
-    frappe.enqueue(
-        job_name="Create State for Country",
-        method=create_state,
-        timeout=4000000,
-    )
-
-    frappe.enqueue(
-        job_name="Create City for State",
-        method=create_city,
-        timeout=4000000,
-    )
-
-def create_state():
-    country_state_list = ["Saudi Arabia", "Egypt", "India"]
-    for country in country_state_list:
-        url = "https://countriesnow.space/api/v0.1/countries/states"
-        payload = {
-            "country": country
-        }
-        headers = {
-            "Content-Type": "application/json"
-        }
-
-        response = requests.post(url, json=payload, headers=headers)
-
-        if response.status_code != 200:
-            return False
-        
-        data = response.json()['data']
-        country_name = data['name']
-        state_name_list = data['states']
-
-        state_existing_list = frappe.get_all("State", {'country' : country_name}, pluck = "name")
-        for state_name in state_name_list:
-            if state_name not in state_existing_list:
-                state_doc = frappe.new_doc("State")
-                state_doc.state_province = state_name['name']
-                state_doc.country = country
-                state_doc.insert()
-                state_existing_list.append(state_name['name'])
-        frappe.db.commit()
-    return True
-
-
-def create_city():
-    state_list = frappe.get_all("State", fields = ['name', 'country'])
-    for state_dict in state_list:
-        url = "https://countriesnow.space/api/v0.1/countries/state/cities"
-        payload = {
-            "country": state_dict['country'],
-            "state" : state_dict['name']
-        }
-        headers = {
-            "Content-Type": "application/json"
-        }
-
-        response = requests.post(url, json=payload, headers=headers)
-
-        if response.status_code != 200:
-            return False
-        
-        city_name_list = response.json()['data']
-
-        existing_city_list = frappe.get_all("City", {'state_province' : state_dict['country']}, pluck = "name")
-        error_city_list = []
-        for city in city_name_list:
-            try:
-                if city not in existing_city_list:
-                    state_doc = frappe.new_doc("City")
-                    state_doc.city_name = city
-                    state_doc.state_province = state_dict['name']
-                    state_doc.insert()
-                    existing_city_list.append(city)
-            except Exception as e:
-                frappe.log_error("While Creating city", e)
-                error_city_list.append(city)
-            frappe.db.commit()
-    return True
+def create_state_city(file_url=None, source="remote", countries=None):
+    """Queue the State / City load; see geography.load_geography for the sources."""
+    return load_geography(file_url=file_url, source=source, countries=countries)
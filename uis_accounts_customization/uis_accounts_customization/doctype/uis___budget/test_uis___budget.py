@@ -1,9 +1,738 @@
 # Copyright (c) 2025, Mohamed Elyamany and Contributors
 # See license.txt
 
-# import frappe
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from unittest.mock import patch
+
+import frappe
+from erpnext.accounts.doctype.budget.budget import BudgetError
+from erpnext.accounts.doctype.journal_entry.journal_entry import JournalEntry
+from erpnext.accounts.utils import FiscalYearError, get_fiscal_year
+from erpnext.buying.doctype.purchase_order.test_purchase_order import create_purchase_order
+from frappe.custom.doctype.property_setter.property_setter import make_property_setter
 from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, getdate, nowdate
+
+from uis_accounts_customization.customization_script.budget import (
+	get_ordered_amounts,
+	simulate_budget,
+	validate_expense_against_budget,
+)
+from uis_accounts_customization.customization_script.budget_index import (
+	clear_budget_index,
+	get_budget_lines,
+	get_budgeted_companies,
+	has_budget,
+)
+from uis_accounts_customization.customization_script.budget_rollup import (
+	accumulate_nested_set,
+	build_budget_rollup,
+)
+from uis_accounts_customization.customization_script.dimension_index import get_dimension_members
+from uis_accounts_customization.customization_script.dimension_plan import get_dimension_checks
+from uis_accounts_customization.customization_script.fiscal_year import get_fiscal_year_details, get_fiscal_year_name
+from uis_accounts_customization.customization_script.monthly_distribution import (
+	MONTHS,
+	get_accumulated_percentage,
+	get_cumulative_distribution,
+	get_period_percentage,
+)
+from uis_accounts_customization.uis_accounts_customization.doctype.uis_budget_consumption.uis_budget_consumption import (
+	get_consumed_amount,
+	update_consumption,
+)
+
+COMPANY = "_Test Company"
+EXPENSE_ACCOUNT = "_Test Account Cost for Goods Sold - _TC"
+CREDIT_ACCOUNT = "_Test Cash - _TC"
+COST_CENTER = "_Test Cost Center - _TC"
+BRANCH = "_Test UIS Budget Branch"
+GROUP_COST_CENTER = "_Test UIS Budget Group"
+LEAF_COST_CENTERS = ("_Test UIS Budget Leaf 1", "_Test UIS Budget Leaf 2")
+REMARK = "UIS budget reservation stress test"
+
+WORKERS = 8
+SUBMISSIONS = 240
+AMOUNT = 100
+BUDGET_AMOUNT = 5000
+# seconds a worker keeps retrying submissions that hit a deadlock or lock timeout
+RETRY_TIME_LIMIT = 300
 
 
 class TestUISBudget(FrappeTestCase):
 	pass
+
+
+class TestUISBudgetPostedGLEntries(FrappeTestCase):
+	"""The on_submit budget check of a Journal Entry reads the GL map ERPNext posted."""
+
+	def setUp(self):
+		if not frappe.get_meta("GL Entry").has_field("branch"):
+			self.skipTest("Branch is not an accounting dimension on this site")
+
+		if not frappe.db.exists("Branch", BRANCH):
+			frappe.get_doc({"doctype": "Branch", "branch": BRANCH}).insert()
+
+		self.dimensions = get_test_dimensions()
+		self.fiscal_year = get_fiscal_year(nowdate(), company=COMPANY)[0]
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def submit_counting_gl_maps(self):
+		with patch.object(
+			JournalEntry, "build_gl_map", autospec=True, side_effect=JournalEntry.build_gl_map
+		) as build_gl_map:
+			make_journal_entry(self.dimensions).submit()
+		return build_gl_map.call_count
+
+	def test_budgeted_submit_builds_gl_map_once(self):
+		make_budget(self.fiscal_year, self.dimensions, BUDGET_AMOUNT)
+		# only ERPNext's own posting builds it, the budget check reuses the posted entries
+		self.assertEqual(self.submit_counting_gl_maps(), 1)
+		self.assertFalse(getattr(frappe.local, "uis_posted_gl_entries", None))
+
+	def test_unbudgeted_submit_skips_budget_check(self):
+		with patch(
+			"uis_accounts_customization.customization_script.budget.has_budget", return_value=False
+		), patch(
+			"uis_accounts_customization.customization_script.budget.validate_expenses_against_budget"
+		) as validate:
+			self.assertEqual(self.submit_counting_gl_maps(), 1)
+
+		validate.assert_not_called()
+
+
+class TestUISBudgetIndex(FrappeTestCase):
+	"""Submitted budget lines, and companies without any answered without a query."""
+
+	def setUp(self):
+		if not frappe.get_meta("GL Entry").has_field("branch"):
+			self.skipTest("Branch is not an accounting dimension on this site")
+
+		if not frappe.db.exists("Branch", BRANCH):
+			frappe.get_doc({"doctype": "Branch", "branch": BRANCH}).insert()
+
+		self.dimensions = get_test_dimensions()
+		self.fiscal_year = get_fiscal_year(nowdate(), company=COMPANY)[0]
+
+	def tearDown(self):
+		frappe.db.rollback()
+		clear_budget_index()
+
+	def get_lines(self, company=COMPANY):
+		return get_budget_lines(company, self.fiscal_year, EXPENSE_ACCOUNT, **self.dimensions)
+
+	def test_submitted_budget_is_indexed(self):
+		budget = make_budget(self.fiscal_year, self.dimensions, BUDGET_AMOUNT)
+
+		self.assertTrue(has_budget(COMPANY, self.fiscal_year))
+		self.assertIn(budget.accounts[0].name, [line.budget_line for line in self.get_lines()])
+
+	def test_unbudgeted_company_needs_no_query(self):
+		company = frappe.db.get_value("Company", {"name": ("not in", [COMPANY, *get_budgeted_companies()])})
+		if not company:
+			self.skipTest("Every company on this site has a budget")
+
+		with patch.object(frappe.db, "sql", wraps=frappe.db.sql) as sql:
+			self.assertFalse(has_budget(company))
+			self.assertEqual(self.get_lines(company), [])
+
+		sql.assert_not_called()
+
+
+class TestUISBudgetLineMatching(FrappeTestCase):
+	"""
+	Stop / Warn results of the budget index against the per-row SQL lookup it replaced.
+
+	Exact lines give the same results. Intended changes: a line with a blank dimension
+	(wildcard) and a line on a group cost center (subtree) were never matched by the old
+	lookup, which compared every dimension for equality; they now apply, and their actual
+	amount is summed over the line's whole scope instead of the GL row's dimensions.
+	"""
+
+	def setUp(self):
+		if not frappe.get_meta("GL Entry").has_field("branch"):
+			self.skipTest("Branch is not an accounting dimension on this site")
+
+		if not frappe.db.exists("Branch", BRANCH):
+			frappe.get_doc({"doctype": "Branch", "branch": BRANCH}).insert()
+
+		self.dimensions = get_test_dimensions()
+		self.fiscal_year = get_fiscal_year(nowdate(), company=COMPANY)[0]
+
+	def tearDown(self):
+		frappe.db.rollback()
+		frappe.flags.uis_budget_warnings = None
+		clear_budget_index()
+
+	def get_args(self, **dimensions):
+		return frappe._dict(
+			company=COMPANY,
+			fiscal_year=self.fiscal_year,
+			posting_date=nowdate(),
+			account=EXPENSE_ACCOUNT,
+			**dict(self.dimensions, **dimensions),
+		)
+
+	def consume(self, amount, **dimensions):
+		update_consumption([dict(self.get_args(**dimensions), debit=amount)])
+
+	def make_line(self, amount, action, **dimensions):
+		"""A budget line *amount* above what its scope has consumed so far."""
+		if "cost_center" not in dimensions:
+			# the test cost center may carry entries of earlier tests, a new subtree does not
+			amount += get_consumed_amount(self.get_args(**dimensions))
+		budget = frappe.get_doc(
+			{
+				"doctype": "UIS - Budget",
+				"company": COMPANY,
+				"fiscal_year": self.fiscal_year,
+				"applicable_on_booking_actual_expenses": 1,
+				"action_if_annual_budget_exceeded": action,
+				"action_if_accumulated_monthly_budget_exceeded": "Ignore",
+				"accounts": [{"account": EXPENSE_ACCOUNT, "budget_amount": amount}],
+				**dict(self.dimensions, **dimensions),
+			}
+		)
+		# wildcard lines leave a mandatory dimension blank
+		budget.flags.ignore_mandatory = True
+		return budget.submit()
+
+	def make_cost_center_tree(self):
+		group = frappe.get_doc(
+			{
+				"doctype": "Cost Center",
+				"cost_center_name": GROUP_COST_CENTER,
+				"parent_cost_center": frappe.db.get_value(
+					"Cost Center", {"company": COMPANY, "is_group": 1, "parent_cost_center": ("is", "not set")}
+				),
+				"company": COMPANY,
+				"is_group": 1,
+			}
+		).insert()
+		leaves = [
+			frappe.get_doc(
+				{
+					"doctype": "Cost Center",
+					"cost_center_name": name,
+					"parent_cost_center": group.name,
+					"company": COMPANY,
+				}
+			).insert()
+			for name in LEAF_COST_CENTERS
+		]
+		return group.name, [leaf.name for leaf in leaves]
+
+	def assertSameResult(self, args, expected):
+		self.assertEqual(get_legacy_result(args), expected)
+		self.assertEqual(get_result(args), expected)
+
+	def test_exact_line_within_budget(self):
+		self.make_line(1000, "Stop")
+		self.consume(900)
+		self.assertSameResult(self.get_args(), None)
+
+	def test_exact_line_over_budget_stops(self):
+		self.make_line(1000, "Stop")
+		self.consume(1100)
+		self.assertSameResult(self.get_args(), "Stop")
+
+	def test_exact_line_over_budget_warns(self):
+		self.make_line(1000, "Warn")
+		self.consume(1100)
+		self.assertSameResult(self.get_args(), "Warn")
+
+	def test_wildcard_line_applies_to_any_value(self):
+		self.make_line(1000, "Stop", project=None)
+		self.consume(1100)
+
+		args = self.get_args()
+		self.assertIsNone(get_legacy_result(args))
+		self.assertEqual(get_result(args), "Stop")
+
+	def test_wildcard_line_sums_every_value(self):
+		other_project = frappe.db.get_value(
+			"Project", {"company": COMPANY, "name": ("!=", self.dimensions["project"])}
+		)
+		if not other_project:
+			self.skipTest("Needs a second Project for the test company")
+
+		self.make_line(1000, "Warn", project=None)
+		self.consume(600)
+		self.consume(600, project=other_project)
+
+		args = self.get_args()
+		self.assertIsNone(get_legacy_result(args))
+		self.assertEqual(get_result(args), "Warn")
+
+	def test_subtree_line_applies_to_its_leaves(self):
+		group, leaves = self.make_cost_center_tree()
+		self.make_line(1000, "Stop", cost_center=group)
+		self.consume(1100, cost_center=leaves[0])
+
+		args = self.get_args(cost_center=leaves[0])
+		self.assertIsNone(get_legacy_result(args))
+		self.assertEqual(get_result(args), "Stop")
+
+	def test_subtree_line_sums_sibling_leaves(self):
+		group, leaves = self.make_cost_center_tree()
+		self.make_line(1000, "Stop", cost_center=group)
+		self.consume(600, cost_center=leaves[0])
+		self.consume(600, cost_center=leaves[1])
+
+		# each leaf alone is within the budget, the subtree is not
+		args = self.get_args(cost_center=leaves[0])
+		self.assertIsNone(get_legacy_result(args))
+		self.assertEqual(get_result(args), "Stop")
+
+	def test_subtree_line_ignores_cost_centers_outside_it(self):
+		group, _leaves = self.make_cost_center_tree()
+		self.make_line(1000, "Stop", cost_center=group)
+		self.consume(1100)
+
+		self.assertSameResult(self.get_args(), None)
+
+
+class TestUISBudgetSimulation(FrappeTestCase):
+	"""What-if checks see the proposed transactions before them."""
+
+	def setUp(self):
+		if not frappe.get_meta("GL Entry").has_field("branch"):
+			self.skipTest("Branch is not an accounting dimension on this site")
+
+		if not frappe.db.exists("Branch", BRANCH):
+			frappe.get_doc({"doctype": "Branch", "branch": BRANCH}).insert()
+
+		self.dimensions = get_test_dimensions()
+		self.budget = make_budget(get_fiscal_year(nowdate(), company=COMPANY)[0], self.dimensions, BUDGET_AMOUNT)
+
+	def tearDown(self):
+		frappe.set_user("Administrator")
+		frappe.db.rollback()
+		clear_budget_index()
+
+	def simulate(self, *amounts):
+		transactions = [
+			dict(account=EXPENSE_ACCOUNT, posting_date=nowdate(), amount=amount, **self.dimensions) for amount in amounts
+		]
+		return simulate_budget(frappe.as_json(transactions), company=COMPANY, doctype="Journal Entry")
+
+	def test_transactions_add_up(self):
+		(result,) = self.simulate(0)
+		self.assertEqual(result.status, "Pass")
+		self.assertEqual(result.budget_line, self.budget.accounts[0].name)
+		headroom = result.headroom
+
+		first, second = self.simulate(headroom - 10, 20)
+		self.assertEqual(first.status, "Pass")
+		# the second one only has what the first leaves of the budget
+		self.assertEqual(second.status, "Stop")
+		self.assertAlmostEqual(second.headroom, 10)
+
+		# nothing is written
+		self.assertEqual(self.simulate(0)[0].headroom, headroom)
+
+	def test_budget_read_is_required(self):
+		user = frappe.get_doc(
+			{"doctype": "User", "email": "test-uis-budget-simulation@example.com", "first_name": "UIS"}
+		).insert()
+		frappe.set_user(user.name)
+		self.assertRaises(frappe.PermissionError, self.simulate, AMOUNT)
+
+
+class TestUISBudgetRollup(FrappeTestCase):
+	"""Budget and actual added up the cost center tree."""
+
+	def setUp(self):
+		if not frappe.get_meta("GL Entry").has_field("branch"):
+			self.skipTest("Branch is not an accounting dimension on this site")
+
+		if not frappe.db.exists("Branch", BRANCH):
+			frappe.get_doc({"doctype": "Branch", "branch": BRANCH}).insert()
+
+		self.dimensions = get_test_dimensions()
+		self.fiscal_year = get_fiscal_year(nowdate(), company=COMPANY)[0]
+
+	def tearDown(self):
+		frappe.db.rollback()
+		clear_budget_index()
+
+	def get_nodes(self):
+		return {node.name: node for node in build_budget_rollup(COMPANY, self.fiscal_year).nodes}
+
+	def test_nested_set_totals(self):
+		nodes = [
+			frappe._dict(name=name, lft=lft, rgt=rgt, budget=budget, actual=budget / 2)
+			for name, lft, rgt, budget in (
+				("root", 1, 10, 0.0),
+				("a", 2, 5, 10.0),
+				("a1", 3, 4, 5.0),
+				("b", 6, 9, 7.0),
+				("b1", 7, 8, 1.0),
+			)
+		]
+		accumulate_nested_set(nodes)
+
+		totals = {node.name: (node.budget, node.actual) for node in nodes}
+		self.assertEqual(
+			totals,
+			{"root": (23, 11.5), "a": (15, 7.5), "a1": (5, 2.5), "b": (8, 4), "b1": (1, 0.5)},
+		)
+
+	def test_budget_and_actual_reach_the_root(self):
+		before = self.get_nodes()
+		root = next(name for name, node in before.items() if not node.parent)
+
+		make_budget(self.fiscal_year, self.dimensions, BUDGET_AMOUNT)
+		# actuals only count on budgeted accounts, so they are compared from here
+		budgeted = self.get_nodes()
+		make_journal_entry(self.dimensions).submit()
+		after = self.get_nodes()
+
+		for name in (COST_CENTER, root):
+			self.assertEqual(after[name].budget - before[name].budget, BUDGET_AMOUNT)
+			self.assertEqual(after[name].actual - budgeted[name].actual, AMOUNT)
+		self.assertEqual(after[COST_CENTER].own_budget - before[COST_CENTER].own_budget, BUDGET_AMOUNT)
+
+
+class TestUISBudgetOrderedAmounts(FrappeTestCase):
+	"""Pending Purchase Order amounts of a whole document, read in one query per fiscal year."""
+
+	def setUp(self):
+		if not frappe.get_meta("GL Entry").has_field("branch"):
+			self.skipTest("Branch is not an accounting dimension on this site")
+
+		if not frappe.db.exists("Branch", BRANCH):
+			frappe.get_doc({"doctype": "Branch", "branch": BRANCH}).insert()
+
+		self.fiscal_year = get_fiscal_year(nowdate(), company=COMPANY)[0]
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def get_item_args(self):
+		return [
+			frappe._dict(fiscal_year=self.fiscal_year, item_code=item_code, expense_account=EXPENSE_ACCOUNT)
+			for item_code in ("_Test Item", "_Test Item 2")
+		]
+
+	def test_ordered_amounts_are_batched(self):
+		keys = [(self.fiscal_year, item_code, EXPENSE_ACCOUNT, BRANCH) for item_code in ("_Test Item", "_Test Item 2")]
+		before = get_ordered_amounts(self.get_item_args())
+
+		purchase_order = create_purchase_order(item_code="_Test Item", qty=2, rate=150, do_not_submit=True)
+		purchase_order.append("items", dict(purchase_order.items[0].as_dict(), name=None, item_code="_Test Item 2", qty=1))
+		for row in purchase_order.items:
+			row.expense_account = EXPENSE_ACCOUNT
+			row.branch = BRANCH
+		purchase_order.save()
+		purchase_order.submit()
+
+		with patch.object(frappe.db, "sql", wraps=frappe.db.sql) as sql:
+			after = get_ordered_amounts(self.get_item_args())
+
+		sql.assert_called_once()
+		self.assertEqual(after[keys[0]], before.get(keys[0], 0) + 300)
+		self.assertEqual(after[keys[1]], before.get(keys[1], 0) + 150)
+
+
+class TestUISBudgetFiscalYears(FrappeTestCase):
+	"""The cached fiscal year lookup of the budget checks against ERPNext's own."""
+
+	def get_dates(self):
+		for year in frappe.get_all("Fiscal Year", {"disabled": 0}, ["year_start_date", "year_end_date"]):
+			start, end = getdate(year.year_start_date), getdate(year.year_end_date)
+			yield from (add_days(start, -1), start, add_days(start, 45), end, add_days(end, 1))
+
+	def test_lookup_matches_erpnext(self):
+		for company in (COMPANY, None):
+			for date in self.get_dates():
+				try:
+					expected = get_fiscal_year(date, company=company)[:3]
+				except FiscalYearError:
+					expected = None
+
+				details = get_fiscal_year_details(date, company, raise_exception=False)
+				self.assertEqual(
+					details and (details[0], getdate(details[1]), getdate(details[2])),
+					expected and (expected[0], getdate(expected[1]), getdate(expected[2])),
+					f"{date} / {company}",
+				)
+
+	def test_version_is_read_once_per_request(self):
+		get_fiscal_year_name(nowdate(), COMPANY)
+		cache = frappe.cache()
+		with patch.object(cache, "get_value", wraps=cache.get_value) as get_value:
+			for _ in range(10):
+				get_fiscal_year_name(nowdate(), COMPANY)
+
+		get_value.assert_not_called()
+
+
+class TestUISBudgetMonthlyDistribution(FrappeTestCase):
+	"""Distribution percentages aligned to a fiscal year starting in April."""
+
+	fiscal_year_start = "2025-04-01"
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def make_distribution(self):
+		# 34% in April, 6% in every other month
+		return frappe.get_doc(
+			{
+				"doctype": "Monthly Distribution",
+				"distribution_id": "_Test UIS Budget Distribution",
+				"percentages": [
+					{"month": month, "percentage_allocation": 34 if month == "April" else 6} for month in MONTHS
+				],
+			}
+		).insert()
+
+	def test_even_split_without_distribution(self):
+		cumulative = get_cumulative_distribution(None, self.fiscal_year_start)
+		self.assertAlmostEqual(cumulative[0], 100 / 12)
+		self.assertAlmostEqual(cumulative[-1], 100)
+		self.assertAlmostEqual(get_period_percentage(None, self.fiscal_year_start, "2025-04-10", "2025-06-20"), 25)
+
+	def test_distribution_starts_at_the_fiscal_year(self):
+		distribution = self.make_distribution().name
+
+		self.assertAlmostEqual(get_accumulated_percentage(distribution, self.fiscal_year_start, "2025-04-15"), 34)
+		self.assertAlmostEqual(get_accumulated_percentage(distribution, self.fiscal_year_start, "2025-05-01"), 40)
+		self.assertAlmostEqual(get_accumulated_percentage(distribution, self.fiscal_year_start, "2025-03-31"), 0)
+		self.assertAlmostEqual(get_period_percentage(distribution, self.fiscal_year_start, "2025-05-01", "2025-06-30"), 12)
+		self.assertAlmostEqual(get_period_percentage(distribution, self.fiscal_year_start, "2026-01-01", "2026-12-31"), 18)
+
+	def test_missing_rows_allocate_nothing(self):
+		# same as ERPNext: a named distribution only allocates the months it has rows for
+		self.assertEqual(get_cumulative_distribution("_Test UIS Budget Empty Distribution", self.fiscal_year_start), [0.0] * 12)
+
+
+class TestUISBudgetDimensionIndex(FrappeTestCase):
+	"""Per-company dimension members read by the dimension validate hook."""
+
+	def tearDown(self):
+		frappe.db.rollback()
+
+	def test_members_follow_company_and_new_records(self):
+		self.assertIn(COST_CENTER, get_dimension_members("Cost Center", COMPANY))
+		other_company = frappe.db.get_value("Company", {"name": ("!=", COMPANY)})
+		if other_company:
+			self.assertNotIn(COST_CENTER, get_dimension_members("Cost Center", other_company))
+
+		cost_center = frappe.get_doc(
+			{
+				"doctype": "Cost Center",
+				"cost_center_name": "_Test UIS Dimension Member",
+				"parent_cost_center": frappe.db.get_value(
+					"Cost Center", {"company": COMPANY, "is_group": 1, "parent_cost_center": ("is", "not set")}
+				),
+				"company": COMPANY,
+			}
+		).insert()
+		# saving a Cost Center drops the cached sets of the doctype
+		self.assertIn(cost_center.name, get_dimension_members("Cost Center", COMPANY))
+
+	def test_version_is_read_once_per_request(self):
+		get_dimension_members("Cost Center", COMPANY)
+		cache = frappe.cache()
+		with patch.object(cache, "hget", wraps=cache.hget) as hget:
+			for _ in range(10):
+				get_dimension_members("Cost Center", COMPANY)
+
+		hget.assert_not_called()
+
+
+class TestUISBudgetDimensionPlan(FrappeTestCase):
+	"""Dimension checks compiled once per doctype and recompiled on meta changes."""
+
+	def tearDown(self):
+		frappe.db.rollback()
+		frappe.clear_cache(doctype="Journal Entry Account")
+
+	def get_cost_center_label(self):
+		for fieldname, label, _options, _mandatory in get_dimension_checks("Journal Entry Account", "Journal Entry"):
+			if fieldname == "cost_center":
+				return label
+
+	def test_property_setter_recompiles_the_plan(self):
+		self.assertNotIn("UIS Test Cost Center", self.get_cost_center_label())
+
+		make_property_setter("Journal Entry Account", "cost_center", "label", "UIS Test Cost Center", "Data")
+		self.assertIn("UIS Test Cost Center", self.get_cost_center_label())
+
+	def test_version_is_read_once_per_request(self):
+		get_dimension_checks("Journal Entry Account", "Journal Entry")
+		cache = frappe.cache()
+		with patch.object(cache, "get_value", wraps=cache.get_value) as get_value:
+			for _ in range(10):
+				get_dimension_checks("Journal Entry Account", "Journal Entry")
+
+		get_value.assert_not_called()
+
+
+class TestUISBudgetReservation(FrappeTestCase):
+	"""Parallel Journal Entries against one Stop budget line must never overspend it."""
+
+	def setUp(self):
+		if not frappe.get_meta("GL Entry").has_field("branch"):
+			self.skipTest("Branch is not an accounting dimension on this site")
+
+		if not frappe.db.exists("Branch", BRANCH):
+			frappe.get_doc({"doctype": "Branch", "branch": BRANCH}).insert()
+
+		self.dimensions = get_test_dimensions()
+		self.fiscal_year = get_fiscal_year(nowdate(), company=COMPANY)[0]
+		self.budget = make_budget(self.fiscal_year, self.dimensions, BUDGET_AMOUNT)
+		# the workers run in their own connections
+		frappe.db.commit()
+
+	def tearDown(self):
+		for name in frappe.get_all("Journal Entry", {"user_remark": REMARK, "docstatus": 1}, pluck="name"):
+			frappe.get_doc("Journal Entry", name).cancel()
+		self.budget.reload().cancel()
+		frappe.db.commit()
+
+	def test_parallel_submissions_do_not_overspend(self):
+		args = frappe._dict(company=COMPANY, fiscal_year=self.fiscal_year, account=EXPENSE_ACCOUNT, **self.dimensions)
+		consumed_before = get_consumed_amount(args)
+
+		context = multiprocessing.get_context("spawn")
+		with ProcessPoolExecutor(max_workers=WORKERS, mp_context=context) as executor:
+			results = list(
+				executor.map(
+					submit_journal_entries,
+					[frappe.local.site] * WORKERS,
+					[frappe.local.sites_path] * WORKERS,
+					[SUBMISSIONS // WORKERS] * WORKERS,
+					[self.dimensions] * WORKERS,
+				)
+			)
+
+		# how many get through depends on retries under contention; only overspending is an error
+		submitted = sum(results)
+		consumed = get_consumed_amount(args)
+
+		self.assertLessEqual(consumed, BUDGET_AMOUNT)
+		self.assertLessEqual(submitted, BUDGET_AMOUNT // AMOUNT)
+		self.assertEqual(consumed - consumed_before, submitted * AMOUNT)
+
+
+def submit_journal_entries(site, sites_path, count, dimensions):
+	"""
+	Worker: submit *count* Journal Entries in separate transactions, return how many went through.
+	Deadlocks and lock timeouts are retried until the submission passes, or is stopped by the
+	budget, or RETRY_TIME_LIMIT has passed.
+	"""
+	frappe.init(site=site, sites_path=sites_path)
+	frappe.connect()
+	frappe.set_user("Administrator")
+
+	submitted = 0
+	deadline = time.monotonic() + RETRY_TIME_LIMIT
+	try:
+		for _ in range(count):
+			while True:
+				try:
+					make_journal_entry(dimensions).submit()
+					frappe.db.commit()
+					submitted += 1
+					break
+				except BudgetError:
+					frappe.db.rollback()
+					frappe.clear_messages()
+					break
+				except (frappe.QueryDeadlockError, frappe.QueryTimeoutError):
+					frappe.db.rollback()
+					if time.monotonic() > deadline:
+						break
+	finally:
+		frappe.destroy()
+
+	return submitted
+
+
+def get_result(args):
+	"""Stop / Warn / None of the budget check of *args*."""
+	frappe.flags.uis_budget_warnings = []
+	try:
+		validate_expense_against_budget(args)
+	except BudgetError:
+		frappe.clear_messages()
+		return "Stop"
+	finally:
+		warnings, frappe.flags.uis_budget_warnings = frappe.flags.uis_budget_warnings, None
+
+	return "Warn" if warnings else None
+
+
+def get_legacy_result(args):
+	"""
+	Stop / Warn / None as the per-row lookup gave it before the budget index: lines whose
+	dimensions equal the row's, actuals summed over the row's dimensions.
+	"""
+	conditions = "".join(
+		f" AND b.{field} = %({field})s" for field in ("cost_center", "project", "department") if args.get(field)
+	)
+	lines = frappe.db.sql(
+		f"""
+		SELECT ba.budget_amount, b.action_if_annual_budget_exceeded AS action
+		FROM `tabUIS - Budget` b
+		INNER JOIN `tabBudget Account` ba ON b.name = ba.parent
+		WHERE b.fiscal_year = %(fiscal_year)s
+			AND ba.account = %(account)s
+			AND b.branch = %(branch)s
+			AND b.docstatus = 1
+			{conditions}
+		""",
+		args,
+		as_dict=True,
+	)
+
+	actual = get_consumed_amount(args)
+	actions = {line.action for line in lines if actual > line.budget_amount}
+	return "Stop" if "Stop" in actions else "Warn" if "Warn" in actions else None
+
+
+def get_test_dimensions():
+	return {
+		"branch": BRANCH,
+		"cost_center": COST_CENTER,
+		"project": frappe.db.get_value("Project", {"company": COMPANY}),
+		"department": frappe.db.get_value("Department", {"company": COMPANY, "is_group": 0}),
+	}
+
+
+def make_budget(fiscal_year, dimensions, amount, action="Stop"):
+	return frappe.get_doc(
+		{
+			"doctype": "UIS - Budget",
+			"company": COMPANY,
+			"fiscal_year": fiscal_year,
+			"applicable_on_booking_actual_expenses": 1,
+			"action_if_annual_budget_exceeded": action,
+			"action_if_accumulated_monthly_budget_exceeded": "Ignore",
+			"accounts": [{"account": EXPENSE_ACCOUNT, "budget_amount": amount}],
+			**dimensions,
+		}
+	).submit()
+
+
+def make_journal_entry(dimensions):
+	return frappe.get_doc(
+		{
+			"doctype": "Journal Entry",
+			"company": COMPANY,
+			"posting_date": nowdate(),
+			"user_remark": REMARK,
+			**dimensions,
+			"accounts": [
+				{"account": EXPENSE_ACCOUNT, "debit_in_account_currency": AMOUNT, **dimensions},
+				{"account": CREDIT_ACCOUNT, "credit_in_account_currency": AMOUNT, **dimensions},
+			],
+		}
+	).insert()
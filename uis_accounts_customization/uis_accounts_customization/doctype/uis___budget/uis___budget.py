@@ -4,6 +4,8 @@
 import frappe
 from frappe.model.document import Document
 
+from uis_accounts_customization.customization_script.budget_index import clear_budget_index
+
 
 class UISBudget(Document):
 	def validate(self):
@@ -46,3 +48,12 @@ class UISBudget(Document):
 		if error_str:
 			frappe.throw(error_str)
 		return another_budget_doc_name_list
+
+	def on_submit(self):
+		clear_budget_index()
+
+	def on_cancel(self):
+		clear_budget_index()
+
+	def on_update_after_submit(self):
+		clear_budget_index()
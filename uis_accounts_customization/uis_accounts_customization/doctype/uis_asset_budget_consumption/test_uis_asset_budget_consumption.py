@@ -0,0 +1,69 @@
+# Copyright (c) 2026, Mohamed Elyamany and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from erpnext.accounts.utils import get_fiscal_year
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import nowdate
+
+from uis_accounts_customization.uis_accounts_customization.doctype.uis_asset_budget_consumption.uis_asset_budget_consumption import (
+	get_asset_consumed_amounts,
+	rebuild_asset_budget_consumption,
+	update_asset_consumption,
+)
+
+COMPANY = "_Test Company"
+BRANCH = "_Test UIS Budget Branch"
+ITEM_CODE = "_Test UIS Budget Asset"
+
+
+class TestUISAssetBudgetConsumption(FrappeTestCase):
+	def setUp(self):
+		self.fiscal_year = get_fiscal_year(nowdate(), company=COMPANY)[0]
+
+	def tearDown(self):
+		frappe.set_user("Administrator")
+		frappe.db.rollback()
+
+	def make_invoice(self, amount):
+		return frappe._dict(
+			company=COMPANY,
+			posting_date=nowdate(),
+			branch=BRANCH,
+			items=[
+				frappe._dict(is_fixed_asset=1, item_code=ITEM_CODE, amount=amount),
+				frappe._dict(is_fixed_asset=0, item_code=ITEM_CODE, amount=amount),
+			],
+		)
+
+	def get_consumed(self):
+		return get_asset_consumed_amounts(COMPANY, self.fiscal_year, [ITEM_CODE], BRANCH).get(ITEM_CODE, 0.0)
+
+	def test_submit_then_cancel_nets_out(self):
+		consumed = self.get_consumed()
+
+		invoice = self.make_invoice(250)
+		update_asset_consumption(invoice)
+		# only the fixed asset row counts, booked against the invoice branch
+		self.assertEqual(self.get_consumed(), consumed + 250)
+
+		update_asset_consumption(invoice, sign=-1)
+		self.assertEqual(self.get_consumed(), consumed)
+
+	def test_rebuild_is_queued(self):
+		with patch("frappe.enqueue") as enqueue:
+			rebuild_asset_budget_consumption(company=COMPANY, fiscal_year=self.fiscal_year)
+
+		enqueue.assert_called_once()
+		self.assertTrue(enqueue.call_args.args[0].endswith(".build_asset_budget_consumption"))
+		self.assertEqual(enqueue.call_args.kwargs["queue"], "long")
+		self.assertEqual(enqueue.call_args.kwargs["company"], COMPANY)
+
+	def test_rebuild_is_for_system_managers(self):
+		frappe.set_user("test@example.com")
+		with patch("frappe.enqueue") as enqueue:
+			self.assertRaises(frappe.PermissionError, rebuild_asset_budget_consumption)
+
+		enqueue.assert_not_called()
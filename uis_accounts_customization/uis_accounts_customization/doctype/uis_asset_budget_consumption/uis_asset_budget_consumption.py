@@ -0,0 +1,192 @@
+# Copyright (c) 2026, Mohamed Elyamany and contributors
+# For license information, please see license.txt
+
+import hashlib
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import flt, now
+
+from uis_accounts_customization.customization_script.budget_reservation import get_locking_clause
+from uis_accounts_customization.customization_script.fiscal_year import get_fiscal_year_dates, get_fiscal_year_name
+
+# Every row is one (company, fiscal year, branch, item) bucket of submitted
+# fixed asset Purchase Invoice amounts. Like UIS Budget Consumption, the name
+# is a hash of the key so Python events and the SQL rebuild upsert the same row.
+KEY_FIELDS = ("company", "fiscal_year", "branch", "item_code")
+
+
+class UISAssetBudgetConsumption(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("UIS Asset Budget Consumption", ["company", "fiscal_year", "item_code", "branch"])
+
+
+def get_asset_consumption_name(key):
+	return hashlib.sha1("::".join(str(part) for part in key).encode()).hexdigest()
+
+
+def update_asset_consumption(doc, sign=1):
+	"""
+	Add (sign=1) or remove (sign=-1) the fixed asset rows of a Purchase Invoice.
+	Rows without a branch are booked against the invoice branch.
+	"""
+	if not (doc.company and doc.posting_date):
+		return
+
+	fiscal_year = get_fiscal_year_name(doc.posting_date, doc.company)
+
+	buckets = {}
+	for row in doc.get("items") or []:
+		if not (row.is_fixed_asset and row.item_code):
+			continue
+
+		key = (doc.company, fiscal_year, row.branch or doc.branch or "", row.item_code)
+		buckets[key] = buckets.get(key, 0.0) + flt(row.amount) * sign
+
+	if not buckets:
+		return
+
+	timestamp, user = now(), frappe.session.user
+	values, params = [], []
+	for key, amount in buckets.items():
+		values.append("(%s, %s, %s, %s, %s, 0, %s, %s, %s, %s, %s)")
+		params.extend([get_asset_consumption_name(key), timestamp, timestamp, user, user])
+		params.extend(key)
+		params.append(amount)
+
+	frappe.db.sql(
+		f"""
+		INSERT INTO `tabUIS Asset Budget Consumption`
+			(name, creation, modified, owner, modified_by, docstatus,
+			company, fiscal_year, branch, item_code, amount)
+		VALUES {", ".join(values)}
+		ON DUPLICATE KEY UPDATE
+			amount = amount + VALUES(amount),
+			modified = VALUES(modified)
+		""",
+		tuple(params),
+	)
+
+
+def get_asset_consumed_amounts(company, fiscal_year, item_codes, branch=None):
+	"""{item_code: amount} for one fiscal year, summed over every branch when *branch* is not given."""
+	if not item_codes:
+		return {}
+
+	condition = " AND branch = %(branch)s" if branch else ""
+	return {
+		item_code: flt(amount)
+		for item_code, amount in frappe.db.sql(
+			f"""
+			SELECT item_code, SUM(amount)
+			FROM `tabUIS Asset Budget Consumption`
+			WHERE company = %(company)s
+				AND fiscal_year = %(fiscal_year)s
+				AND item_code IN %(item_codes)s
+				{condition}
+			GROUP BY item_code
+			{get_locking_clause()}
+			""",
+			{"company": company, "fiscal_year": fiscal_year, "item_codes": tuple(item_codes), "branch": branch},
+		)
+	}
+
+
+def get_asset_consumed_amounts_by_branch(company, fiscal_year, item_codes, branches):
+	"""{(branch, item_code): amount} for one fiscal year and the given branches, in one grouped query."""
+	if not (item_codes and branches):
+		return {}
+
+	return {
+		(branch, item_code): flt(amount)
+		for branch, item_code, amount in frappe.db.sql(
+			f"""
+			SELECT branch, item_code, SUM(amount)
+			FROM `tabUIS Asset Budget Consumption`
+			WHERE company = %(company)s
+				AND fiscal_year = %(fiscal_year)s
+				AND item_code IN %(item_codes)s
+				AND branch IN %(branches)s
+			GROUP BY branch, item_code
+			{get_locking_clause()}
+			""",
+			{
+				"company": company,
+				"fiscal_year": fiscal_year,
+				"item_codes": tuple(item_codes),
+				"branches": tuple(branches),
+			},
+		)
+	}
+
+
+@frappe.whitelist()
+def rebuild_asset_budget_consumption(company=None, fiscal_year=None):
+	"""Queue a rebuild of the buckets (optionally for one company / fiscal year)."""
+	frappe.only_for("System Manager")
+
+	frappe.enqueue(
+		"uis_accounts_customization.uis_accounts_customization.doctype.uis_asset_budget_consumption.uis_asset_budget_consumption.build_asset_budget_consumption",
+		queue="long",
+		timeout=4000000,
+		job_id=f"uis_asset_budget_consumption_rebuild::{company or ''}::{fiscal_year or ''}",
+		deduplicate=True,
+		company=company,
+		fiscal_year=fiscal_year,
+	)
+
+
+def build_asset_budget_consumption(company=None, fiscal_year=None):
+	"""Repopulate the buckets from submitted Purchase Invoices (optionally for one company / fiscal year)."""
+	filters = {"company": company, "fiscal_year": fiscal_year}
+	conditions = " AND ".join(f"{field} = %({field})s" for field, value in filters.items() if value)
+	frappe.db.sql(
+		f"DELETE FROM `tabUIS Asset Budget Consumption` {'WHERE ' + conditions if conditions else ''}", filters
+	)
+
+	# each invoice goes to the fiscal year it was posted to, resolved like `update_asset_consumption`,
+	# so a date covered by overlapping fiscal years is only counted once
+	dates, date_condition = None, ""
+	if fiscal_year:
+		dates = get_fiscal_year_dates(fiscal_year)
+		if not dates:
+			return
+		date_condition = "AND pi_doc.posting_date BETWEEN %(year_start_date)s AND %(year_end_date)s"
+
+	buckets = {}
+	for row in frappe.db.sql(
+		f"""
+		SELECT pi_doc.company, pi_doc.posting_date,
+			COALESCE(NULLIF(pi.branch, ''), pi_doc.branch, '') AS branch,
+			pi.item_code, SUM(pi.amount) AS amount
+		FROM `tabPurchase Invoice Item` pi
+		INNER JOIN `tabPurchase Invoice` pi_doc ON pi.parent = pi_doc.name
+		WHERE pi_doc.docstatus = 1
+			AND pi.is_fixed_asset = 1
+			AND pi.item_code IS NOT NULL
+			{"AND pi_doc.company = %(company)s" if company else ""}
+			{date_condition}
+		GROUP BY pi_doc.company, pi_doc.posting_date, COALESCE(NULLIF(pi.branch, ''), pi_doc.branch, ''), pi.item_code
+		""",
+		dict(filters, **(dates or {})),
+		as_dict=True,
+	):
+		year = get_fiscal_year_name(row.posting_date, row.company, raise_exception=False)
+		if not year or (fiscal_year and year != fiscal_year):
+			continue
+
+		key = (row.company, year, row.branch, row.item_code)
+		buckets[key] = buckets.get(key, 0.0) + flt(row.amount)
+
+	timestamp, user = now(), frappe.session.user
+	frappe.db.bulk_insert(
+		"UIS Asset Budget Consumption",
+		("name", "creation", "modified", "owner", "modified_by", "docstatus") + KEY_FIELDS + ("amount",),
+		[
+			(get_asset_consumption_name(key), timestamp, timestamp, user, user, 0) + key + (amount,)
+			for key, amount in buckets.items()
+		],
+	)
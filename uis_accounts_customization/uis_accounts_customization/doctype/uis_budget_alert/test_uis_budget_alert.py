@@ -0,0 +1,81 @@
+# Copyright (c) 2026, Mohamed Elyamany and Contributors
+# See license.txt
+
+import frappe
+from erpnext.accounts.utils import get_fiscal_year
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_to_date, nowdate
+
+from uis_accounts_customization.customization_script.budget_alerts import (
+	SETTINGS,
+	WATERMARK_LAG,
+	get_touched_lines,
+	scan_budget_thresholds,
+)
+from uis_accounts_customization.customization_script.budget_index import clear_budget_index
+from uis_accounts_customization.uis_accounts_customization.doctype.uis___budget.test_uis___budget import (
+	AMOUNT,
+	BRANCH,
+	COMPANY,
+	get_test_dimensions,
+	make_budget,
+	make_journal_entry,
+)
+
+
+class TestUISBudgetAlert(FrappeTestCase):
+	"""Incremental scans, from the watermark of the previous run."""
+
+	def setUp(self):
+		if not frappe.get_meta("GL Entry").has_field("branch"):
+			self.skipTest("Branch is not an accounting dimension on this site")
+
+		if not frappe.db.exists("Branch", BRANCH):
+			frappe.get_doc({"doctype": "Branch", "branch": BRANCH}).insert()
+
+		dimensions = get_test_dimensions()
+		self.fiscal_year = get_fiscal_year(nowdate(), company=COMPANY)[0]
+		budget = make_budget(self.fiscal_year, dimensions, AMOUNT, action="Warn")
+		self.budget_line = budget.accounts[0].name
+
+		journal_entry = make_journal_entry(dimensions)
+		journal_entry.submit()
+		self.gl_creation = frappe.db.sql(
+			"SELECT MAX(creation) FROM `tabGL Entry` WHERE voucher_no = %s", journal_entry.name
+		)[0][0]
+
+	def tearDown(self):
+		frappe.db.rollback()
+		clear_budget_index()
+
+	def get_touched(self, watermark, new_watermark):
+		return get_touched_lines(watermark, new_watermark).get((COMPANY, self.fiscal_year), {})
+
+	def set_watermark(self, watermark):
+		settings = frappe.get_single(SETTINGS)
+		settings.enable_threshold_alerts = 1
+		settings.last_scanned_gl_creation = watermark
+		settings.save()
+
+	def get_alert_count(self):
+		return frappe.db.count("UIS Budget Alert", {"budget_line": self.budget_line})
+
+	def test_entries_committed_after_the_watermark_are_scanned(self):
+		# a previous run already saw a later entry, committed before this one
+		watermark = add_to_date(self.gl_creation, seconds=1)
+		self.assertIn(self.budget_line, self.get_touched(watermark, add_to_date(watermark, seconds=1)))
+
+	def test_entries_before_the_lag_are_not_rescanned(self):
+		watermark = add_to_date(self.gl_creation, seconds=WATERMARK_LAG + 60)
+		self.assertNotIn(self.budget_line, self.get_touched(watermark, watermark))
+
+	def test_rescanned_lines_alert_once(self):
+		self.set_watermark(add_to_date(self.gl_creation, seconds=-1))
+		scan_budget_thresholds()
+		alerts = self.get_alert_count()
+		self.assertTrue(alerts)
+
+		# the next run overlaps the previous one
+		self.set_watermark(add_to_date(self.gl_creation, seconds=1))
+		scan_budget_thresholds()
+		self.assertEqual(self.get_alert_count(), alerts)
@@ -0,0 +1,15 @@
+# Copyright (c) 2026, Mohamed Elyamany and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+# One row per (budget line, threshold) already alerted; the scanner removes
+# the rows of thresholds the line has fallen back below, so they can fire again.
+class UISBudgetAlert(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("UIS Budget Alert", ["budget_line", "threshold"])
@@ -0,0 +1,95 @@
+# Copyright (c) 2026, Mohamed Elyamany and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from erpnext.accounts.utils import get_fiscal_year
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import nowdate
+
+from uis_accounts_customization.uis_accounts_customization.doctype.uis___budget.test_uis___budget import (
+	AMOUNT,
+	BRANCH,
+	COMPANY,
+	EXPENSE_ACCOUNT,
+	get_test_dimensions,
+	make_journal_entry,
+)
+from uis_accounts_customization.uis_accounts_customization.doctype.uis_budget_consumption.uis_budget_consumption import (
+	build_budget_consumption,
+	enqueue_pending_rebuilds,
+	get_consumed_amount,
+	rebuild_budget_consumption,
+)
+
+
+class TestUISBudgetConsumption(FrappeTestCase):
+	def setUp(self):
+		if not frappe.get_meta("GL Entry").has_field("branch"):
+			self.skipTest("Branch is not an accounting dimension on this site")
+
+		if not frappe.db.exists("Branch", BRANCH):
+			frappe.get_doc({"doctype": "Branch", "branch": BRANCH}).insert()
+
+		self.fiscal_year = get_fiscal_year(nowdate(), company=COMPANY)[0]
+		self.dimensions = get_test_dimensions()
+		self.args = frappe._dict(
+			company=COMPANY, fiscal_year=self.fiscal_year, account=EXPENSE_ACCOUNT, **self.dimensions
+		)
+
+	def tearDown(self):
+		frappe.set_user("Administrator")
+		frappe.flags.through_repost_accounting_ledger = False
+		frappe.db.rollback()
+
+	def test_submit_then_cancel_nets_out(self):
+		consumed = get_consumed_amount(self.args)
+
+		journal_entry = make_journal_entry(self.dimensions)
+		journal_entry.submit()
+		self.assertEqual(get_consumed_amount(self.args), consumed + AMOUNT)
+
+		# the reversal entries are counted once, and nothing is taken off for the originals
+		journal_entry.cancel()
+		self.assertEqual(get_consumed_amount(self.args), consumed)
+
+		build_budget_consumption(company=COMPANY, fiscal_year=self.fiscal_year)
+		self.assertEqual(get_consumed_amount(self.args), consumed)
+
+	def test_repost_does_not_change_consumption(self):
+		journal_entry = make_journal_entry(self.dimensions)
+		journal_entry.submit()
+		consumed = get_consumed_amount(self.args)
+
+		# what Repost Accounting Ledger does when deleting cancelled entries
+		frappe.flags.through_repost_accounting_ledger = True
+		frappe.db.delete("GL Entry", {"voucher_type": journal_entry.doctype, "voucher_no": journal_entry.name})
+		journal_entry.make_gl_entries()
+		frappe.flags.through_repost_accounting_ledger = False
+
+		# the rebuild is queued once the repost commits
+		with patch("frappe.enqueue") as enqueue:
+			enqueue_pending_rebuilds()
+
+		enqueue.assert_called_once()
+		self.assertEqual(enqueue.call_args.kwargs["company"], COMPANY)
+		self.assertEqual(enqueue.call_args.kwargs["fiscal_year"], self.fiscal_year)
+
+		build_budget_consumption(company=COMPANY, fiscal_year=self.fiscal_year)
+		self.assertEqual(get_consumed_amount(self.args), consumed)
+
+	def test_rebuild_is_queued(self):
+		with patch("frappe.enqueue") as enqueue:
+			rebuild_budget_consumption(company=COMPANY, fiscal_year=self.fiscal_year)
+
+		enqueue.assert_called_once()
+		self.assertTrue(enqueue.call_args.args[0].endswith(".build_budget_consumption"))
+		self.assertEqual(enqueue.call_args.kwargs["company"], COMPANY)
+
+	def test_rebuild_is_for_system_managers(self):
+		frappe.set_user("test@example.com")
+		with patch("frappe.enqueue") as enqueue:
+			self.assertRaises(frappe.PermissionError, rebuild_budget_consumption)
+
+		enqueue.assert_not_called()
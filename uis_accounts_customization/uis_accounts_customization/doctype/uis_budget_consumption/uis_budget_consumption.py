@@ -0,0 +1,274 @@
+# Copyright (c) 2026, Mohamed Elyamany and contributors
+# For license information, please see license.txt
+
+import hashlib
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import flt, get_last_day, getdate, now
+
+# Every row is one (fiscal year, company, account, dimensions, month) bucket.
+# The name is a hash of the key so the same bucket can be upserted from SQL
+# (rebuild) and from Python (GL Entry events) without a lookup first.
+# Cancellations net out through the reversal entries; reposts, which delete
+# GL Entries without an event, rebuild the buckets of their fiscal year.
+KEY_FIELDS = ("company", "fiscal_year", "account", "branch", "cost_center", "project", "department")
+DIMENSION_FIELDS = ("branch", "cost_center", "project", "department")
+
+
+class UISBudgetConsumption(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("UIS Budget Consumption", ["company", "fiscal_year", "account", "month_end_date"])
+	# exact-key ranges for the locking reads of budget reservations
+	frappe.db.add_index("UIS Budget Consumption", list(KEY_FIELDS) + ["month_end_date"], "budget_key_index")
+
+
+def get_consumption_key(entry):
+	"""Return the bucket key of a GL entry (dimensions are stored as '' when blank)."""
+	return tuple(entry.get(field) or "" for field in KEY_FIELDS) + (
+		getdate(get_last_day(entry.get("posting_date"))),
+	)
+
+
+def get_consumption_name(key):
+	return hashlib.sha1("::".join(str(part) for part in key).encode()).hexdigest()
+
+
+def update_consumption(gl_entries):
+	"""
+	Add GL entries to the consumption buckets.
+	Entries of one call are folded per bucket and written with a single upsert.
+	"""
+	buckets = {}
+	for entry in gl_entries:
+		if not (entry.get("company") and entry.get("fiscal_year") and entry.get("account")):
+			continue
+
+		key = get_consumption_key(entry)
+		bucket = buckets.setdefault(key, [0.0, 0.0])
+		bucket[0] += flt(entry.get("debit"))
+		bucket[1] += flt(entry.get("credit"))
+
+	if not buckets:
+		return
+
+	timestamp, user = now(), frappe.session.user
+	values, params = [], []
+	for key, (debit, credit) in buckets.items():
+		values.append("(%s, %s, %s, %s, %s, 0, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)")
+		params.extend([get_consumption_name(key), timestamp, timestamp, user, user])
+		params.extend(key)
+		params.extend([debit, credit, debit - credit])
+
+	frappe.db.sql(
+		f"""
+		INSERT INTO `tabUIS Budget Consumption`
+			(name, creation, modified, owner, modified_by, docstatus,
+			company, fiscal_year, account, branch, cost_center, project, department,
+			month_end_date, debit, credit, amount)
+		VALUES {", ".join(values)}
+		ON DUPLICATE KEY UPDATE
+			debit = debit + VALUES(debit),
+			credit = credit + VALUES(credit),
+			amount = amount + VALUES(amount),
+			modified = VALUES(modified)
+		""",
+		tuple(params),
+	)
+
+
+def get_consumed_amount(args):
+	"""
+	Net (debit - credit) consumption for company, fiscal year and account.
+	Dimensions are only filtered when present in *args*, and
+	`month_end_date` limits the sum to the months up to that date.
+	"""
+	conditions = []
+	for field in DIMENSION_FIELDS:
+		if args.get(field):
+			conditions.append(f"{field} = %({field})s")
+
+	if args.get("month_end_date"):
+		conditions.append("month_end_date <= %(month_end_date)s")
+
+	condition = " AND " + " AND ".join(conditions) if conditions else ""
+
+	amount = frappe.db.sql(
+		f"""
+		SELECT SUM(amount)
+		FROM `tabUIS Budget Consumption`
+		WHERE company = %(company)s
+			AND fiscal_year = %(fiscal_year)s
+			AND account = %(account)s
+			{condition}
+		""",
+		args,
+	)
+
+	return flt(amount[0][0]) if amount else 0.0
+
+
+def get_consumption_rows(fiscal_years, accounts):
+	"""Load every bucket of *accounts* in *fiscal_years*, grouped by (company, fiscal_year, account)."""
+	if not (fiscal_years and accounts):
+		return {}
+
+	rows = frappe.db.sql(
+		"""
+		SELECT company, fiscal_year, account, branch, cost_center, project, department,
+			month_end_date, amount
+		FROM `tabUIS Budget Consumption`
+		WHERE fiscal_year IN %(fiscal_years)s
+			AND account IN %(accounts)s
+		""",
+		{"fiscal_years": tuple(fiscal_years), "accounts": tuple(accounts)},
+		as_dict=True,
+	)
+
+	consumption = {}
+	for row in rows:
+		consumption.setdefault((row.company, row.fiscal_year, row.account), []).append(row)
+
+	return consumption
+
+
+def get_locked_consumption_rows(args_list):
+	"""
+	Locking-read variant of `get_consumption_rows` for the budget keys of *args_list*.
+	Each key is read on its own range of the budget key index, so only its buckets are locked.
+	"""
+	keys = {tuple(args.get(field) or "" for field in KEY_FIELDS) for args in args_list}
+
+	consumption, seen = {}, set()
+	for key in sorted(keys):
+		filters = dict(zip(KEY_FIELDS, key))
+		# blank dimensions match any bucket, like in `sum_consumption`
+		conditions = " AND ".join(
+			f"{field} = %({field})s" for field in KEY_FIELDS if filters[field] or field not in DIMENSION_FIELDS
+		)
+
+		for row in frappe.db.sql(
+			f"""
+			SELECT name, company, fiscal_year, account, branch, cost_center, project, department,
+				month_end_date, amount
+			FROM `tabUIS Budget Consumption`
+			WHERE {conditions}
+			LOCK IN SHARE MODE
+			""",
+			filters,
+			as_dict=True,
+		):
+			if row.name not in seen:
+				seen.add(row.name)
+				consumption.setdefault((row.company, row.fiscal_year, row.account), []).append(row)
+
+	return consumption
+
+
+def sum_consumption(consumption, args, cost_centers=None):
+	"""
+	In-memory equivalent of `get_consumed_amount` over rows from `get_consumption_rows`.
+	*cost_centers* (a set, e.g. the subtree of a group cost center) replaces the cost center filter.
+	"""
+	month_end_date = getdate(args.get("month_end_date")) if args.get("month_end_date") else None
+	dimensions = [(field, args.get(field)) for field in DIMENSION_FIELDS if args.get(field)]
+
+	amount = 0.0
+	for row in consumption.get((args.get("company"), args.get("fiscal_year"), args.get("account")), []):
+		if month_end_date and row.month_end_date > month_end_date:
+			continue
+		if any(row.get(field) != value for field, value in dimensions):
+			continue
+		if cost_centers is not None and row.cost_center not in cost_centers:
+			continue
+		amount += flt(row.amount)
+
+	return amount
+
+
+def is_reposting(gl_entry):
+	"""
+	Whether *gl_entry* is posted again by a repost. Repost Item Valuation and Repost Accounting
+	Ledger (when deleting cancelled entries) delete the voucher's GL Entries without any event,
+	so the amounts they had are still in the buckets.
+	"""
+	return bool(gl_entry.flags.from_repost or frappe.flags.through_repost_accounting_ledger)
+
+
+def mark_for_rebuild(gl_entry):
+	"""Rebuild the (company, fiscal year) of a reposted entry once the repost is committed."""
+	pending = frappe.flags.uis_consumption_rebuilds
+	if pending is None:
+		pending = frappe.flags.uis_consumption_rebuilds = set()
+		frappe.db.after_commit.add(enqueue_pending_rebuilds)
+		frappe.db.after_rollback.add(discard_pending_rebuilds)
+
+	pending.add((gl_entry.company, gl_entry.fiscal_year))
+
+
+def enqueue_pending_rebuilds():
+	for company, fiscal_year in sorted(frappe.flags.pop("uis_consumption_rebuilds", None) or ()):
+		enqueue_rebuild(company, fiscal_year)
+
+
+def discard_pending_rebuilds():
+	frappe.flags.pop("uis_consumption_rebuilds", None)
+
+
+@frappe.whitelist()
+def rebuild_budget_consumption(company=None, fiscal_year=None):
+	"""Queue a rebuild of the consumption buckets (optionally for one company / fiscal year)."""
+	frappe.only_for("System Manager")
+	enqueue_rebuild(company, fiscal_year)
+
+
+def enqueue_rebuild(company=None, fiscal_year=None):
+	# one pending job per scope, however often it is asked for
+	frappe.enqueue(
+		"uis_accounts_customization.uis_accounts_customization.doctype.uis_budget_consumption.uis_budget_consumption.build_budget_consumption",
+		queue="long",
+		timeout=4000000,
+		job_id=f"uis_budget_consumption_rebuild::{company or ''}::{fiscal_year or ''}",
+		deduplicate=True,
+		company=company,
+		fiscal_year=fiscal_year,
+	)
+
+
+def build_budget_consumption(company=None, fiscal_year=None):
+	"""Repopulate the consumption buckets from `tabGL Entry` (optionally for one company / fiscal year)."""
+	filters = {"company": company, "fiscal_year": fiscal_year}
+	conditions = " AND ".join(f"{field} = %({field})s" for field, value in filters.items() if value)
+	delete_condition = f"WHERE {conditions}" if conditions else ""
+	gle_condition = f"AND {conditions}" if conditions else ""
+
+	frappe.db.sql(f"DELETE FROM `tabUIS Budget Consumption` {delete_condition}", filters)
+
+	timestamp, user = now(), frappe.session.user
+	frappe.db.sql(
+		f"""
+		INSERT INTO `tabUIS Budget Consumption`
+			(name, creation, modified, owner, modified_by, docstatus,
+			company, fiscal_year, account, branch, cost_center, project, department,
+			month_end_date, debit, credit, amount)
+		SELECT
+			SHA1(CONCAT_WS('::', company, fiscal_year, account, IFNULL(branch, ''),
+				IFNULL(cost_center, ''), IFNULL(project, ''), IFNULL(department, ''),
+				LAST_DAY(posting_date))),
+			%(timestamp)s, %(timestamp)s, %(user)s, %(user)s, 0,
+			company, fiscal_year, account, IFNULL(branch, ''), IFNULL(cost_center, ''),
+			IFNULL(project, ''), IFNULL(department, ''), LAST_DAY(posting_date),
+			SUM(debit), SUM(credit), SUM(debit) - SUM(credit)
+		FROM `tabGL Entry`
+		WHERE is_cancelled = 0
+			AND docstatus = 1
+			AND fiscal_year IS NOT NULL
+			{gle_condition}
+		GROUP BY company, fiscal_year, account, IFNULL(branch, ''), IFNULL(cost_center, ''),
+			IFNULL(project, ''), IFNULL(department, ''), LAST_DAY(posting_date)
+		""",
+		dict(filters, timestamp=timestamp, user=user),
+	)
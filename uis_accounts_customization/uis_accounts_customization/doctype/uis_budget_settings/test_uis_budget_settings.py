@@ -0,0 +1,61 @@
+# Copyright (c) 2026, Mohamed Elyamany and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from erpnext.accounts.utils import get_fiscal_year
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import nowdate
+
+from uis_accounts_customization.customization_script.budget import evaluate_deferred_warnings
+from uis_accounts_customization.customization_script.budget_index import clear_budget_index
+from uis_accounts_customization.uis_accounts_customization.doctype.uis___budget.test_uis___budget import (
+	BRANCH,
+	COMPANY,
+	get_test_dimensions,
+	make_budget,
+	make_journal_entry,
+)
+
+
+class TestUISBudgetSettings(FrappeTestCase):
+	"""Warn budgets checked in the background after submit."""
+
+	def setUp(self):
+		if not frappe.get_meta("GL Entry").has_field("branch"):
+			self.skipTest("Branch is not an accounting dimension on this site")
+
+		if not frappe.db.exists("Branch", BRANCH):
+			frappe.get_doc({"doctype": "Branch", "branch": BRANCH}).insert()
+
+		settings = frappe.get_single("UIS Budget Settings")
+		settings.defer_warn_budget_checks = 1
+		settings.save()
+
+		self.dimensions = get_test_dimensions()
+		make_budget(get_fiscal_year(nowdate(), company=COMPANY)[0], self.dimensions, 1, action="Warn")
+
+	def tearDown(self):
+		frappe.db.rollback()
+		clear_budget_index()
+
+	def test_warnings_are_deferred_to_a_comment(self):
+		journal_entry = make_journal_entry(self.dimensions)
+		with patch("frappe.enqueue") as enqueue:
+			journal_entry.submit()
+
+		# nothing is shown on submit, the check is queued once for the document
+		enqueue.assert_called_once()
+		self.assertEqual(enqueue.call_args.kwargs["voucher_no"], journal_entry.name)
+
+		evaluate_deferred_warnings(journal_entry.doctype, journal_entry.name)
+		comments = frappe.get_all(
+			"Comment",
+			filters={"reference_doctype": journal_entry.doctype, "reference_name": journal_entry.name, "comment_type": "Comment"},
+			pluck="content",
+		)
+		self.assertEqual(len(comments), 1)
+		self.assertIn("Budget Exceeded", comments[0])
+		# the comment outlives the cached breakup, so it carries the breakup itself
+		self.assertNotIn("data-token", comments[0])
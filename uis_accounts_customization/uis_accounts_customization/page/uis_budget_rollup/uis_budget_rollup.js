@@ -0,0 +1,67 @@
+// Copyright (c) 2026, Mohamed Elyamany and contributors
+// For license information, please see license.txt
+
+frappe.pages["uis-budget-rollup"].on_page_load = function (wrapper) {
+	const page = frappe.ui.make_app_page({
+		parent: wrapper,
+		title: __("UIS Budget Rollup"),
+		single_column: true,
+	});
+
+	const render = () => {
+		const company = page.fields_dict.company.get_value();
+		const fiscal_year = page.fields_dict.fiscal_year.get_value();
+		$(page.body).empty();
+		if (!company || !fiscal_year) {
+			return;
+		}
+
+		frappe.db.get_value("Company", company, "default_currency").then((r) => {
+			const currency = r.message && r.message.default_currency;
+			new frappe.ui.Tree({
+				parent: $(page.body),
+				label: company,
+				root_value: company,
+				expandable: true,
+				method: "uis_accounts_customization.customization_script.budget_rollup.get_budget_rollup_children",
+				args: { company: company, fiscal_year: fiscal_year },
+				get_label: (node) => {
+					if (!node.data || node.is_root) {
+						return node.label;
+					}
+					const data = node.data;
+					const indicator = data.remaining < 0 ? "red" : "green";
+					return `${frappe.utils.escape_html(node.label)}
+						<span class="text-muted small">
+							${__("Budget")}: ${format_currency(data.budget, currency)} ·
+							${__("Actual")}: ${format_currency(data.actual, currency)}
+						</span>
+						<span class="indicator-pill ${indicator} small">
+							${__("Remaining")}: ${format_currency(data.remaining, currency)}
+						</span>`;
+				},
+			});
+		});
+	};
+
+	page.add_field({
+		fieldname: "company",
+		label: __("Company"),
+		fieldtype: "Link",
+		options: "Company",
+		default: frappe.defaults.get_user_default("Company"),
+		reqd: 1,
+		change: render,
+	});
+	page.add_field({
+		fieldname: "fiscal_year",
+		label: __("Fiscal Year"),
+		fieldtype: "Link",
+		options: "Fiscal Year",
+		default: erpnext.utils.get_fiscal_year(frappe.datetime.get_today()),
+		reqd: 1,
+		change: render,
+	});
+
+	render();
+};
@@ -42,6 +42,12 @@ from erpnext.accounts.report.utils import convert, convert_to_presentation_curre
 from erpnext.accounts.report.financial_statements import get_cost_centers_with_children
 from erpnext.accounts.utils import get_fiscal_year
 
+from uis_accounts_customization.customization_script.fiscal_year import get_fiscal_year_details
+from uis_accounts_customization.customization_script.monthly_distribution import (
+	get_cumulative_distribution,
+	get_period_percentage,
+)
+
 
 def execute(filters=None):
 	columns, data, message, chart = [], [], [], []
@@ -1164,27 +1170,21 @@ def get_account_budget(company, branch, filters, account_total_based_on_company=
 			as_dict=True
 		)
 
-		# Get monthly distribution percentages
-		monthly_distribution_dict = frappe.db.get_values(
-			"Monthly Distribution Percentage",
-			{'parent': budget_dict.get("monthly_distribution")},
-			['month', "percentage_allocation"],
-			as_dict=True
-		)
+		# Share of the period from the compiled monthly distribution
+		monthly_distribution = budget_dict.get("monthly_distribution")
+		monthly_percentage = round(_get_period_percentage(monthly_distribution, filters), 2)
 
-		# Format monthly distribution according to filter period 
-		# (now returns total percentage for the period)
-		monthly_percentage = round(_format_monthly_distribution_dict(monthly_distribution_dict, filters), 2)
+		account_names = _get_account_names([account.get("account") for account in account_with_budget_amount])
 
 		# Create branch-wise account budget dictionary
 		key = (company, branch)
 		account_with_budget_amount_branch_wise[key] = {} if key not in account_with_budget_amount_branch_wise else account_with_budget_amount_branch_wise[key]
 
 		for account in account_with_budget_amount:
-			account_name = _get_account_name(account)
+			account_name = account_names.get(account.get("account"), "")
 			
 			if account_name:
-				if monthly_distribution_dict:
+				if monthly_distribution:
 					allocated_budget_amount = (account.get("budget_amount", 0) * monthly_percentage) / 100
 				else:
 					allocated_budget_amount = account.get("budget_amount", 0)
@@ -1217,54 +1217,40 @@ def _get_account_name(account, is_dict = True, other_account_name = None):
 
 
 
-def _format_monthly_distribution_dict(monthly_distribution_dict, filters):
-    """
-    Format monthly distribution percentages for the given filter period
-    Returns total percentage allocation for months in the filter period
-    """
-    if not monthly_distribution_dict:
-        return 0
-    
-    # Get start and end dates from filters
-    start_date = filters.get("period_start_date")
-    end_date = filters.get("period_end_date")
-    
-    if not start_date or not end_date:
-        return sum(item.get("percentage_allocation", 0) for item in monthly_distribution_dict)
-    
-    # Convert string dates to datetime objects
-    from datetime import datetime
-    try:
-        start_date = datetime.strptime(start_date, "%Y-%m-%d")
-        end_date = datetime.strptime(end_date, "%Y-%m-%d")
-    except (ValueError, TypeError):
-        return sum(item.get("percentage_allocation", 0) for item in monthly_distribution_dict)
-    
-    # Month names list for index lookup
-    month_names = [
-        "January", "February", "March", "April", "May", "June",
-        "July", "August", "September", "October", "November", "December"
-    ]
-    
-    # Filter months that fall within the date range
-    start_month_idx = start_date.month - 1  # 0-indexed
-    end_month_idx = end_date.month - 1      # 0-indexed
-    
-    # Calculate total percentage for months in range
-    total_percentage = 0
-    for item in monthly_distribution_dict:
-        month = item.get("month")
-        if not month:
-            continue
-            
-        # Find month index (0-indexed)
-        try:
-            month_idx = month_names.index(month)
-        except ValueError:
-            continue
-            
-        # Check if month is in the filtered range
-        if start_month_idx <= month_idx <= end_month_idx:
-            total_percentage += item.get("percentage_allocation", 0)
-    
-    return total_percentage
+def _get_account_names(accounts):
+	"""Batch variant of _get_account_name: {account: "number-name"} for enabled accounts."""
+	if not accounts:
+		return {}
+
+	account_names = {}
+	for account in frappe.get_all(
+		"Account",
+		filters={"name": ["in", accounts], "disabled": 0},
+		fields=["name", "account_name", "account_number"],
+	):
+		if account.account_number:
+			account_names[account.name] = f"{account.account_number}-{account.account_name}"
+		else:
+			account_names[account.name] = f"{account.account_name}"
+
+	return account_names
+
+
+def _get_period_percentage(monthly_distribution, filters):
+	"""
+	Total percentage allocation of the months in the filter period
+	(the whole year when the period is not set)
+	"""
+	fy_start_date = frappe.get_cached_value("Fiscal Year", filters.get("from_fiscal_year"), "year_start_date")
+	start_date = filters.get("period_start_date")
+	end_date = filters.get("period_end_date")
+
+	# without a fiscal year filter, align the months to the fiscal year of the period
+	if not fy_start_date and start_date:
+		fiscal_year = get_fiscal_year_details(start_date, filters.get("company"), raise_exception=False)
+		fy_start_date = fiscal_year[1] if fiscal_year else None
+
+	if not start_date or not end_date:
+		return get_cumulative_distribution(monthly_distribution, fy_start_date)[-1]
+
+	return get_period_percentage(monthly_distribution, fy_start_date, start_date, end_date)
@@ -5,7 +5,7 @@
 import frappe
 from frappe import _
 from frappe.query_builder.functions import Sum
-from frappe.utils import add_days, cstr, flt, formatdate, getdate
+from frappe.utils import add_days, add_months, cstr, flt, formatdate, getdate
 
 import erpnext
 from erpnext.accounts.doctype.accounting_dimension.accounting_dimension import (
@@ -22,6 +22,9 @@ from collections import defaultdict
 from typing import Dict, List, Optional, Tuple, Any
 from erpnext.accounts.report.utils import convert
 
+from uis_accounts_customization.customization_script.fiscal_year import get_fiscal_year_dates
+from uis_accounts_customization.customization_script.monthly_distribution import get_period_percentage
+
 
 value_fields = (
 	"opening_debit",
@@ -69,9 +72,7 @@ def validate_filters(filters):
 	if not filters.fiscal_year:
 		frappe.throw(_("Fiscal Year {0} is required").format(filters.fiscal_year))
 
-	fiscal_year = frappe.get_cached_value(
-		"Fiscal Year", filters.fiscal_year, ["year_start_date", "year_end_date"], as_dict=True
-	)
+	fiscal_year = get_fiscal_year_dates(filters.fiscal_year)
 	if not fiscal_year:
 		frappe.throw(_("Fiscal Year {0} does not exist").format(filters.fiscal_year))
 	else:
@@ -571,23 +572,14 @@ def get_total_budget(filters: Dict[str, Any]) -> Dict[str, Any]:
         if fiscal_year_details is None:
             fiscal_year_details = _get_fiscal_year_details(budget.fiscal_year)
         
-        month_ranges = {
-            'fy_start': fiscal_year_details.year_start_date.month,
-            'fy_end': fiscal_year_details.year_end_date.month,
-            'from_month': filters['from_date'].month,
-            'to_month': filters['to_date'].month
-        }
-        
         accounts = _get_budget_accounts(budget.name)
         
         if budget.monthly_distribution:
-            distribution_data = _get_monthly_distribution(budget.monthly_distribution)
             budget_factors = _calculate_budget_factors(
-                distribution_data, 
-                month_ranges['from_month'],
-                month_ranges['to_month'],
-                month_ranges['fy_start'],
-                month_ranges['fy_end']
+                budget.monthly_distribution,
+                fiscal_year_details.year_start_date,
+                filters['from_date'],
+                filters['to_date']
             )
             
             account_budgets.update(
@@ -611,12 +603,7 @@ def get_total_budget(filters: Dict[str, Any]) -> Dict[str, Any]:
 
 def _get_fiscal_year_details(fiscal_year: str) -> Any:
     """Fetch fiscal year start and end dates."""
-    return frappe.get_value(
-        "Fiscal Year",
-        fiscal_year,
-        ["year_start_date", "year_end_date"],
-        as_dict=True
-    )
+    return get_fiscal_year_dates(fiscal_year)
 
 def _get_budget_accounts(budget_name: str) -> List[Any]:
     """Fetch budget accounts for a given budget."""
@@ -626,48 +613,21 @@ def _get_budget_accounts(budget_name: str) -> List[Any]:
         ["account", "budget_amount"]
     )
 
-def _get_monthly_distribution(distribution_name: str) -> Dict[int, Tuple[Any, int]]:
-    """
-    Get monthly distribution percentages.
-    Returns a dictionary mapping month numbers to (distribution_record, index) tuples.
-    """
-    distributions = frappe.get_all(
-        "Monthly Distribution Percentage",
-        {"parent": distribution_name},
-        ["*"],
-        order_by="idx ASC"
-    )
-    
-    return {
-        datetime.strptime(dist.month, "%B").month: (dist, dist.idx - 1)
-        for dist in distributions
-    }
-
 def _calculate_budget_factors(
-    monthly_distribution: Dict[int, Tuple[Any, int]],
-    from_month: int,
-    to_month: int,
-    fy_start_month: int,
-    fy_end_month: int
+    monthly_distribution: str,
+    fy_start_date: Any,
+    from_date: Any,
+    to_date: Any
 ) -> Tuple[float, float, float]:
     """
     Calculate budget distribution factors.
     Returns (total_percentage, total_estimate_monthly, year_to_budget)
     """
-    def sum_percentages(start: int, end: int) -> float:
-        return sum(
-            monthly_distribution[month][0].percentage_allocation
-            for month in range(start, end + 1)
-            if month in monthly_distribution
-        )
-    
-    total_percentage = (
-        0 if fy_start_month == from_month
-        else sum_percentages(fy_start_month, from_month - 1)
+    total_percentage = get_period_percentage(
+        monthly_distribution, fy_start_date, fy_start_date, add_months(from_date, -1)
     )
-    
-    total_estimate_monthly = sum_percentages(from_month, to_month)
-    year_to_budget = sum_percentages(fy_start_month, to_month)
+    total_estimate_monthly = get_period_percentage(monthly_distribution, fy_start_date, from_date, to_date)
+    year_to_budget = get_period_percentage(monthly_distribution, fy_start_date, fy_start_date, to_date)
     
     return total_percentage, total_estimate_monthly, year_to_budget
 
@@ -903,27 +863,23 @@ def get_account_budget(filters):
 		as_dict=True
 	)
 
-	# Get monthly distribution percentages
-	monthly_distribution_dict = frappe.db.get_values(
-		"Monthly Distribution Percentage",
-		{'parent': budget_dict.get("monthly_distribution")},
-		['month', "percentage_allocation"],
-		as_dict=True
-	)
+	# Period shares from the compiled monthly distribution (computed once, outside the account loop)
+	monthly_distribution = budget_dict.get("monthly_distribution")
+	year_start_date = filters.get('year_start_date')
 
-	opening_monthly_percentage = round(_format_monthly_distribution_dict(
-																	monthly_distribution_dict, 
-																	filters.get('year_start_date'), filters.get('from_date')),
+	opening_monthly_percentage = round(get_period_percentage(
+																	monthly_distribution, year_start_date,
+																	year_start_date, filters.get('from_date')),
 																2)
 	
-	budget_for_period_percentage = round(_format_monthly_distribution_dict(
-																		monthly_distribution_dict, 
+	budget_for_period_percentage = round(get_period_percentage(
+																		monthly_distribution, year_start_date,
 																		filters.get('from_date'), filters.get('to_date')),
 																	2)
 
-	till_date_for_period_percentage = round(_format_monthly_distribution_dict(
-																		monthly_distribution_dict, 
-																		filters.get('year_start_date'), filters.get('to_date')),
+	till_date_for_period_percentage = round(get_period_percentage(
+																		monthly_distribution, year_start_date,
+																		year_start_date, filters.get('to_date')),
 																	2)
 	
 	account_with_budget_amount_branch_wise[company] = {}
@@ -937,7 +893,7 @@ def get_account_budget(filters):
 			budget_posting_date = getdate(budget_dict.get("posting_date"))
 			from_date = getdate(filters.get("from_date"))
 
-			if monthly_distribution_dict:
+			if monthly_distribution:
 				
 				budget_allocated_budget_amount = (account.get("budget_amount", 0) * budget_for_period_percentage) / 100
 				till_date_allocated_budget_amount = (account.get("budget_amount", 0) * till_date_for_period_percentage) / 100
@@ -972,61 +928,6 @@ def _get_account_name(account, is_dict = True):
 
 	return ""
 
-def _format_monthly_distribution_dict(monthly_distribution_dict, _start_date, _end_date):
-	"""
-	Format monthly distribution percentages for the given filter period
-	Returns total percentage allocation for months in the filter period
-	"""
-	if not monthly_distribution_dict:
-		return 0
-
-	# Get start and end dates from filters
-	start_date = _start_date
-	end_date = _end_date
-
-	if not start_date or not end_date:
-		return sum(item.get("percentage_allocation", 0) for item in monthly_distribution_dict)
-
-	# Convert string dates to datetime objects
-
-	if type(start_date) == str:
-		from datetime import datetime
-		try:
-			start_date = datetime.strptime(start_date, "%Y-%m-%d")
-			end_date = datetime.strptime(end_date, "%Y-%m-%d")
-		except (ValueError, TypeError):
-			return sum(item.get("percentage_allocation", 0) for item in monthly_distribution_dict)
-
-	# Month names list for index lookup
-	month_names = [
-		"January", "February", "March", "April", "May", "June",
-		"July", "August", "September", "October", "November", "December"
-	]
-
-	# Filter months that fall within the date range
-	start_month_idx = start_date.month - 1  # 0-indexed
-	end_month_idx = end_date.month - 1      # 0-indexed
-
-	# Calculate total percentage for months in range
-	total_percentage = 0
-	for item in monthly_distribution_dict:
-		month = item.get("month")
-		if not month:
-			continue
-			
-		# Find month index (0-indexed)
-		try:
-			month_idx = month_names.index(month)
-		except ValueError:
-			continue
-			
-		# Check if month is in the filtered range
-		if start_month_idx <= month_idx <= end_month_idx:
-			total_percentage += item.get("percentage_allocation", 0)
-
-	return total_percentage
-
-
 def company_branches(company):
 	branches = frappe.get_all("Branch", filters={"company": company}, pluck="name")
 	return branches
@@ -1034,12 +935,7 @@ def company_branches(company):
 
 def get_fy_year_opening_month(fy_year_name):
 
-	return frappe.db.get_value(
-		"Fiscal Year", 
-		fy_year_name, 
-		["year_start_date", "year_end_date"], 
-		as_dict=True
-	) 
+	return get_fiscal_year_dates(fy_year_name)
 
 
 def generate_account_structure(accounts, depth=20):